@@ -5,6 +5,10 @@ from pygame.locals import *
 from OpenGL.GL import *
 import numpy as np
 import math
+from lensing import LensingRenderer, critical_impact
+from geodesics import GeodesicSystem
+from emitters import BeamEmitter, PointEmitter, RingEmitter, emit
+from geodesic_survey import latest_survey, outcome_image, summary, OUTCOMES
 
 # ------------------------------
 # Physical Constants (Geometric Units: G = c = 1)
@@ -17,7 +21,12 @@ KAPPA = 0      # 1 for massive (e.g. planets), 0 for photons (light)
 PARTICLE_COUNT = 1000
 MAX_L = 5.0    # Max angular momentum
 TRAIL_LENGTH = 100
-DT = 0.01      # Step in affine parameter λ
+DT = 0.01      # Step in affine parameter λ (fixed-step rk4_step)
+LAMBDA_PER_FRAME = 0.05  # Affine parameter advanced per frame (adaptive steps)
+TRAIL_SPACING = 2.0 / 150  # Trail point spacing: 2 screen pixels
+ESCAPE_RADIUS = 15.0     # Particles past this radius are recycled
+EMIT_RATE = 20           # New particles per frame while the pool has free slots
+SURVEY_PANEL = 256       # Survey overlay size in pixels (bottom-right corner)
 
 # ------------------------------
 # OpenGL Setup
@@ -83,44 +92,88 @@ def rk4_step(r, p, phi, L, dt):
 
     return r_new, p_new, phi_new
 
-# ------------------------------
-# Particle Class
-# ------------------------------
-class Particle:
-    def __init__(self, L, r0=5.0, phi0=0.0):
-        self.L = L  # Angular momentum
-        self.r = r0
-        self.p = 0.0  # dr/dλ
-        self.phi = phi0
-        self.trail = []
-
-    def update(self):
-        if self.r < HORIZON * 0.9:  # Fallen in
-            return False
-
-        self.r, self.p, self.phi = rk4_step(self.r, self.p, self.phi, self.L, DT)
-
-        # Convert to Cartesian
-        x = self.r * math.cos(self.phi)
-        y = self.r * math.sin(self.phi)
-
-        self.trail.append((x, y))
-        if len(self.trail) > TRAIL_LENGTH:
-            self.trail.pop(0)
-
-        return True  # Still active
-
 # ------------------------------
 # Create Particles
 # ------------------------------
 def create_particles():
-    particles = []
-    for _ in range(PARTICLE_COUNT):
-        L = np.random.uniform(2.0, MAX_L)  # Try different angular momenta
-        phi0 = np.random.uniform(0, 2 * math.pi)
-        r0 = np.random.uniform(4.0, 10.0)  # Start outside
-        particles.append(Particle(L=L, r0=r0, phi0=phi0))
-    return particles
+    """Fixed pool of PARTICLE_COUNT slots, integrated with adaptive Dormand-Prince steps"""
+    system = GeodesicSystem(PARTICLE_COUNT, kappa=KAPPA, horizon=HORIZON,
+                            trail_length=TRAIL_LENGTH, trail_spacing=TRAIL_SPACING,
+                            escape_radius=ESCAPE_RADIUS)
+    L = np.random.uniform(2.0, MAX_L, PARTICLE_COUNT)  # Try different angular momenta
+    phi0 = np.random.uniform(0, 2 * math.pi, PARTICLE_COUNT)
+    r0 = np.random.uniform(4.0, 10.0, PARTICLE_COUNT)  # Start outside
+    system.spawn(r0, phi0, L)
+    return system
+
+
+def create_emitters():
+    """Emitter presets, cycled with E: beam, point source, ring"""
+    params = dict(kappa=KAPPA)
+    return [
+        ("Beam", [BeamEmitter(EMIT_RATE, **params)]),
+        ("Point source", [PointEmitter(EMIT_RATE, r0=6.0, **params)]),
+        ("Ring", [RingEmitter(EMIT_RATE, r0=4.0, **params)]),
+        ("Off", []),
+    ]
+
+
+def draw_particles(system):
+    """Fading trails and head points for every live particle, via vertex arrays"""
+    live = np.nonzero(system.alive)[0]
+    if len(live) == 0:
+        return
+    trails, counts = system.ordered_trails()
+    trails, counts = trails[live], counts[live]
+    n, t = trails.shape[:2]
+
+    verts = np.empty((n, t, 2), dtype=np.float32)
+    verts[..., 0], verts[..., 1] = to_screen(trails[..., 0], trails[..., 1])
+    colors = np.ones((n, t, 4), dtype=np.float32)
+    age = np.arange(t) - (t - counts[:, None]) + 1  # 1 = oldest drawn point
+    colors[..., 3] = np.clip(0.1 + 0.08 * age, 0.0, 1.0)  # Fade trail
+
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glEnableClientState(GL_COLOR_ARRAY)
+    glVertexPointer(2, GL_FLOAT, 0, verts)
+    glColorPointer(4, GL_FLOAT, 0, colors)
+    glLineWidth(0.8)
+    has_trail = counts > 1
+    firsts = (np.arange(n) * t + t - counts)[has_trail].astype(np.int32)
+    glMultiDrawArrays(GL_LINE_STRIP, firsts, counts[has_trail].astype(np.int32), int(has_trail.sum()))
+    glDisableClientState(GL_COLOR_ARRAY)
+
+    # Draw current points
+    glColor3f(1.0, 1.0, 1.0)
+    glVertexPointer(2, GL_FLOAT, 0, np.ascontiguousarray(verts[:, -1]))
+    glDrawArrays(GL_POINTS, 0, n)
+    glDisableClientState(GL_VERTEX_ARRAY)
+
+def load_survey_panel():
+    """Outcome map of the newest cached survey for KAPPA, scaled to the panel (or None)"""
+    survey = latest_survey()
+    if survey is None:
+        print("No geodesic survey in cache/ - run: python geodesic_survey.py")
+        return None
+    if KAPPA not in list(survey["kappa"]):
+        print(f"Survey {survey['path']} has no κ={KAPPA} results")
+        return None
+    params = survey["params"]
+    print(f"Survey overlay: r0 {params['r_min']:g}..{params['r_max']:g} (x), "
+          f"L {params['L_min']:g}..{params['L_max']:g} (y), p0 {params['p0']:g}")
+    for line in summary(survey):
+        print("  " + line)
+    print("  colors: " + ", ".join(f"{name} {c}" for name, c in
+                                   zip(OUTCOMES, ("red", "blue", "yellow", "green"))))
+    image = outcome_image(survey, KAPPA)
+    rows = np.arange(SURVEY_PANEL) * image.shape[0] // SURVEY_PANEL
+    cols = np.arange(SURVEY_PANEL) * image.shape[1] // SURVEY_PANEL
+    return np.ascontiguousarray(image[rows][:, cols])
+
+
+def draw_survey_panel(panel):
+    glRasterPos2i(800 - SURVEY_PANEL, 0)
+    glDrawPixels(SURVEY_PANEL, SURVEY_PANEL, GL_RGBA, GL_UNSIGNED_BYTE, panel)
 
 # ------------------------------
 # Main Loop
@@ -128,16 +181,44 @@ def create_particles():
 def main():
     init_opengl()
     particles = create_particles()
+    emitter_presets = create_emitters()
+    preset = 0
+    rng = np.random.default_rng()
     clock = pygame.time.Clock()
 
+    # Lensed star field; shadow edge (b = 3√3 M) lines up with the drawn horizon disk
+    lens = None
+    show_lensing = False
+    sky_angle = 0.0
+
+    # Outcome map from geodesic_survey.py, toggled with S
+    survey_panel = None
+    show_survey = False
+
     running = True
     while running:
         for event in pygame.event.get():
             if event.type == QUIT:
                 running = False
+            elif event.type == KEYDOWN and event.key == K_l:
+                show_lensing = not show_lensing
+                if show_lensing and lens is None:
+                    lens = LensingRenderer(MASS, 800, 800, scale=2 * (800 / 15) / critical_impact(MASS))
+            elif event.type == KEYDOWN and event.key == K_e:
+                preset = (preset + 1) % len(emitter_presets)
+                pygame.display.set_caption(f"Black Hole Geodesics - emitter: {emitter_presets[preset][0]}")
+            elif event.type == KEYDOWN and event.key == K_s:
+                if survey_panel is None:
+                    survey_panel = load_survey_panel()
+                show_survey = survey_panel is not None and not show_survey
 
         glClear(GL_COLOR_BUFFER_BIT)
 
+        if show_lensing:
+            sky_angle += 0.002
+            glRasterPos2i(0, 0)
+            glDrawPixels(800, 800, GL_RGBA, GL_UNSIGNED_BYTE, lens.render(sky_angle))
+
         # Draw black hole shadow (r = 1.5 for photon sphere, but shadow is ~2.6 rs)
         # Event horizon: r = 2 → draw at scaled size
         glBegin(GL_TRIANGLE_FAN)
@@ -162,33 +243,12 @@ def main():
             glVertex2f(x, y)
         glEnd()
 
-        # Update and draw particles
-        alive_particles = []
-        for p in particles:
-            if p.update():
-                alive_particles.append(p)
-
-                # Draw trail
-                if len(p.trail) > 1:
-                    glLineWidth(0.8)
-                    glBegin(GL_LINE_STRIP)
-                    alpha = 0.1
-                    for i, (x, y) in enumerate(p.trail):
-                        alpha += 0.08
-                        glColor4f(1.0, 1.0, 1.0, alpha)  # Fade trail
-                        sx, sy = to_screen(x, y)
-                        glVertex2f(sx, sy)
-                    glEnd()
-
-                # Draw current point
-                x, y = p.trail[-1]
-                sx, sy = to_screen(x, y)
-                glBegin(GL_POINTS)
-                glColor3f(1.0, 1.0, 1.0)
-                glVertex2f(sx, sy)
-                glEnd()
-
-        particles = alive_particles
+        # Refill dead slots from the active emitter, then update and draw
+        emit(particles, emitter_presets[preset][1], rng)
+        particles.advance(LAMBDA_PER_FRAME)
+        draw_particles(particles)
+        if show_survey:
+            draw_survey_panel(survey_panel)
 
         pygame.display.flip()
         clock.tick(60)
@@ -0,0 +1,387 @@
+# bodies.py
+import numpy as np
+
+
+class BodyState:
+    """
+    Structure-of-arrays storage for N bodies.
+    pos/vel are (N, 3) float64, mass/radius are (N,), color is (N, 3) float32.
+    `light` (N,) bool marks test particles: they feel the other bodies'
+    gravity but exert none (see gravity.step).
+    """
+
+    def __init__(self, pos, vel, mass, radius, color, light=False):
+        n = len(mass)
+        self.pos = np.ascontiguousarray(pos, dtype=np.float64).reshape(n, 3)
+        self.vel = np.ascontiguousarray(vel, dtype=np.float64).reshape(n, 3)
+        self.mass = np.ascontiguousarray(mass, dtype=np.float64)
+        self.radius = np.ascontiguousarray(radius, dtype=np.float64)
+        # broadcast_to views are read-only; np.require copies those into owned arrays
+        self.color = np.require(np.broadcast_to(np.asarray(color, dtype=np.float32), (n, 3)),
+                                requirements=("C", "W"))
+        self.light = np.require(np.broadcast_to(np.asarray(light, dtype=bool), (n,)),
+                                requirements=("C", "W"))
+
+    def __len__(self):
+        return len(self.mass)
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros((0, 3)), np.zeros((0, 3)), np.zeros(0), np.zeros(0), np.zeros((0, 3)))
+
+    @classmethod
+    def from_planets(cls, planets):
+        """Pack a list of simulation.Planet objects into arrays"""
+        if not planets:
+            return cls.empty()
+        return cls(
+            pos=[p.pos for p in planets],
+            vel=[p.vel for p in planets],
+            mass=[p.mass for p in planets],
+            radius=[p.radius for p in planets],
+            color=[p.color for p in planets],
+            light=[p.light for p in planets],
+        )
+
+    def to_planets(self):
+        """Unpack into simulation.Planet objects (for the interactive loop)"""
+        from simulation import Planet
+        return [Planet(*self.pos[i], *self.vel[i], self.radius[i],
+                       tuple(float(c) for c in self.color[i]), mass=self.mass[i],
+                       light=bool(self.light[i]))
+                for i in range(len(self))]
+
+    def extend(self, other):
+        """Append every body of another BodyState (in place)"""
+        self.pos = np.concatenate([self.pos, other.pos])
+        self.vel = np.concatenate([self.vel, other.vel])
+        self.mass = np.concatenate([self.mass, other.mass])
+        self.radius = np.concatenate([self.radius, other.radius])
+        self.color = np.concatenate([self.color, other.color])
+        self.light = np.concatenate([self.light, other.light])
+        return self
+
+    def copy(self):
+        return BodyState(self.pos.copy(), self.vel.copy(), self.mass.copy(),
+                         self.radius.copy(), self.color.copy(), self.light.copy())
+
+    def permute(self, order):
+        """Reorder every field by an index array (in place), e.g. morton_order(state.pos)"""
+        for name in FIELDS:
+            setattr(self, name, np.ascontiguousarray(getattr(self, name)[order]))
+        return self
+
+
+def concatenate(states):
+    """Join several BodyStates into a new one"""
+    states = list(states)
+    if not states:
+        return BodyState.empty()
+    return BodyState(
+        pos=np.concatenate([s.pos for s in states]),
+        vel=np.concatenate([s.vel for s in states]),
+        mass=np.concatenate([s.mass for s in states]),
+        radius=np.concatenate([s.radius for s in states]),
+        color=np.concatenate([s.color for s in states]),
+        light=np.concatenate([s.light for s in states]),
+    )
+
+
+# === Spatial Order ===
+MORTON_BITS = 21  # per axis; three interleaved axes fill 63 bits
+
+
+def _spread_bits(v):
+    """Insert two zero bits after each of the low 21 bits of v (uint64)"""
+    v = v & np.uint64(0x1fffff)
+    for shift, mask in ((32, 0x1f00000000ffff), (16, 0x1f0000ff0000ff), (8, 0x100f00f00f00f00f),
+                        (4, 0x10c30c30c30c30c3), (2, 0x1249249249249249)):
+        v = (v | (v << np.uint64(shift))) & np.uint64(mask)
+    return v
+
+
+def morton_keys(pos):
+    """
+    Z-order key per body, (N,) uint64: coordinates are quantised on a cube
+    around the bodies and their bits interleaved, so bodies that are close
+    in space mostly get close keys
+    """
+    pos = np.asarray(pos, dtype=np.float64)
+    if len(pos) == 0:
+        return np.zeros(0, dtype=np.uint64)
+    lo = pos.min(axis=0)
+    span = max(float((pos.max(axis=0) - lo).max()), 1e-300)
+    scale = ((1 << MORTON_BITS) - 1) / span
+    q = ((pos - lo) * scale).astype(np.uint64)
+    return _spread_bits(q[:, 0]) << np.uint64(2) | _spread_bits(q[:, 1]) << np.uint64(1) | _spread_bits(q[:, 2])
+
+
+def morton_order(pos):
+    """Permutation that sorts bodies along the Z-order curve"""
+    return np.argsort(morton_keys(pos), kind="stable")
+
+
+# === Growable Storage ===
+FIELDS = ("pos", "vel", "mass", "radius", "color", "light")
+DEFAULT_COLOR = (0.7, 0.7, 0.7)
+MIN_CAPACITY = 16
+
+
+def _live_view(name):
+    """Property exposing the live prefix of a backing array as a writable view"""
+    def get(self):
+        return getattr(self, "_" + name)[:self._n]
+
+    def set(self, value):
+        buf = getattr(self, "_" + name)
+        live = buf[:self._n]
+        # `store.vel += dv` assigns the identical view back; skip that self-copy
+        if (isinstance(value, np.ndarray) and value.shape == live.shape and value.strides == live.strides
+                and value.__array_interface__["data"][0] == live.__array_interface__["data"][0]):
+            return
+        if np.shares_memory(value, buf):
+            value = np.copy(value)  # e.g. store.pos[::-1]: overlapping source and target
+        live[...] = value
+    return property(get, set)
+
+
+class BodyStore:
+    """
+    Growable body storage with stable integer ids, for scripts and headless
+    runs. Live bodies are always the dense prefix of the backing arrays, so
+    pos/vel/mass/radius/color/light are views the force kernels use as-is (any
+    gravity.step acc_fn works on a BodyStore). Capacity doubles when full,
+    so adding is amortised O(1) per body. Removal fills the holes with bodies
+    from the tail: indices move, ids never do.
+    """
+
+    pos = _live_view("pos")
+    vel = _live_view("vel")
+    mass = _live_view("mass")
+    radius = _live_view("radius")
+    color = _live_view("color")
+    light = _live_view("light")
+
+    def __init__(self, capacity=1024):
+        capacity = max(int(capacity), MIN_CAPACITY)
+        self._n = 0
+        self._pos = np.zeros((capacity, 3))
+        self._vel = np.zeros((capacity, 3))
+        self._mass = np.zeros(capacity)
+        self._radius = np.zeros(capacity)
+        self._color = np.zeros((capacity, 3), dtype=np.float32)
+        self._light = np.zeros(capacity, dtype=bool)
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._slot = np.full(capacity, -1, dtype=np.int64)  # id -> index, -1 once removed
+        self.next_id = 0
+        self.revision = 0  # bumped whenever bodies are added/removed/restyled
+
+    @classmethod
+    def from_state(cls, state, capacity=None):
+        store = cls(capacity or 2 * len(state))
+        store.add_state(state)
+        return store
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def capacity(self):
+        return len(self._mass)
+
+    @property
+    def ids(self):
+        """Id of each live body, (N,) int64 (read-only view)"""
+        ids = self._ids[:self._n]
+        ids.flags.writeable = False
+        return ids
+
+    def _reserve(self, n):
+        """Grow the backing arrays (geometrically) to hold at least n bodies"""
+        if n <= self.capacity:
+            return
+        capacity = max(n, 2 * self.capacity)
+        for name in FIELDS + ("ids",):
+            old = getattr(self, "_" + name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self._n] = old[:self._n]
+            setattr(self, "_" + name, new)
+
+    # === Edits ===
+    def add(self, pos, vel=0.0, mass=1.0, radius=1.0, color=DEFAULT_COLOR, light=False):
+        """
+        Append bodies from arrays; every field broadcasts, so scalars or a
+        single (3,) vector apply to all. Returns the new ids, (k,) int64.
+        """
+        pos = np.asarray(pos, dtype=np.float64).reshape(-1, 3)
+        k = len(pos)
+        start, end = self._n, self._n + k
+        self._reserve(end)
+        self._pos[start:end] = pos
+        self._vel[start:end] = vel
+        self._mass[start:end] = mass
+        self._radius[start:end] = radius
+        self._color[start:end] = color
+        self._light[start:end] = light
+
+        ids = np.arange(self.next_id, self.next_id + k, dtype=np.int64)
+        self.next_id += k
+        if self.next_id > len(self._slot):
+            slot = np.full(max(self.next_id, 2 * len(self._slot)), -1, dtype=np.int64)
+            slot[:len(self._slot)] = self._slot
+            self._slot = slot
+        self._slot[ids] = np.arange(start, end)
+        self._ids[start:end] = ids
+        self._n = end
+        self.revision += 1
+        return ids
+
+    def add_state(self, state):
+        """Append every body of a BodyState; returns the new ids"""
+        return self.add(state.pos, state.vel, state.mass, state.radius, state.color, state.light)
+
+    def remove(self, ids):
+        """Remove bodies by id (KeyError if any is unknown or already removed)"""
+        self._remove_indices(self.indices(np.unique(ids)))
+
+    def remove_where(self, condition):
+        """
+        Remove bodies where `condition` holds: a bool mask over the live bodies
+        or a callable store -> mask. Returns the removed ids.
+        """
+        mask = condition(self) if callable(condition) else condition
+        return self._remove_indices(np.nonzero(np.asarray(mask, dtype=bool))[0])
+
+    def _remove_indices(self, idx):
+        removed = self._ids[idx].copy()
+        n, new_n = self._n, self._n - len(idx)
+        gone = np.zeros(n - new_n, dtype=bool)
+        gone[idx[idx >= new_n] - new_n] = True
+        holes = idx[idx < new_n]
+        movers = np.arange(new_n, n)[~gone]  # survivors past the new end fill the holes
+        for name in FIELDS + ("ids",):
+            buf = getattr(self, "_" + name)
+            buf[holes] = buf[movers]
+        self._slot[removed] = -1
+        self._slot[self._ids[holes]] = holes
+        self._n = new_n
+        self.revision += 1
+        return removed
+
+    def update(self, ids, **fields):
+        """Set fields for the given ids from arrays or scalars, e.g. update(ids, vel=v, mass=2.0)"""
+        idx = self.indices(ids)
+        for name, value in fields.items():
+            if name not in FIELDS:
+                raise ValueError(f"Unknown body field '{name}' (choose from {', '.join(FIELDS)})")
+            getattr(self, "_" + name)[idx] = value
+        if "radius" in fields or "color" in fields:
+            self.revision += 1
+
+    def reorder(self, order=None):
+        """
+        Permute the live bodies (Z-order by default, see morton_order) so
+        neighbours in space are neighbours in memory. Ids follow their
+        bodies; only indices change. Returns the permutation applied.
+        """
+        order = morton_order(self.pos) if order is None else np.asarray(order, dtype=np.int64)
+        for name in FIELDS + ("ids",):
+            buf = getattr(self, "_" + name)
+            buf[:self._n] = buf[:self._n][order]
+        self._slot[self._ids[:self._n]] = np.arange(self._n)
+        self.revision += 1
+        return order
+
+    # === Lookup ===
+    def contains(self, ids):
+        """Bool mask: which ids are live"""
+        ids = np.asarray(ids, dtype=np.int64)
+        known = (ids >= 0) & (ids < self.next_id)
+        return known & (self._slot[np.where(known, ids, 0)] >= 0)
+
+    def indices(self, ids):
+        """Current array index of each id (these change when bodies are removed)"""
+        ids = np.asarray(ids, dtype=np.int64)
+        live = self.contains(ids)
+        if not live.all():
+            raise KeyError(f"Unknown or removed body ids: {ids[~live][:10].tolist()}")
+        return self._slot[ids]
+
+    def get(self, ids, name):
+        """Copy of one field for the given ids"""
+        return getattr(self, "_" + name)[self.indices(ids)]
+
+    def snapshot(self):
+        """Copy of the live bodies as a BodyState"""
+        return BodyState(self.pos.copy(), self.vel.copy(), self.mass.copy(),
+                         self.radius.copy(), self.color.copy(), self.light.copy())
+
+    def to_planets(self):
+        return self.snapshot().to_planets()
+
+
+if __name__ == "__main__":
+    import time
+    rng = np.random.default_rng(0)
+    batch, steps = 5000, 40
+
+    # Inject a batch every step and cull far-away bodies, as a headless script would
+    store = BodyStore()
+    start = time.perf_counter()
+    for _ in range(steps):
+        store.add(rng.normal(0, 500, (batch, 3)), vel=rng.normal(0, 5, (batch, 3)), mass=10.0)
+        store.remove_where(lambda s: np.einsum("ij,ij->i", s.pos, s.pos) > 1200.0 ** 2)
+    bulk = time.perf_counter() - start
+
+    # Same edits by rebuilding BodyStates (copies the whole state every step)
+    state = BodyState.empty()
+    rng = np.random.default_rng(0)
+    start = time.perf_counter()
+    for _ in range(steps):
+        new = BodyState(rng.normal(0, 500, (batch, 3)), rng.normal(0, 5, (batch, 3)),
+                        np.full(batch, 10.0), np.ones(batch), DEFAULT_COLOR)
+        state.extend(new)
+        keep = np.einsum("ij,ij->i", state.pos, state.pos) <= 1200.0 ** 2
+        state = BodyState(state.pos[keep], state.vel[keep], state.mass[keep],
+                          state.radius[keep], state.color[keep])
+    rebuild = time.perf_counter() - start
+
+    assert len(store) == len(state)
+    assert np.allclose(np.sort(store.pos[:, 0]), np.sort(state.pos[:, 0]))
+    ids = store.ids[:3].copy()
+    store.update(ids, mass=[1.0, 2.0, 3.0])
+    assert np.array_equal(store.get(ids, "mass"), [1.0, 2.0, 3.0])
+    print(f"{steps} steps of +{batch} bodies and a predicate cull ({len(store)} live, "
+          f"capacity {store.capacity}, {store.next_id} ids issued)")
+    print(f"  BodyStore:          {bulk * 1000:7.1f} ms")
+    print(f"  rebuild BodyStates: {rebuild * 1000:7.1f} ms ({rebuild / bulk:.1f}x slower)")
+
+    # Z-order: ids survive a reorder, and the mesh force pass gets cheaper
+    import gravity
+    from scenarios import create_scenario
+    pos_before = store.get(ids, "pos")
+    store.reorder()
+    assert np.array_equal(store.get(ids, "pos"), pos_before)
+    assert np.array_equal(store.indices(store.ids), np.arange(len(store)))
+
+    def best_of(fn, state, repeats=5):
+        fn(state.pos, state.mass)
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn(state.pos, state.mass)
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    print("Force pass on spatially random vs Z-ordered bodies (ms)")
+    for scene, n, solver in (("cosmic_box", 1_000_000, "pm"), ("galaxy", 1_000_000, "pm"),
+                             ("star_cluster", 8000, "direct")):
+        shuffled = create_scenario(scene, n=n, seed=1)
+        shuffled.permute(rng.permutation(len(shuffled)))
+        start = time.perf_counter()
+        ordered = shuffled.copy().permute(morton_order(shuffled.pos))
+        sort = time.perf_counter() - start
+        acc_fn = gravity.make_solver(solver)
+        before, after = best_of(acc_fn, shuffled), best_of(acc_fn, ordered)
+        print(f"  {scene} ({n} bodies, {solver}): random {before * 1000:7.1f}, "
+              f"Z-order {after * 1000:7.1f} ({before / after:.2f}x), sort {sort * 1000:.1f}")
@@ -0,0 +1,270 @@
+# diagnostics.py
+# Conservation monitor for a running simulation. Kinetic energy, momentum and
+# angular momentum are O(N) and computed every step. Potential energy is not
+# recomputed with its own O(N^2) pass: it either comes out of the force pass
+# (ForcePassPotential), is computed exactly every step for scenes no larger
+# than the sample, or is estimated from a random sample of bodies every
+# `potential_every` steps. Total energy and its drift are only reported on
+# steps where the potential is current (NaN in between), so kinetic and
+# potential always come from the same step. Rows go to an optional log
+# written on a thread.
+#
+#   python diagnostics.py --scenario solar_system --steps 2000 --log run.csv
+import argparse
+import json
+import queue
+import threading
+import time
+import numpy as np
+from config import G, DT, SOFTENING
+import gravity
+
+POTENTIAL_EVERY = 20   # steps between sampled potential-energy estimates
+SAMPLE_SIZE = 512      # bodies per estimate (exact when the scene is smaller)
+LOG_MAGIC = b"PYVD"
+
+COLUMNS = ("step", "time", "kinetic", "potential", "potential_error", "potential_step",
+           "energy", "energy_drift", "px", "py", "pz", "lx", "ly", "lz")
+
+
+# === Quantities ===
+def kinetic_energy(vel, mass):
+    return 0.5 * float(np.einsum("i,ij,ij->", mass, vel, vel))
+
+
+def momentum(vel, mass):
+    return mass @ vel
+
+
+def angular_momentum(pos, vel, mass):
+    """Total L about the world origin"""
+    return np.cross(pos, vel).T @ mass
+
+
+def sampled_potential_energy(pos, mass, g=G, softening=SOFTENING, sample_size=SAMPLE_SIZE, rng=None,
+                             light=None):
+    """
+    Potential energy 0.5 * sum_i m_i phi_i from a random sample of bodies,
+    O(sample_size * N). Returns (estimate, standard error); exact (error 0)
+    when N <= sample_size. `light` test particles source no potential, so
+    their m_i phi_i terms count in full.
+    """
+    if len(mass) == 0:
+        return 0.0, 0.0
+    if light is None or not light.any():
+        return _sampled_sum(pos, mass, pos, mass, 0.5, g, softening, sample_size, rng)
+    # Massive and light bodies are sampled separately: the few massive ones
+    # (often exact) would otherwise dominate the variance
+    sources, source_mass = pos[~light], mass[~light]
+    heavy, heavy_error = _sampled_sum(sources, source_mass, sources, source_mass, 0.5,
+                                      g, softening, sample_size, rng)
+    test, test_error = _sampled_sum(pos[light], mass[light], sources, source_mass, 1.0,
+                                    g, softening, sample_size, rng)
+    return heavy + test, float(np.hypot(heavy_error, test_error))
+
+
+def _sampled_sum(pos, mass, sources, source_mass, factor, g, softening, sample_size, rng):
+    """(estimate, standard error) of factor * sum_i m_i phi_i over targets pos"""
+    n = len(mass)
+    if n == 0 or len(source_mass) == 0:
+        return 0.0, 0.0
+    if n <= sample_size:
+        phi = np.empty(n)
+        gravity.accelerations_from(pos, sources, source_mass, g, softening, potential=phi)
+        return factor * float(mass @ phi), 0.0
+    rng = np.random.default_rng() if rng is None else rng
+    idx = rng.choice(n, sample_size, replace=False)
+    phi = np.empty(sample_size)
+    gravity.accelerations_from(pos[idx], sources, source_mass, g, softening, potential=phi)
+    terms = mass[idx] * phi
+    # Without-replacement sampling: finite-population corrected standard error
+    error = factor * n * terms.std(ddof=1) / np.sqrt(sample_size) * np.sqrt(1.0 - sample_size / n)
+    return factor * n * float(terms.mean()), float(error)
+
+
+class ForcePassPotential:
+    """
+    Direct-sum acc_fn for gravity.step() that keeps every body's potential
+    from the same pass, so Diagnostics gets exact potential energy for free.
+    """
+
+    def __init__(self, g=G, softening=SOFTENING):
+        self.g = g
+        self.softening = softening
+        self.potential = None
+
+    def __call__(self, pos, mass):
+        if self.potential is None or len(self.potential) != len(mass):
+            self.potential = np.empty(len(mass))
+        return gravity.accelerations(pos, mass, self.g, self.softening, potential=self.potential)
+
+
+# === Log ===
+class DiagnosticsLog:
+    """
+    Appends rows on a background thread. ".csv" paths get text; anything else
+    gets a binary log: LOG_MAGIC, a JSON header line with the column names,
+    then little-endian float64 rows (see read_log).
+    """
+
+    def __init__(self, path, columns=COLUMNS):
+        self.path = path
+        self.columns = columns
+        self.binary = not path.lower().endswith(".csv")
+        self.file = open(path, "wb")
+        if self.binary:
+            self.file.write(LOG_MAGIC + json.dumps({"columns": list(columns)}).encode() + b"\n")
+        else:
+            self.file.write((",".join(columns) + "\n").encode())
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def write(self, row):
+        self.queue.put(row)
+
+    def _run(self):
+        while True:
+            row = self.queue.get()
+            if row is None:
+                break
+            if self.binary:
+                self.file.write(np.asarray(row, dtype="<f8").tobytes())
+            else:
+                self.file.write((",".join(f"{v:.10g}" for v in row) + "\n").encode())
+        self.file.close()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+
+def read_log(path):
+    """Load a diagnostics log (either format) as a dict of column arrays"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if data.startswith(LOG_MAGIC):
+        header, _, body = data[len(LOG_MAGIC):].partition(b"\n")
+        columns = json.loads(header)["columns"]
+        rows = np.frombuffer(body, dtype="<f8").reshape(-1, len(columns))
+    else:
+        lines = data.decode().splitlines()
+        columns = lines[0].split(",")
+        rows = np.loadtxt(lines[1:], delimiter=",", ndmin=2)
+    return {name: rows[:, i] for i, name in enumerate(columns)}
+
+
+# === Monitor ===
+class Diagnostics:
+    """
+    Call record() once per step, after gravity.step(). With the step's `acc`
+    the velocities are taken half a kick back, which matches the positions
+    the forces were computed at and removes most of the kick-drift
+    integrator's apparent energy wobble.
+    """
+
+    def __init__(self, g=G, softening=SOFTENING, potential_every=POTENTIAL_EVERY,
+                 sample_size=SAMPLE_SIZE, log_path=None, seed=None):
+        self.g = g
+        self.softening = softening
+        self.potential_every = potential_every
+        self.sample_size = sample_size
+        self.rng = np.random.default_rng(seed)
+        self.log = DiagnosticsLog(log_path) if log_path else None
+        self.potential = 0.0
+        self.potential_error = 0.0
+        self.potential_step = -1
+        self.initial_energy = None
+        self.energy = None      # (energy, drift) as of potential_step
+        self.last = None
+        self.cost = 0.0  # seconds spent in record()
+
+    def record(self, step, state, potential=None, acc=None, dt=DT):
+        """
+        Diagnostics for this step as a dict. `potential` is the per-body
+        potential from the force pass (e.g. ForcePassPotential.potential);
+        without it, potential energy is exact every step when the scene fits
+        in one sample and re-estimated every potential_every steps otherwise.
+        """
+        start = time.perf_counter()
+        pos, mass = state.pos, state.mass
+        vel = state.vel if acc is None else state.vel - (0.5 * dt) * acc
+        light = getattr(state, "light", None)
+        if light is not None and not light.any():
+            light = None
+        if potential is not None and light is None and len(potential) == len(mass):
+            self.potential, self.potential_error = 0.5 * float(mass @ potential), 0.0
+            self.potential_step = step
+        elif (len(mass) <= self.sample_size or self.potential_step < 0
+              or step - self.potential_step >= self.potential_every):
+            self.potential, self.potential_error = sampled_potential_energy(
+                pos, mass, self.g, self.softening, self.sample_size, self.rng, light)
+            self.potential_step = step
+
+        kinetic = kinetic_energy(vel, mass)
+        energy = drift = np.nan  # a stale potential plus this step's KE is no energy at all
+        if self.potential_step == step:
+            energy = kinetic + self.potential
+            if self.initial_energy is None:
+                self.initial_energy = energy
+            drift = (energy - self.initial_energy) / max(abs(self.initial_energy), 1e-300)
+            self.energy = (energy, drift)
+        p = momentum(vel, mass)
+        L = angular_momentum(pos, vel, mass)
+        row = (step, step * dt, kinetic, self.potential, self.potential_error, self.potential_step,
+               energy, drift, *p, *L)
+        self.last = dict(zip(COLUMNS, row))
+        if self.log is not None:
+            self.log.write(row)
+        self.cost += time.perf_counter() - start
+        return self.last
+
+    def hud_lines(self):
+        """Short text lines for an on-screen overlay"""
+        if self.last is None:
+            return []
+        d = self.last
+        energy, drift = self.energy
+        error = f" ±{d['potential_error']:.1e}" if d["potential_error"] else ""
+        return [
+            f"E drift: {drift:+.2e}  (E = {energy:.4e}{error}, step {self.potential_step})",
+            f"|P|: {np.linalg.norm([d['px'], d['py'], d['pz']]):.3e}  "
+            f"|L|: {np.linalg.norm([d['lx'], d['ly'], d['lz']]):.3e}",
+        ]
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+
+
+if __name__ == "__main__":
+    from scenarios import create_scenario, scene_solver
+    parser = argparse.ArgumentParser(description="Run headless and log conservation diagnostics")
+    parser.add_argument("--scenario", default="solar_system")
+    parser.add_argument("--bodies", type=int, default=0)
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--solver", default=None, help="force solver (default: the scene's)")
+    parser.add_argument("--log", default=None, help=".csv for text, anything else for binary")
+    args = parser.parse_args()
+
+    kwargs = {"seed": 1}
+    if args.bodies:
+        kwargs["n_asteroids" if args.scenario == "solar_system" else "n"] = args.bodies
+    state = create_scenario(args.scenario, **kwargs)
+    solver = args.solver or ("direct" if len(state) <= 5000 else None)
+    # The direct kernel hands over the potential; other solvers use sampled estimates
+    acc_fn = ForcePassPotential() if solver == "direct" else scene_solver(args.scenario, solver)
+    diag = Diagnostics(log_path=args.log)
+    start = time.perf_counter()
+    for step in range(args.steps):
+        acc = gravity.step(state, DT, acc_fn)
+        diag.record(step, state, getattr(acc_fn, "potential", None), acc)
+    elapsed = time.perf_counter() - start
+    diag.close()
+    print(f"{args.scenario}: {len(state)} bodies, {args.steps} steps in {elapsed:.2f}s, "
+          f"diagnostics {diag.cost / elapsed:.1%} of it")
+    for line in diag.hud_lines():
+        print("  " + line)
+    if args.log:
+        log = read_log(args.log)
+        print(f"  {len(log['step'])} rows in {args.log}, worst |drift| {np.nanmax(np.abs(log['energy_drift'])):.2e}")
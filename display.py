@@ -0,0 +1,265 @@
+# display.py
+# One window and OpenGL context for the whole app. pygame destroys the GL
+# context whenever set_mode switches between an OpenGL and a plain window
+# (menu <-> simulation), and every texture, buffer and display list goes with
+# it. So the window is opened once, in OpenGL mode, and never re-created.
+# Resizes only move the viewport. 2D screens (splash, menu, the simulation
+# HUD) are drawn with pygame into `canvas`, a window-sized surface that
+# draw_canvas() uploads into one cached texture.
+#
+# GPU objects (and fonts) live in a ResourceCache keyed by name. A screen
+# takes a Lease, acquires what it uses, and releases the lease on exit.
+# Released objects stay resident until trim() needs the room, so coming back
+# to a screen finds everything already uploaded.
+import pygame
+from pygame.locals import DOUBLEBUF, OPENGL, RESIZABLE, SRCALPHA, VIDEORESIZE
+from OpenGL.GL import *
+from OpenGL.GLU import *
+from config import SCREEN_WIDTH, SCREEN_HEIGHT
+
+CACHE_BUDGET = 64 << 20  # bytes of unreferenced resources trim() keeps resident
+
+
+# === Resources ===
+class Texture:
+    """RGBA8 2D texture, refilled in place from pygame surfaces"""
+
+    def __init__(self, width, height):
+        self.width, self.height = width, height
+        self.id = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.id)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA8, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE, None)
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+    @property
+    def nbytes(self):
+        return 4 * self.width * self.height
+
+    def upload(self, surface):
+        """Copy a surface of the texture's size (rows flipped to GL's bottom-up order)"""
+        glBindTexture(GL_TEXTURE_2D, self.id)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+        glTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, self.width, self.height, GL_RGBA, GL_UNSIGNED_BYTE,
+                        pygame.image.tostring(surface, "RGBA", True))
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+    def delete(self):
+        glDeleteTextures([self.id])
+
+
+class SphereMesh:
+    """Unit sphere compiled into a display list; draw(radius) scales it"""
+
+    def __init__(self, slices, stacks):
+        self.slices, self.stacks = slices, stacks
+        self.list = glGenLists(1)
+        quadric = gluNewQuadric()
+        glNewList(self.list, GL_COMPILE)
+        gluSphere(quadric, 1.0, slices, stacks)
+        glEndList()
+        gluDeleteQuadric(quadric)
+
+    @property
+    def nbytes(self):
+        return 24 * (self.slices + 1) * (self.stacks + 1)  # position + normal per vertex
+
+    def draw(self, radius):
+        glScalef(radius, radius, radius)
+        glCallList(self.list)
+
+    def delete(self):
+        glDeleteLists(self.list, 1)
+
+
+class ResourceCache:
+    """
+    Reference-counted resources by key. acquire() creates on first use,
+    release() drops a reference but keeps the object, trim() deletes
+    unreferenced objects beyond the byte budget, longest-idle first.
+    Resources may define `nbytes` and `delete()`; fonts define neither.
+    """
+
+    def __init__(self, budget=CACHE_BUDGET):
+        self.budget = budget
+        self.entries = {}  # key -> [resource, refcount, release tick]
+        self.tick = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def acquire(self, key, factory):
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = [factory(), 0, 0]
+            self.misses += 1
+        else:
+            self.hits += 1
+        entry[1] += 1
+        return entry[0]
+
+    def release(self, key):
+        entry = self.entries[key]
+        if entry[1] <= 0:
+            raise ValueError(f"Resource {key!r} released more often than acquired")
+        entry[1] -= 1
+        self.tick += 1
+        entry[2] = self.tick
+
+    def trim(self, budget=None):
+        """Delete idle resources until the idle ones fit in `budget` bytes"""
+        budget = self.budget if budget is None else budget
+        idle = sorted((key for key, e in self.entries.items() if e[1] == 0),
+                      key=lambda key: self.entries[key][2])
+        size = sum(getattr(self.entries[key][0], "nbytes", 0) for key in idle)
+        for key in idle:
+            if size <= budget:
+                break
+            resource = self.entries.pop(key)[0]
+            size -= getattr(resource, "nbytes", 0)
+            _delete(resource)
+
+    def clear(self):
+        """Delete everything (while the context is still current)"""
+        for resource, _, _ in self.entries.values():
+            _delete(resource)
+        self.entries.clear()
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "referenced": sum(1 for e in self.entries.values() if e[1] > 0),
+            "bytes": sum(getattr(e[0], "nbytes", 0) for e in self.entries.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def _delete(resource):
+    delete = getattr(resource, "delete", None)
+    if delete is not None:
+        delete()
+
+
+class Lease:
+    """What one screen holds from the cache: each key acquired once, all released together"""
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.held = {}
+
+    def get(self, key, factory):
+        if key not in self.held:
+            self.held[key] = self.cache.acquire(key, factory)
+        return self.held[key]
+
+    def font(self, name, size, bold=False):
+        return self.get(("font", name, size, bold), lambda: pygame.font.SysFont(name, size, bold=bold))
+
+    def sphere(self, slices, stacks):
+        return self.get(("sphere", slices, stacks), lambda: SphereMesh(slices, stacks))
+
+    def release(self):
+        for key in self.held:
+            self.cache.release(key)
+        self.held.clear()
+
+
+# === Window ===
+class Display:
+    """The app window and its GL context; create it once (see get_display)"""
+
+    def __init__(self, size=(SCREEN_WIDTH, SCREEN_HEIGHT), caption="PyVerse"):
+        pygame.display.set_mode(size, DOUBLEBUF | OPENGL | RESIZABLE)  # the only set_mode call
+        pygame.display.set_caption(caption)
+        self.cache = ResourceCache()
+        self.size = None
+        self.canvas = None
+        self.canvas_key = None
+        self.resize(*size)
+
+    def resize(self, width, height):
+        """New viewport and canvas; the context and everything in it survive"""
+        if (width, height) == self.size:
+            return
+        self.size = (width, height)
+        self.canvas = pygame.Surface(self.size, SRCALPHA)
+        if self.canvas_key is not None:
+            # A canvas for the old size is never reused; free it now rather
+            # than parking a full-window texture in the idle pool
+            self.cache.release(self.canvas_key)
+            if self.cache.entries[self.canvas_key][1] == 0:
+                _delete(self.cache.entries.pop(self.canvas_key)[0])
+        self.canvas_key = ("canvas", width, height)
+        self.cache.acquire(self.canvas_key, lambda: Texture(width, height))
+        glViewport(0, 0, width, height)
+
+    def handle_event(self, event):
+        """Track window resizes; returns True if the event was a resize"""
+        if event.type != VIDEORESIZE:
+            return False
+        self.resize(max(1, event.w), max(1, event.h))
+        return True
+
+    def lease(self):
+        return Lease(self.cache)
+
+    def draw_canvas(self):
+        """Composite the canvas over whatever is in the back buffer (alpha-blended)"""
+        texture = self.cache.entries[self.canvas_key][0]
+        texture.upload(self.canvas)
+        glPushAttrib(GL_ENABLE_BIT | GL_COLOR_BUFFER_BIT | GL_CURRENT_BIT)
+        glDisable(GL_DEPTH_TEST)
+        glDisable(GL_LIGHTING)
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glEnable(GL_TEXTURE_2D)
+        glBindTexture(GL_TEXTURE_2D, texture.id)
+        glMatrixMode(GL_PROJECTION)
+        glPushMatrix()
+        glLoadIdentity()
+        glOrtho(0, 1, 0, 1, -1, 1)
+        glMatrixMode(GL_MODELVIEW)
+        glPushMatrix()
+        glLoadIdentity()
+        glColor4f(1.0, 1.0, 1.0, 1.0)
+        glBegin(GL_QUADS)
+        for x, y in ((0, 0), (1, 0), (1, 1), (0, 1)):
+            glTexCoord2f(x, y)
+            glVertex2f(x, y)
+        glEnd()
+        glPopMatrix()
+        glMatrixMode(GL_PROJECTION)
+        glPopMatrix()
+        glMatrixMode(GL_MODELVIEW)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        glPopAttrib()
+
+    def present(self):
+        """Show the canvas as the whole frame (2D screens)"""
+        glClearColor(0.0, 0.0, 0.0, 1.0)
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        self.draw_canvas()
+        pygame.display.flip()
+
+    def close(self):
+        self.cache.clear()
+
+
+_display = None
+
+
+def get_display(size=(SCREEN_WIDTH, SCREEN_HEIGHT), caption="PyVerse"):
+    """The shared Display, opened on first use"""
+    global _display
+    if _display is None:
+        _display = Display(size, caption)
+    return _display
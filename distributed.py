@@ -0,0 +1,413 @@
+# distributed.py
+# Domain-decomposed N-body runs across worker processes over TCP.
+#
+# The coordinator slices space into slabs along one axis; each worker owns the
+# bodies in its slab. Space is also binned into an aligned grid of cubic cells
+# of size CELL_SIZE, and slab faces sit on cell boundaries. Every step a worker
+# sends:
+#   - monopole + quadrupole moments of each of its occupied cells,
+#   - its boundary bodies: those in the first/last cell layer of the slab.
+# Each worker sums its own bodies exactly, forwarded boundary bodies exactly
+# for adjacent cells, and every other remote cell through its multipole.
+# After kick/drift, bodies that left the slab are routed to their new owner.
+# The coordinator relays all messages and gathers snapshots for rendering/saving.
+#
+#   python distributed.py demo --workers 4 --bodies 20000 --steps 20
+#   python distributed.py worker --connect HOST:PORT     (remote workers)
+import argparse
+import json
+import multiprocessing as mp
+import socket
+import struct
+import time
+import numpy as np
+from config import G, DT, SOFTENING
+from bodies import BodyState
+import gravity
+
+DEFAULT_PORT = 47100
+CELL_SIZE = 50.0
+REBALANCE_EVERY = 20
+SAMPLE_SIZE = 256
+_FAR_CELL = 1 << 62  # open slab ends, in cells
+
+_LEN = struct.Struct("!I")
+_FIELDS = ("pos", "vel", "mass", "radius", "color", "light")
+
+
+# === Wire Format ===
+# [u32 header length][JSON header][raw array bytes...]; no pickle on the wire.
+def send_msg(sock, kind, arrays=None, **meta):
+    arrays = {k: np.ascontiguousarray(v) for k, v in (arrays or {}).items()}
+    specs = [[name, a.dtype.str, list(a.shape)] for name, a in arrays.items()]
+    header = json.dumps({"kind": kind, "meta": meta, "arrays": specs}).encode()
+    sock.sendall(b"".join([_LEN.pack(len(header)), header,
+                           *(a.tobytes() for a in arrays.values())]))
+
+
+def _recv_into(sock, view):
+    while len(view):
+        n = sock.recv_into(view)
+        if n == 0:
+            raise ConnectionError("peer closed the connection")
+        view = view[n:]
+
+
+def recv_msg(sock):
+    size = bytearray(_LEN.size)
+    _recv_into(sock, memoryview(size))
+    header = bytearray(_LEN.unpack(size)[0])
+    _recv_into(sock, memoryview(header))
+    header = json.loads(header)
+    arrays = {}
+    for name, dtype, shape in header["arrays"]:
+        a = np.empty(shape, dtype=np.dtype(dtype))
+        if a.size:
+            _recv_into(sock, memoryview(a.reshape(-1)).cast("B"))
+        arrays[name] = a
+    return header["kind"], header["meta"], arrays
+
+
+def _near_accelerations(targets, target_keys, sources, source_keys, source_mass, g, softening):
+    """Exact pairwise sum restricted to sources in the 27 cells around each target"""
+    out = np.zeros((len(targets), 3))
+    if len(sources) == 0 or len(targets) == 0:
+        return out
+    block = max(1, gravity.PAIR_BLOCK // len(sources))
+    for start in range(0, len(targets), block):
+        tk = target_keys[start:start + block]
+        near = np.ones((len(tk), len(sources)), dtype=bool)
+        for k in range(3):
+            near &= np.abs(tk[:, k:k + 1] - source_keys[:, k]) <= 1
+        rows, cols = np.nonzero(near)
+        if len(rows) == 0:
+            continue
+        d = sources[cols] - targets[start + rows]
+        r2 = np.einsum("ij,ij->i", d, d)
+        ok = r2 >= softening
+        w = np.zeros(len(r2))
+        w[ok] = g * source_mass[cols[ok]] / (r2[ok] * np.sqrt(r2[ok]))
+        for k in range(3):
+            out[start:start + block, k] += np.bincount(rows, w * d[:, k], len(tk))
+    return out
+
+
+# === Worker ===
+class DomainWorker:
+    """Owns the bodies of one slab and runs the per-step protocol"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.state = BodyState.empty()
+
+    def _take(self, mask):
+        """Remove and return the masked bodies as an arrays dict"""
+        out = {"ids": self.ids[mask]}
+        out.update({f: getattr(self.state, f)[mask] for f in _FIELDS})
+        keep = ~mask
+        self.ids = self.ids[keep]
+        for f in _FIELDS:
+            setattr(self.state, f, getattr(self.state, f)[keep])
+        return out
+
+    def _add(self, arrays):
+        if len(arrays["ids"]) == 0:
+            return
+        self.ids = np.concatenate([self.ids, arrays["ids"]])
+        self.state.extend(BodyState(*(arrays[f] for f in _FIELDS)))
+
+    def _cells(self):
+        return np.floor(self.state.pos[:, self.axis] / self.cell_size).astype(np.int64)
+
+    def _exchange(self):
+        # Light bodies (test particles) are never sources
+        source = ~self.state.light
+        pos, mass = self.state.pos[source], self.state.mass[source]
+        cell = self._cells()[source]
+        # Boundary layers (and anything left outside the slab by a rebalance)
+        boundary = (cell <= self.lo_cell) | (cell >= self.hi_cell - 1)
+        keys, table = gravity.cell_multipoles(pos, mass, self.cell_size)
+        send_msg(self.sock, "exchange", {
+            "boundary_pos": pos[boundary], "boundary_mass": mass[boundary],
+            "cell_keys": keys, "cell_table": table,
+        })
+
+    def _advance(self, halo_pos, halo_mass, cell_keys, cell_table):
+        s = self.state
+        keys = gravity.cell_keys(s.pos, self.cell_size)
+        source = ~s.light
+        acc = gravity.accelerations_from(s.pos, s.pos[source], s.mass[source], self.g, self.softening)
+        acc += _near_accelerations(s.pos, keys, halo_pos,
+                                   gravity.cell_keys(halo_pos, self.cell_size),
+                                   halo_mass, self.g, self.softening)
+        acc += gravity.cell_field_accelerations(s.pos, cell_table, self.g, self.softening,
+                                                target_keys=keys, keys=cell_keys,
+                                                skip_adjacent=True)
+        s.vel += acc * self.dt
+        s.pos += s.vel * self.dt
+        self._emigrate("migrate")
+
+    def _emigrate(self, kind):
+        cell = self._cells()
+        emigrants = self._take((cell < self.lo_cell) | (cell >= self.hi_cell))
+        sample = self.state.pos[:, self.axis]
+        if len(sample) > SAMPLE_SIZE:
+            sample = np.random.default_rng().choice(sample, SAMPLE_SIZE, replace=False)
+        emigrants["sample"] = sample
+        send_msg(self.sock, kind, emigrants, count=len(self.state))
+
+    def _set_bounds(self, bounds):
+        """Slab bounds are given in whole cells along the decomposition axis"""
+        self.lo_cell, self.hi_cell = bounds[self.index], bounds[self.index + 1]
+
+    def run(self):
+        while True:
+            kind, meta, arrays = recv_msg(self.sock)
+            if kind == "init":
+                self.index, self.axis = meta["index"], meta["axis"]
+                self.dt, self.g = meta["dt"], meta["g"]
+                self.softening, self.cell_size = meta["softening"], meta["cell_size"]
+                self._set_bounds(meta["bounds"])
+                self._add(arrays)
+            elif kind == "exchange":
+                self._exchange()
+            elif kind == "forces":
+                self._advance(arrays["halo_pos"], arrays["halo_mass"],
+                              arrays["cell_keys"], arrays["cell_table"])
+            elif kind == "immigrate":
+                self._add(arrays)
+            elif kind == "rebalance":
+                self._set_bounds(meta["bounds"])
+                self._emigrate("evict")
+            elif kind == "gather":
+                send_msg(self.sock, "state", {"ids": self.ids,
+                                              **{f: getattr(self.state, f) for f in _FIELDS}})
+            elif kind == "count":
+                send_msg(self.sock, "count", count=len(self.state))
+            elif kind == "stop":
+                break
+        self.sock.close()
+
+
+def run_worker(host, port, retries=50):
+    """Connect to a coordinator and serve until told to stop"""
+    for attempt in range(retries):
+        try:
+            sock = socket.create_connection((host, port))
+            break
+        except ConnectionRefusedError:
+            if attempt == retries - 1:
+                raise
+            time.sleep(0.1)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    DomainWorker(sock).run()
+
+
+# === Coordinator ===
+class DistributedSimulation:
+    """
+    Coordinator for a slab-decomposed run. With spawn=True it starts
+    `n_workers` local worker processes; otherwise it waits for that many
+    `python distributed.py worker --connect HOST:PORT` processes.
+    """
+
+    def __init__(self, state, n_workers=4, host="127.0.0.1", port=0, spawn=True,
+                 dt=DT, g=G, softening=SOFTENING, cell_size=CELL_SIZE,
+                 rebalance_every=REBALANCE_EVERY):
+        self.n = n_workers
+        self.dt = dt
+        self.cell_size = cell_size
+        self.rebalance_every = rebalance_every
+        self.steps = 0
+        self.processes = []
+
+        self.server = socket.create_server((host, port))
+        self.address = self.server.getsockname()
+        if spawn:
+            ctx = mp.get_context("spawn")
+            for _ in range(n_workers):
+                proc = ctx.Process(target=run_worker, args=self.address[:2], daemon=True)
+                proc.start()
+                self.processes.append(proc)
+        else:
+            print(f"Waiting for {n_workers} workers on {self.address[0]}:{self.address[1]}")
+
+        self.socks = []
+        for _ in range(n_workers):
+            sock, _ = self.server.accept()
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.socks.append(sock)
+
+        # Slab along the widest axis, split at equal-count quantiles
+        extent = state.pos.max(axis=0) - state.pos.min(axis=0) if len(state) else np.zeros(3)
+        self.axis = int(np.argmax(extent))
+        self.bounds = self._quantile_bounds(state.pos[:, self.axis], np.ones(len(state)))
+
+        owner = self._owner(state.pos)
+        ids = np.arange(len(state))
+        for i, sock in enumerate(self.socks):
+            mask = owner == i
+            send_msg(sock, "init", {"ids": ids[mask], **{f: getattr(state, f)[mask] for f in _FIELDS}},
+                     index=i, axis=self.axis, bounds=self.bounds, dt=dt, g=g,
+                     softening=softening, cell_size=cell_size)
+
+    def _quantile_bounds(self, x, weights):
+        """Slab faces (in whole cells) that split the weighted samples evenly"""
+        bounds = [_FAR_CELL] * (self.n + 1)
+        bounds[0] = -_FAR_CELL
+        if len(x):
+            order = np.argsort(x)
+            cum = np.cumsum(weights[order])
+            cuts = np.searchsorted(cum, cum[-1] * np.arange(1, self.n) / self.n)
+            faces = x[order][np.minimum(cuts, len(x) - 1)]
+            bounds[1:-1] = np.round(faces / self.cell_size).astype(np.int64).tolist()
+        return bounds
+
+    def _cells(self, pos):
+        return np.floor(pos[:, self.axis] / self.cell_size).astype(np.int64)
+
+    def _owner(self, pos):
+        return np.searchsorted(np.asarray(self.bounds[1:-1]), self._cells(pos), side="right")
+
+    def step(self, n_steps=1):
+        for _ in range(n_steps):
+            self._step()
+
+    def _step(self):
+        for sock in self.socks:
+            send_msg(sock, "exchange")
+        ex = [recv_msg(sock)[2] for sock in self.socks]
+
+        boundary_pos = np.concatenate([e["boundary_pos"] for e in ex])
+        boundary_mass = np.concatenate([e["boundary_mass"] for e in ex])
+        boundary_src = np.repeat(np.arange(self.n), [len(e["boundary_mass"]) for e in ex])
+        boundary_cell = self._cells(boundary_pos)
+
+        for i, sock in enumerate(self.socks):
+            # Boundary bodies of other workers that touch this slab's cells
+            lo, hi = self.bounds[i], self.bounds[i + 1]
+            near = (boundary_src != i) & (boundary_cell >= lo - 1) & (boundary_cell <= hi)
+            others = [ex[j] for j in range(self.n) if j != i]
+            send_msg(sock, "forces", {
+                "halo_pos": boundary_pos[near],
+                "halo_mass": boundary_mass[near],
+                "cell_keys": np.concatenate([e["cell_keys"] for e in others]).reshape(-1, 3),
+                "cell_table": np.concatenate([e["cell_table"] for e in others]).reshape(-1, 13),
+            })
+
+        replies = [recv_msg(sock) for sock in self.socks]
+        self._route(replies)
+        self.steps += 1
+
+        if self.rebalance_every and self.steps % self.rebalance_every == 0:
+            self._rebalance(replies)
+
+    def _route(self, replies):
+        """Send bodies that crossed a slab face to their new owner"""
+        moved = {k: np.concatenate([r[2][k] for r in replies]) for k in ("ids", *_FIELDS)}
+        owner = self._owner(moved["pos"])
+        for i, sock in enumerate(self.socks):
+            mask = owner == i
+            send_msg(sock, "immigrate", {k: v[mask] for k, v in moved.items()})
+
+    def _rebalance(self, replies):
+        """Move slab faces to the weighted quantiles of the workers' samples"""
+        xs, ws = [], []
+        for _, info, arrays in replies:
+            sample = arrays["sample"]
+            if len(sample):
+                xs.append(sample)
+                ws.append(np.full(len(sample), info["count"] / len(sample)))
+        if not xs:
+            return
+        self.bounds = self._quantile_bounds(np.concatenate(xs), np.concatenate(ws))
+        for sock in self.socks:
+            send_msg(sock, "rebalance", bounds=self.bounds)
+        self._route([recv_msg(sock) for sock in self.socks])
+
+    def snapshot(self):
+        """Gather every body (in original id order) into one BodyState"""
+        for sock in self.socks:
+            send_msg(sock, "gather")
+        parts = [recv_msg(sock)[2] for sock in self.socks]
+        ids = np.concatenate([p["ids"] for p in parts])
+        order = np.argsort(ids)
+        return BodyState(*(np.concatenate([p[f] for p in parts])[order] for f in _FIELDS))
+
+    def domain_counts(self):
+        """Number of bodies currently owned by each worker"""
+        for sock in self.socks:
+            send_msg(sock, "count")
+        return [recv_msg(sock)[1]["count"] for sock in self.socks]
+
+    def close(self):
+        for sock in self.socks:
+            try:
+                send_msg(sock, "stop")
+                sock.close()
+            except OSError:
+                pass
+        self.server.close()
+        for proc in self.processes:
+            proc.join(timeout=5)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# === CLI ===
+def _demo(args):
+    from scenarios import star_cluster
+    state = star_cluster(n=args.bodies, seed=1)
+
+    start = time.perf_counter()
+    with DistributedSimulation(state, n_workers=args.workers, cell_size=args.cell_size) as sim:
+        setup = time.perf_counter() - start
+        sim.step(1)
+        first = sim.snapshot()
+        start = time.perf_counter()
+        sim.step(args.steps)
+        sim.snapshot()
+        elapsed = time.perf_counter() - start
+        counts = sim.domain_counts()
+    print(f"Distributed: {args.workers} workers, setup {setup:.2f}s, "
+          f"{args.steps} steps in {elapsed:.2f}s, bodies per domain {counts}")
+
+    if args.compare:
+        # Orbits are chaotic, so compare the force of the first step only
+        reference = state.copy()
+        start = time.perf_counter()
+        acc_ref = gravity.step(reference, DT)
+        single = time.perf_counter() - start
+        acc = (first.vel - state.vel) / DT
+        err = np.linalg.norm(acc - acc_ref, axis=1) / np.linalg.norm(acc_ref, axis=1)
+        print(f"Single process: {single * args.steps:.2f}s for {args.steps} steps; "
+              f"relative force error median {np.median(err):.2e}, 99th pct {np.percentile(err, 99):.2e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distributed PyVerse physics")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    worker = sub.add_parser("worker", help="run a worker that connects to a coordinator")
+    worker.add_argument("--connect", default=f"127.0.0.1:{DEFAULT_PORT}")
+    demo = sub.add_parser("demo", help="run a localhost multi-worker demo")
+    demo.add_argument("--workers", type=int, default=4)
+    demo.add_argument("--bodies", type=int, default=20000)
+    demo.add_argument("--steps", type=int, default=20)
+    demo.add_argument("--cell-size", type=float, default=CELL_SIZE)
+    demo.add_argument("--compare", action="store_true", help="also run single-process direct sum")
+    args = parser.parse_args()
+
+    if args.cmd == "worker":
+        host, port = args.connect.rsplit(":", 1)
+        run_worker(host, int(port))
+    else:
+        _demo(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# emitters.py
+# Particle sources for the geodesic pool in geodesics.py. Each emitter turns a
+# count into initial (r, ϕ, p, L) arrays; emit() drops them into free slots.
+#
+# Units are those of geodesics.derivatives (G = c = M = 1). Initial conditions
+# use the conserved energy E (E = 1 for photons):
+#   E² = p² + (1 - 2/r)(κ + L²/r²)
+# so a ray leaving at angle ψ from the outward radial direction has
+#   p = s·cos ψ,   L = r·s·sin ψ / sqrt(1 - 2/r),   s = sqrt(E² - (1 - 2/r)κ)
+import numpy as np
+
+
+def launch(r, phi, psi, kappa=0, energy=1.0):
+    """(r, ϕ, p, L) for particles at (r, ϕ) moving at angle ψ to the radial direction"""
+    f = 1.0 - 2.0 / r
+    s = np.sqrt(np.maximum(energy * energy - f * kappa, 0.0))
+    return r, phi, s * np.cos(psi), r * s * np.sin(psi) / np.sqrt(f)
+
+
+class Emitter:
+    """Base class: `rate` particles per frame (fractional rates accumulate)"""
+
+    def __init__(self, rate, kappa=0, energy=1.0):
+        self.rate = rate
+        self.kappa, self.energy = kappa, energy
+        self._carry = 0.0
+
+    def count(self):
+        self._carry += self.rate
+        n = int(self._carry)
+        self._carry -= n
+        return n
+
+    def sample(self, n, rng):
+        raise NotImplementedError
+
+
+class BeamEmitter(Emitter):
+    """Parallel rays starting at distance `distance` on the -x side, spread over ±half_width"""
+
+    def __init__(self, rate, distance=12.0, half_width=8.0, direction=0.0, **kwargs):
+        super().__init__(rate, **kwargs)
+        self.distance, self.half_width, self.direction = distance, half_width, direction
+
+    def sample(self, n, rng):
+        offset = rng.uniform(-self.half_width, self.half_width, n)
+        r = np.hypot(self.distance, offset)
+        # Heading is +x in the beam frame; ψ is measured counter-clockwise
+        # from the outward radial direction, so it is heading minus position angle
+        phi_beam = np.arctan2(offset, -self.distance)
+        psi = -phi_beam
+        return launch(r, phi_beam + self.direction, psi, self.kappa, self.energy)
+
+
+class PointEmitter(Emitter):
+    """Isotropic source at (r0, ϕ0)"""
+
+    def __init__(self, rate, r0=6.0, phi0=0.0, **kwargs):
+        super().__init__(rate, **kwargs)
+        self.r0, self.phi0 = r0, phi0
+
+    def sample(self, n, rng):
+        psi = rng.uniform(-np.pi, np.pi, n)
+        return launch(np.full(n, self.r0), np.full(n, self.phi0), psi, self.kappa, self.energy)
+
+
+class RingEmitter(Emitter):
+    """Sources spread round a ring of radius r0, emitting within ±spread of tangential"""
+
+    def __init__(self, rate, r0=5.0, spread=0.3, prograde=True, **kwargs):
+        super().__init__(rate, **kwargs)
+        self.r0, self.spread, self.prograde = r0, spread, prograde
+
+    def sample(self, n, rng):
+        phi = rng.uniform(0.0, 2 * np.pi, n)
+        psi = (np.pi / 2 if self.prograde else -np.pi / 2) + rng.uniform(-self.spread, self.spread, n)
+        return launch(np.full(n, self.r0), phi, psi, self.kappa, self.energy)
+
+
+def emit(system, emitters, rng):
+    """Spawn each emitter's quota into the pool's free slots; returns particles spawned"""
+    spawned = 0
+    for emitter in emitters:
+        n = min(emitter.count(), system.free_count)
+        if n:
+            r, phi, p, L = emitter.sample(n, rng)
+            spawned += len(system.spawn(r, phi, L, p))
+    return spawned
@@ -0,0 +1,193 @@
+# ensemble.py
+# Many independent universes advanced together. Members are stacked along a
+# leading batch axis (K, N, ...) so one numpy call does the force pass and
+# integration for all of them. Members with fewer bodies are padded with
+# massless, inactive bodies. Light bodies (test particles) get zero weight:
+# they move in the field but pull on nothing and are left out of diagnostics.
+#
+#   python ensemble.py --members 256 --steps 200
+import argparse
+import time
+import numpy as np
+from config import G, DT, SOFTENING
+from bodies import BodyState
+
+PAIR_BLOCK = 1 << 22  # K * N_t * N_s pairs per block
+
+
+def batched_accelerations(pos, mass, g, softening=SOFTENING, potential=False):
+    """
+    pos (K, N, 3), mass (K, N), g (K,) -> acc (K, N, 3) [, potential energy (K,)].
+    Same pair rule as Planet.update: pairs closer than softening are skipped.
+    """
+    k, n, _ = pos.shape
+    gm = (np.asarray(g, dtype=np.float64)[:, None] * mass)[:, None, :]  # (K, 1, N)
+    acc = np.empty_like(pos)
+    pot = np.zeros(k)
+    sx, sy, sz = (np.ascontiguousarray(pos[:, None, :, i]) for i in range(3))
+    block = max(1, PAIR_BLOCK // max(k * n, 1))
+    for start in range(0, n, block):
+        t = pos[:, start:start + block, :]
+        dx = sx - t[:, :, 0:1]
+        dy = sy - t[:, :, 1:2]
+        dz = sz - t[:, :, 2:3]
+        r2 = dx * dx
+        r2 += dy * dy
+        r2 += dz * dz
+        far = r2 >= softening
+        np.maximum(r2, softening, out=r2)
+        inv_r = np.sqrt(r2)
+        np.divide(far, inv_r, out=inv_r)  # 1/r, or 0 inside the softening cut
+        w = gm * inv_r
+        if potential:
+            # Each pair is visited twice over the full sweep, hence the 0.5
+            pot -= 0.5 * np.einsum("kij,ki->k", w, mass[:, start:start + block])
+        w *= inv_r * inv_r
+        # sum_j w_ij (x_j - x_i) as one batched matmul plus a row-sum term
+        acc[:, start:start + block] = w @ pos - w.sum(axis=2)[..., None] * t
+    return (acc, pot) if potential else acc
+
+
+class Ensemble:
+    """K independent systems; see from_states() to build one from BodyStates"""
+
+    def __init__(self, pos, vel, mass, g=G, dt=DT, softening=SOFTENING, active=None, light=None):
+        self.pos = np.array(pos, dtype=np.float64)
+        self.vel = np.array(vel, dtype=np.float64)
+        self.mass = np.array(mass, dtype=np.float64)
+        self.light = np.zeros(self.mass.shape, dtype=bool) if light is None else np.asarray(light)
+        self.weight = np.where(self.light, 0.0, self.mass)  # gravitating mass
+        k = len(self.pos)
+        self.g = np.broadcast_to(np.asarray(g, dtype=np.float64), (k,)).copy()
+        self.dt = dt
+        self.softening = softening
+        self.active = np.ones(self.mass.shape, dtype=bool) if active is None else np.asarray(active)
+        self.steps = 0
+        self.snapshots = []
+        self.initial = self.diagnostics()
+
+    @classmethod
+    def from_states(cls, states, g=G, **kwargs):
+        """Stack BodyStates of possibly different sizes (padded with inactive bodies)"""
+        k, n = len(states), max(len(s) for s in states)
+        pos, vel = np.zeros((k, n, 3)), np.zeros((k, n, 3))
+        mass = np.zeros((k, n))
+        active = np.zeros((k, n), dtype=bool)
+        light = np.zeros((k, n), dtype=bool)
+        for i, s in enumerate(states):
+            m = len(s)
+            pos[i, :m], vel[i, :m], mass[i, :m] = s.pos, s.vel, s.mass
+            light[i, :m] = s.light
+            # Park padding far away so it never enters the softening cut
+            pos[i, m:] = 1e12 * (1 + np.arange(n - m))[:, None]
+            active[i, :m] = True
+        return cls(pos, vel, mass, g=g, active=active, light=light, **kwargs)
+
+    def __len__(self):
+        return len(self.pos)
+
+    def step(self, n_steps=1, snapshot_every=0):
+        """Kick-drift every member n_steps times, optionally recording snapshots"""
+        for _ in range(n_steps):
+            acc = batched_accelerations(self.pos, self.weight, self.g, self.softening)
+            self.vel += acc * self.dt
+            self.pos += self.vel * self.dt * self.active[..., None]
+            self.steps += 1
+            if snapshot_every and self.steps % snapshot_every == 0:
+                self.snapshots.append((self.steps, self.pos.copy()))
+
+    def diagnostics(self):
+        """Per-member conserved quantities as a dict of (K,) / (K, 3) arrays"""
+        m = self.weight[..., None]
+        _, potential = batched_accelerations(self.pos, self.weight, self.g, self.softening,
+                                             potential=True)
+        kinetic = 0.5 * np.einsum("kn,kni,kni->k", self.weight, self.vel, self.vel)
+        return {
+            "kinetic": kinetic,
+            "potential": potential,
+            "energy": kinetic + potential,
+            "momentum": np.sum(m * self.vel, axis=1),
+            "angular_momentum": np.sum(np.cross(self.pos, m * self.vel), axis=1),
+        }
+
+    def summary(self):
+        """Per-member statistics relative to the initial state"""
+        now = self.diagnostics()
+        e0 = self.initial["energy"]
+        com = np.einsum("kn,kni->ki", self.weight, self.pos) / self.weight.sum(axis=1)[:, None]
+        speed = np.linalg.norm(self.vel, axis=2)
+        speed[~self.active] = 0.0
+        return {
+            **now,
+            "energy_drift": (now["energy"] - e0) / np.where(e0 != 0, np.abs(e0), 1.0),
+            "center_of_mass": com,
+            "max_speed": speed.max(axis=1),
+            "steps": self.steps,
+        }
+
+    def member(self, i):
+        """Member i as a BodyState (drops padding; colors are grey)"""
+        a = self.active[i]
+        n = int(a.sum())
+        return BodyState(self.pos[i, a], self.vel[i, a], self.mass[i, a],
+                         np.ones(n), (0.7, 0.7, 0.7), self.light[i, a])
+
+
+def solar_system_ensemble(members, g_spread=0.0, mass_spread=0.0, seed=0):
+    """Solar-system scene per member with varied seeds, G and mass scale"""
+    from scenarios import solar_system
+    rng = np.random.default_rng(seed)
+    states = [solar_system(seed=int(s)) for s in rng.integers(0, 2**31, members)]
+    for s in states:
+        s.mass *= 1.0 + rng.uniform(-mass_spread, mass_spread)
+    g = G * (1.0 + rng.uniform(-g_spread, g_spread, members))
+    return Ensemble.from_states(states, g=g)
+
+
+if __name__ == "__main__":
+    import gravity
+    parser = argparse.ArgumentParser(description="Batched ensemble benchmark")
+    parser.add_argument("--members", type=int, default=256)
+    parser.add_argument("--steps", type=int, default=200)
+    args = parser.parse_args()
+
+    ens = solar_system_ensemble(args.members, g_spread=0.1, mass_spread=0.1)
+    reference = [ens.member(i) for i in range(min(8, args.members))]
+
+    start = time.perf_counter()
+    ens.step(args.steps)
+    batched = (time.perf_counter() - start) / args.members
+
+    start = time.perf_counter()
+    for i, s in enumerate(reference):
+        for _ in range(args.steps):
+            gravity.step(s, DT, lambda p, m, g=ens.g[i]: gravity.accelerations(p, m, g), g=ens.g[i])
+    vectorized = (time.perf_counter() - start) / len(reference)
+
+    # Per-object loop equivalent to Planet.update, on one member
+    legacy = ens.member(0)
+    legacy_steps = max(1, args.steps // 20)
+    start = time.perf_counter()
+    for _ in range(legacy_steps):
+        for i in range(len(legacy)):
+            acc = np.zeros(3)
+            for j in range(len(legacy)):
+                if i == j or legacy.light[j]:
+                    continue
+                r_vec = legacy.pos[j] - legacy.pos[i]
+                r_sq = np.dot(r_vec, r_vec)
+                if r_sq < SOFTENING:
+                    continue
+                acc += ens.g[0] * legacy.mass[j] / r_sq * r_vec / np.sqrt(r_sq)
+            legacy.vel[i] += acc * DT
+            legacy.pos[i] += legacy.vel[i] * DT
+    per_object = (time.perf_counter() - start) / legacy_steps * args.steps
+
+    err = max(np.abs(ens.member(i).pos - s.pos).max() for i, s in enumerate(reference))
+    drift = ens.summary()["energy_drift"]
+    print(f"{args.members} members x {ens.pos.shape[1]} bodies, {args.steps} steps (ms per member)")
+    print(f"  batched ensemble:       {batched * 1000:8.2f}")
+    print(f"  vectorized, one by one: {vectorized * 1000:8.2f} ({vectorized / batched:.1f}x slower)")
+    print(f"  per-object Planet loop: {per_object * 1000:8.2f} ({per_object / batched:.0f}x slower)")
+    print(f"max deviation from one-by-one runs {err:.1e}; energy drift median "
+          f"{np.median(np.abs(drift)):.2e}, worst {np.abs(drift).max():.2e}")
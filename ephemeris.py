@@ -0,0 +1,287 @@
+# ephemeris.py
+# "On rails" bodies: selected bodies (typically the Sun and planets) follow
+# a precomputed trajectory table instead of being integrated, and their
+# positions feed the force field for everything else. Tables hold position and
+# velocity every `sample_dt` and are evaluated with cubic Hermite
+# interpolation; they grow on demand and are saved to cache/ under a hash of
+# the initial conditions, so many runs of the same scene share one table.
+#
+# Two ways to fill a table:
+#   keplerian   each body on its two-body orbit about the heaviest rails body
+#               (kepler.kepler_drift), ignoring the other rails bodies
+#   integrated  the rails bodies integrated among themselves with the same
+#               kick-drift steps as gravity.step. When everything else is
+#               light (test particles) this is exactly the motion a full
+#               run would give them.
+# Any other propagator (simulation.planet_propagator steps Planet objects)
+# gets the same table and cache through cached_ephemeris.
+# Rails bodies feel nothing from the free bodies, so a massive free body
+# does not perturb them.
+#
+#   python ephemeris.py --asteroids 20000 --steps 2000
+import argparse
+import hashlib
+import os
+import time
+import numpy as np
+from config import G, DT, SOFTENING
+import gravity
+from kepler import kepler_drift
+
+CACHE_DIR = "cache"
+SAMPLE_DT = 5 * DT     # table spacing
+CHUNK_SAMPLES = 1024   # the table grows by this many samples at a time
+MODES = ("integrated", "keplerian")
+
+
+# === Propagators: (pos, vel, dt) -> (pos, vel) for the rails bodies ===
+def keplerian_propagator(mass, g=G):
+    """Two-body orbits about the heaviest body, which moves uniformly"""
+    mass = np.asarray(mass, dtype=np.float64)
+    central = int(np.argmax(mass))
+    others = np.arange(len(mass)) != central
+    mu = g * (mass[central] + mass[others])
+
+    def advance(pos, vel, dt):
+        pos, vel = pos.copy(), vel.copy()
+        c_pos, c_vel = pos[central].copy(), vel[central].copy()
+        rel_pos, rel_vel = kepler_drift(mu, pos[others] - c_pos, vel[others] - c_vel, dt)
+        pos[central] = c_pos + c_vel * dt
+        pos[others] = rel_pos + pos[central]
+        vel[others] = rel_vel + c_vel
+        return pos, vel
+    return advance
+
+
+def integrated_propagator(mass, g=G, softening=SOFTENING, dt=DT):
+    """Kick-drift steps of dt among the rails bodies only (same arithmetic as gravity.step)"""
+    mass = np.asarray(mass, dtype=np.float64)
+
+    def advance(pos, vel, span):
+        pos, vel = pos.copy(), vel.copy()
+        for _ in range(max(1, int(round(span / dt)))):
+            vel += gravity.accelerations(pos, mass, g, softening) * dt
+            pos += vel * dt
+        return pos, vel
+    return advance
+
+
+# === Table ===
+class Ephemeris:
+    """
+    Trajectories of K bodies from time t0: at(t) -> (pos, vel), each (K, 3).
+    Samples are added by `advance` as later times are asked for.
+    """
+
+    def __init__(self, pos, vel, advance, sample_dt=SAMPLE_DT, t0=0.0, path=None):
+        pos = np.asarray(pos, dtype=np.float64).reshape(-1, 3)
+        self.advance = advance
+        self.sample_dt = float(sample_dt)
+        self.t0 = float(t0)
+        self.path = path
+        self.pos = np.empty((CHUNK_SAMPLES,) + pos.shape)
+        self.vel = np.empty_like(self.pos)
+        self.pos[0], self.vel[0] = pos, vel
+        self.count = 1
+        self.saved_count = 0
+
+    def __len__(self):
+        return self.pos.shape[1]
+
+    @property
+    def t_end(self):
+        return self.t0 + (self.count - 1) * self.sample_dt
+
+    def extend_to(self, t):
+        """Sample far enough to cover time t"""
+        needed = int(np.ceil((t - self.t0) / self.sample_dt - 1e-9)) + 2
+        if needed > len(self.pos):
+            size = max(needed, 2 * len(self.pos))
+            for name in ("pos", "vel"):
+                old = getattr(self, name)
+                new = np.empty((size,) + old.shape[1:])
+                new[:self.count] = old[:self.count]
+                setattr(self, name, new)
+        while self.count < needed:
+            i = self.count
+            self.pos[i], self.vel[i] = self.advance(self.pos[i - 1], self.vel[i - 1], self.sample_dt)
+            self.count += 1
+
+    def sample(self, i):
+        """Stored sample i (time t0 + i * sample_dt), exactly as it was computed"""
+        self.extend_to(self.t0 + i * self.sample_dt)
+        return self.pos[i].copy(), self.vel[i].copy()
+
+    def at(self, t):
+        """Cubic Hermite interpolation of position and velocity at time t"""
+        if t < self.t0:
+            raise ValueError(f"Ephemeris starts at t={self.t0}, asked for t={t}")
+        self.extend_to(t)
+        h = self.sample_dt
+        u = (t - self.t0) / h
+        i = min(int(u), self.count - 2)
+        s = u - i
+        p0, p1, v0, v1 = self.pos[i], self.pos[i + 1], self.vel[i], self.vel[i + 1]
+        s2, s3 = s * s, s * s * s
+        pos = ((2 * s3 - 3 * s2 + 1) * p0 + (s3 - 2 * s2 + s) * h * v0
+               + (3 * s2 - 2 * s3) * p1 + (s3 - s2) * h * v1)
+        vel = ((6 * s2 - 6 * s) * (p0 - p1) / h + (3 * s2 - 4 * s + 1) * v0
+               + (3 * s2 - 2 * s) * v1)
+        return pos, vel
+
+    def save(self, path=None):
+        """Write the samples (only if the table grew since it was last saved)"""
+        path = path or self.path
+        if path is None or self.count <= self.saved_count:
+            return
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(path, pos=self.pos[:self.count], vel=self.vel[:self.count],
+                            sample_dt=self.sample_dt, t0=self.t0)
+        self.saved_count = self.count
+
+    def _load(self, path):
+        with np.load(path) as data:
+            if float(data["sample_dt"]) != self.sample_dt or data["pos"].shape[1:] != self.pos.shape[1:]:
+                return
+            spare = np.empty((CHUNK_SAMPLES,) + self.pos.shape[1:])
+            self.pos = np.concatenate([data["pos"], spare])
+            self.vel = np.concatenate([data["vel"], spare])
+            self.count = self.saved_count = len(data["pos"])
+
+
+def ephemeris_for(state, rails, mode="integrated", g=G, softening=SOFTENING, dt=DT,
+                  sample_dt=SAMPLE_DT, cache_dir=CACHE_DIR):
+    """
+    Ephemeris for bodies `rails` (indices into a BodyState) starting from
+    their current state, loaded from the cache when one was saved for the
+    same bodies and settings
+    """
+    rails = np.asarray(rails, dtype=np.int64)
+    pos, vel, mass = state.pos[rails], state.vel[rails], state.mass[rails]
+    if mode == "keplerian":
+        advance = keplerian_propagator(mass, g)
+    elif mode == "integrated":
+        advance = integrated_propagator(mass, g, softening, dt)
+    else:
+        raise ValueError(f"Unknown ephemeris mode '{mode}' (choose from {', '.join(MODES)})")
+    return cached_ephemeris(pos, vel, advance, mode, (mass, [g, softening, dt]), sample_dt, cache_dir)
+
+
+def cached_ephemeris(pos, vel, advance, mode, key=(), sample_dt=SAMPLE_DT, cache_dir=CACHE_DIR):
+    """
+    Ephemeris filled by any `advance`, saved as cache/ephemeris_<mode>_<hash>.npz;
+    the hash covers pos, vel, sample_dt and the arrays in `key` (whatever
+    else the propagator depends on)
+    """
+    digest = hashlib.sha1()
+    for part in (pos, vel, [sample_dt]) + tuple(key):
+        digest.update(np.ascontiguousarray(part, dtype=np.float64).tobytes())
+    path = os.path.join(cache_dir, f"ephemeris_{mode}_{digest.hexdigest()[:16]}.npz")
+    ephemeris = Ephemeris(pos, vel, advance, sample_dt, path=path)
+    if os.path.exists(path):
+        try:
+            ephemeris._load(path)
+        except (OSError, KeyError, ValueError):
+            pass
+    return ephemeris
+
+
+def default_rails(state):
+    """The massive bodies when the rest are test particles, else the heaviest body"""
+    light = getattr(state, "light", None)
+    if light is not None and light.any() and not light.all():
+        return np.nonzero(~light)[0]
+    return np.array([int(np.argmax(state.mass))])
+
+
+# === Integrator ===
+class OnRails:
+    """
+    step(state, dt) for a BodyState whose `rails` bodies follow an Ephemeris:
+    they are set from the table, and only the other bodies are kicked and
+    drifted. On a BodyStore, `rails` are body ids, so edits and reordering
+    are fine. Without an acc_fn the field is a direct sum over the massive
+    bodies evaluated only at the free ones (no rails-rails pairs at all).
+    """
+
+    def __init__(self, ephemeris, rails, acc_fn=None, g=G, softening=SOFTENING, t=0.0):
+        self.ephemeris = ephemeris
+        self.rails = np.asarray(rails, dtype=np.int64)
+        self.g = g
+        self.softening = softening
+        self.acc_fn = acc_fn
+        self.t = t
+        self.steps = 0
+
+    def _indices(self, state):
+        indices = getattr(state, "indices", None)
+        return indices(self.rails) if indices is not None else self.rails
+
+    def step(self, state, dt):
+        """Advance `state` in place by dt; returns the accelerations used"""
+        rails = self._indices(state)
+        state.pos[rails], state.vel[rails] = self.ephemeris.at(self.t)
+        light = getattr(state, "light", None)
+        if self.acc_fn is None:
+            free = np.ones(len(state), dtype=bool)
+            free[rails] = False
+            sources = ~light if light is not None else np.ones(len(state), dtype=bool)
+            acc = np.zeros((len(state), 3))
+            acc[free] = gravity.accelerations_from(state.pos[free], state.pos[sources],
+                                                   state.mass[sources], self.g, self.softening)
+        elif light is not None and light.any():
+            acc = gravity.split_accelerations(state.pos, state.mass, light, self.acc_fn,
+                                              self.g, self.softening)
+        else:
+            acc = self.acc_fn(state.pos, state.mass)
+        # Rails bodies are drifted too, then overwritten: cheaper than masking
+        state.vel += acc * dt
+        state.pos += state.vel * dt
+        self.t += dt
+        self.steps += 1
+        state.pos[rails], state.vel[rails] = self.ephemeris.at(self.t)
+        return acc
+
+
+if __name__ == "__main__":
+    from scenarios import create_scenario
+    parser = argparse.ArgumentParser(description="On-rails major bodies vs full integration")
+    parser.add_argument("--asteroids", type=int, default=20000)
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    for name in ("solar_system", "planetary_system"):
+        def scene():
+            kwargs = {"n_asteroids" if name == "solar_system" else "n": args.asteroids}
+            return create_scenario(name, seed=args.seed, **kwargs)
+
+        reference = scene()
+        start = time.perf_counter()
+        for _ in range(args.steps):
+            gravity.step(reference, DT)
+        full = time.perf_counter() - start
+        rails = default_rails(reference)
+        free = np.ones(len(reference), dtype=bool)
+        free[rails] = False
+        print(f"{name}: {len(rails)} rails bodies, {free.sum()} free, {args.steps} steps of DT")
+        print(f"  full kick-drift:                 {full:6.2f}s")
+
+        for mode, sample_dt in (("integrated", DT), ("integrated", SAMPLE_DT), ("keplerian", SAMPLE_DT)):
+            state = scene()
+            start = time.perf_counter()
+            ephemeris = ephemeris_for(state, rails, mode, sample_dt=sample_dt)
+            cached = ephemeris.count > 1
+            ephemeris.extend_to(args.steps * DT)
+            ephemeris.save()
+            build = time.perf_counter() - start
+            integrator = OnRails(ephemeris, rails)
+            start = time.perf_counter()
+            for _ in range(args.steps):
+                integrator.step(state, DT)
+            elapsed = time.perf_counter() - start
+            rails_err = np.abs(state.pos[rails] - reference.pos[rails]).max()
+            free_err = np.median(np.linalg.norm(state.pos[free] - reference.pos[free], axis=1))
+            print(f"  rails {mode:10s} h={sample_dt:.2f}: {elapsed:6.2f}s + table {build:5.2f}s "
+                  f"({'cached' if cached else 'built'}); rails error {rails_err:.1e}, "
+                  f"median free-body error {free_err:.1e}")
@@ -0,0 +1,56 @@
+# floating_origin.py
+import numpy as np
+
+# Distance (world units) the camera focus may drift from the render origin
+# before the origin is rebased onto it
+REBASE_DISTANCE = 2000.0
+
+
+class FloatingOrigin:
+    """
+    Double-precision render origin that follows the camera.
+    Physics keeps absolute float64 positions; the renderer only ever sees
+    float32 offsets from this origin, so vertices stay precise near the camera.
+    """
+
+    def __init__(self, rebase_distance=REBASE_DISTANCE):
+        self.origin = np.zeros(3, dtype=np.float64)
+        self.rebase_distance = rebase_distance
+        self.rebase_count = 0
+
+    def update(self, focus):
+        """Rebase onto the camera focus if it drifted too far. Returns True on rebase."""
+        focus = np.asarray(focus, dtype=np.float64)
+        if np.max(np.abs(focus - self.origin)) <= self.rebase_distance:
+            return False
+        self.origin = focus.copy()
+        self.rebase_count += 1
+        return True
+
+    def to_local(self, positions, out=None):
+        """
+        Convert (N, 3) float64 world positions to float32 camera-relative ones.
+        Pass a preallocated float32 `out` buffer to avoid a per-frame allocation.
+        """
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        if out is None or out.shape != positions.shape:
+            out = np.empty(positions.shape, dtype=np.float32)
+        np.subtract(positions, self.origin, out=out, casting="same_kind")
+        return out
+
+    def to_world(self, local):
+        """Inverse of to_local, in float64."""
+        return np.asarray(local, dtype=np.float64) + self.origin
+
+    def view_offset(self, cam_pos, zoom):
+        """
+        Translation for the modelview matrix so that drawing local coordinates
+        matches the old `glTranslatef(-cam); glScalef(zoom)` on world coordinates.
+        The large terms cancel in float64 before anything reaches the GPU.
+        """
+        return zoom * self.origin - np.asarray(cam_pos, dtype=np.float64)
+
+
+def camera_focus(cam_pos, zoom):
+    """World-space point the camera is looking at (on the z = 0 plane)."""
+    return (cam_pos[0] / zoom, cam_pos[1] / zoom, 0.0)
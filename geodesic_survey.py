@@ -0,0 +1,261 @@
+# geodesic_survey.py
+# Headless sweep of equatorial Schwarzschild geodesics (G = c = 1) over a grid
+# of starting radius r0, angular momentum L and particle type κ (0 photon,
+# 1 massive), with the same equations and Dormand-Prince steps as the
+# interactive viewer. Each geodesic starts at ϕ = 0 with radial velocity p0
+# and ends in one of:
+#   capture     crossed the horizon
+#   escape      left past escape_radius, unbound, without ever moving inward
+#   perihelion  fell inward, turned at a perihelion, then escaped (a flyby)
+#   bound       two perihelion passages (precession measured), or still
+#               orbiting when the affine budget ran out
+# A geodesic still short of escape_radius when the budget runs out counts as
+# escape/perihelion if it is unbound and moving outward.
+# Chunks of the grid are integrated in a process pool. Results go to one
+# compressed .npz in cache/, named by a hash of the parameters, so asking for
+# the same survey again just loads the file.
+#
+#   python geodesic_survey.py --nr 128 --nL 128 --kappa 0 1
+import argparse
+import glob
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import time
+import numpy as np
+from geodesics import dp45_step, dense_eval, derivatives, new_step_size, H_MIN
+
+CACHE_DIR = "cache"
+SURVEY_VERSION = 2       # bump when the integration or classification changes
+CHUNK_SIZE = 1024        # geodesics per pool task
+MAX_STEPS = 50000        # step attempts per chunk before leftovers count as bound
+
+CAPTURE, ESCAPE, PERIHELION, BOUND = range(4)
+OUTCOMES = ("capture", "escape", "perihelion", "bound")
+OUTCOME_COLORS = ((150, 20, 20), (60, 110, 230), (240, 200, 40), (40, 180, 70))
+
+# L starts one grid step above 0: a photon (κ=0) with L = 0 and p0 = 0 has no
+# momentum at all, so it is not a geodesic (see survey_params)
+DEFAULTS = dict(r_min=3.0, r_max=20.0, nr=128, L_min=0.0625, L_max=8.0, nL=128,
+                kappa=(0, 1), p0=0.0, horizon=2.0, escape_radius=50.0, max_lambda=2000.0)
+
+
+def specific_energy(y, L, kappa):
+    """p²/2 + V(r), conserved by derivatives(); V -> 0 at infinity"""
+    r, p = y[0], y[1]
+    L2 = L * L
+    v = L2 / (2 * r * r) - L2 / r ** 3
+    if kappa == 1:
+        v = v - 1.0 / r + 1.0 / (2 * r * r)
+    return 0.5 * p * p + v
+
+
+# === Integration ===
+def integrate_chunk(r0, L, kappa, p0=0.0, horizon=2.0, escape_radius=50.0, max_lambda=2000.0):
+    """Run one batch of geodesics to an outcome; returns a dict of (N,) arrays"""
+    n = len(r0)
+    y = np.stack([np.asarray(r0, dtype=np.float64), np.full(n, float(p0)), np.zeros(n)])
+    L = np.asarray(L, dtype=np.float64)
+    k1 = derivatives(y, L, kappa)
+    h = np.full(n, 0.01)
+    lam = np.zeros(n)
+    steps = np.zeros(n, dtype=np.int64)
+    outcome = np.full(n, BOUND, dtype=np.int8)
+    r_min, r_max = y[0].copy(), y[0].copy()
+    dipped = y[1] < 0
+    peri_count = np.zeros(n, dtype=np.int64)
+    peri_phi = np.full((2, n), np.nan)
+    unbound = specific_energy(y, L, kappa) >= 0
+
+    # Starting at rest on the way out: r0 itself is the first perihelion
+    at_peri = (y[1] == 0) & (k1[1] > 0)
+    peri_count[at_peri] = 1
+    peri_phi[0, at_peri] = 0.0
+
+    active = y[0] >= horizon
+    outcome[~active] = CAPTURE
+    for _ in range(MAX_STEPS):
+        idx = np.nonzero(active)[0]
+        if len(idx) == 0:
+            break
+        yi = y[:, idx]
+        hi = np.minimum(h[idx], max_lambda - lam[idx])
+        y_new, k7, err, dense = dp45_step(yi, k1[:, idx], hi, L[idx], kappa)
+        accepted = (err <= 1.0) | (hi <= H_MIN)
+        h[idx] = new_step_size(hi, err, accepted)
+
+        acc = idx[accepted]
+        y_old, y_acc = yi[:, accepted], y_new[:, accepted]
+        y[:, acc], k1[:, acc] = y_acc, k7[:, accepted]
+        lam[acc] += hi[accepted]
+        steps[acc] += 1
+        r_min[acc] = np.minimum(r_min[acc], y_acc[0])
+        r_max[acc] = np.maximum(r_max[acc], y_acc[0])
+        dipped[acc] |= y_acc[1] < 0
+
+        # Perihelion: p crosses zero upwards; locate it inside the step with dense output
+        turned = (y_old[1] < 0) & (y_acc[1] >= 0)
+        if turned.any():
+            sub = np.nonzero(turned)[0]
+            theta = y_old[1, sub] / (y_old[1, sub] - y_acc[1, sub])
+            phi = dense_eval(tuple(c[:, accepted][:, sub] for c in dense), theta)[2]
+            who = acc[sub]
+            first = peri_count[who] == 0
+            peri_phi[0, who[first]] = phi[first]
+            peri_phi[1, who[~first]] = phi[~first]
+            peri_count[who] += 1
+
+        r = y[0, acc]
+        captured = r < horizon
+        escaped = ~captured & (r > escape_radius) & (y[1, acc] > 0) & unbound[acc]
+        outcome[acc[captured]] = CAPTURE
+        outcome[acc[escaped]] = np.where(dipped[acc[escaped]], PERIHELION, ESCAPE)
+        done = captured | escaped | (peri_count[acc] >= 2) | (lam[acc] >= max_lambda - 1e-9)
+        active[acc[done]] = False
+
+    # Out of budget (affine or steps) on the way out while unbound: it will
+    # escape, it just has not reached escape_radius yet
+    leaving = (outcome == BOUND) & unbound & (y[1] > 0)
+    outcome[leaving] = np.where(dipped[leaving], PERIHELION, ESCAPE)
+
+    return {
+        "outcome": outcome, "r_min": r_min, "r_max": r_max,
+        "phi": y[2], "precession": peri_phi[1] - peri_phi[0] - 2 * np.pi,
+        "lambda": lam, "steps": steps,
+    }
+
+
+def _run_chunk(task):
+    return integrate_chunk(*task)
+
+
+# === Survey ===
+def survey_params(**overrides):
+    """Full parameter set (defaults plus overrides), normalised for hashing"""
+    unknown = set(overrides) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"unknown survey parameters: {sorted(unknown)}")
+    params = {**DEFAULTS, **{k: v for k, v in overrides.items() if v is not None}}
+    for key in ("nr", "nL"):
+        params[key] = int(params[key])
+    params["kappa"] = [int(k) for k in np.atleast_1d(params["kappa"])]
+    for key, value in params.items():
+        if key not in ("nr", "nL", "kappa"):
+            params[key] = float(value)
+    if 0 in params["kappa"] and params["p0"] == 0 and params["L_min"] <= 0 <= params["L_max"]:
+        raise ValueError("photons (κ=0) with p0 = 0 need L_min > 0: L = 0 would be a "
+                         "zero-momentum point, not a geodesic")
+    return params
+
+
+def survey_path(params, cache_dir=CACHE_DIR):
+    blob = json.dumps({"version": SURVEY_VERSION, **params}, sort_keys=True)
+    digest = hashlib.sha1(blob.encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f"geodesic_survey_{digest}.npz")
+
+
+def run_survey(workers=None, cache_dir=CACHE_DIR, refresh=False, **overrides):
+    """
+    Survey for these parameters, loaded from the cache when present.
+    Result arrays are indexed [kappa, r0, L].
+    """
+    params = survey_params(**overrides)
+    path = survey_path(params, cache_dir)
+    if not refresh and os.path.exists(path):
+        try:
+            return load_survey(path)
+        except (OSError, KeyError, ValueError):
+            pass
+
+    r0_axis = np.linspace(params["r_min"], params["r_max"], params["nr"])
+    L_axis = np.linspace(params["L_min"], params["L_max"], params["nL"])
+    r0, L = (a.ravel() for a in np.meshgrid(r0_axis, L_axis, indexing="ij"))
+    tasks = [(r0[s:s + CHUNK_SIZE], L[s:s + CHUNK_SIZE], kappa, params["p0"],
+              params["horizon"], params["escape_radius"], params["max_lambda"])
+             for kappa in params["kappa"] for s in range(0, len(r0), CHUNK_SIZE)]
+
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    if workers > 1 and len(tasks) > 1:
+        with mp.Pool(min(workers, len(tasks))) as pool:
+            parts = pool.map(_run_chunk, tasks)
+    else:
+        parts = [_run_chunk(t) for t in tasks]
+    shape = (len(params["kappa"]), params["nr"], params["nL"])
+    result = {key: np.concatenate([p[key] for p in parts]).reshape(shape) for key in parts[0]}
+    result.update(r0=r0_axis, L=L_axis, kappa=np.array(params["kappa"]),
+                  params=np.array(json.dumps(params)), seconds=np.array(time.perf_counter() - start))
+
+    os.makedirs(cache_dir, exist_ok=True)
+    np.savez_compressed(path, **result)
+    result["path"] = path
+    return result
+
+
+def load_survey(path):
+    """Survey dict from a saved .npz (params decoded back to a dict)"""
+    with np.load(path) as data:
+        result = {key: data[key] for key in data.files}
+    result["params"] = json.loads(str(result["params"]))
+    result["path"] = path
+    return result
+
+
+def latest_survey(cache_dir=CACHE_DIR):
+    """Most recently written survey in cache_dir, or None"""
+    paths = glob.glob(os.path.join(cache_dir, "geodesic_survey_*.npz"))
+    return load_survey(max(paths, key=os.path.getmtime)) if paths else None
+
+
+def outcome_image(survey, kappa):
+    """RGBA uint8 (nL, nr) map of outcomes for one κ: r0 along x, L up y"""
+    k = list(survey["kappa"]).index(kappa)
+    colors = np.full((len(OUTCOMES), 4), 255, dtype=np.uint8)
+    colors[:, :3] = OUTCOME_COLORS
+    return np.ascontiguousarray(colors[survey["outcome"][k]].transpose(1, 0, 2))
+
+
+def summary(survey):
+    lines = []
+    for k, kappa in enumerate(survey["kappa"]):
+        counts = np.bincount(survey["outcome"][k].ravel(), minlength=len(OUTCOMES))
+        total = counts.sum()
+        parts = ", ".join(f"{name} {c / total:.1%}" for name, c in zip(OUTCOMES, counts))
+        lines.append(f"κ={kappa} ({'massive' if kappa else 'photon'}): {parts}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless Schwarzschild geodesic survey")
+    parser.add_argument("--r-min", type=float)
+    parser.add_argument("--r-max", type=float)
+    parser.add_argument("--nr", type=int, help="grid points in r0")
+    parser.add_argument("--L-min", type=float)
+    parser.add_argument("--L-max", type=float)
+    parser.add_argument("--nL", type=int, help="grid points in L")
+    parser.add_argument("--kappa", type=int, nargs="+", choices=(0, 1))
+    parser.add_argument("--p0", type=float, help="initial dr/dλ (negative = inward)")
+    parser.add_argument("--escape-radius", type=float)
+    parser.add_argument("--max-lambda", type=float, help="affine budget per geodesic")
+    parser.add_argument("--workers", type=int, default=None, help="pool size (default: all cores)")
+    parser.add_argument("--refresh", action="store_true", help="ignore a cached result")
+    args = parser.parse_args()
+
+    overrides = {key: getattr(args, key) for key in DEFAULTS if hasattr(args, key)}
+    start = time.perf_counter()
+    survey = run_survey(workers=args.workers, refresh=args.refresh, **overrides)
+    elapsed = time.perf_counter() - start
+    n = survey["outcome"].size
+    print(f"{n} geodesics in {elapsed:.2f}s (computed in {float(survey['seconds']):.2f}s) "
+          f"-> {survey['path']}")
+    for line in summary(survey):
+        print("  " + line)
+    bound = (survey["outcome"] == BOUND) & np.isfinite(survey["precession"])
+    if bound.any():
+        print(f"  perihelion precession of bound orbits: median "
+              f"{np.degrees(np.median(survey['precession'][bound])):.1f}°")
+
+
+if __name__ == "__main__":
+    main()
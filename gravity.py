@@ -0,0 +1,376 @@
+# gravity.py
+# Vectorized force kernels on plain arrays. Same physics as Planet.update:
+# a_i = sum_j G m_j r_ij / |r_ij|^3, with pairs closer than SOFTENING skipped.
+# Unit tests: test_gravity.py; benchmarks: python gravity.py light|mixed
+import numpy as np
+from config import G, SOFTENING
+
+# Max target x source pairs evaluated at once (bounds temporary memory)
+PAIR_BLOCK = 1 << 21
+# Mixed precision: sources per float32 partial sum (partials are added in float64)
+SUM_BLOCK = 256
+
+
+def accelerations_from(targets, sources, source_mass, g=G, softening=SOFTENING, out=None,
+                       potential=None):
+    """
+    Acceleration on each target from every source, (N_t, 3). Pass an (N_t,)
+    `potential` array to also get each target's potential -sum G m_j / r_ij
+    from the same pass.
+    """
+    targets = np.asarray(targets, dtype=np.float64).reshape(-1, 3)
+    sources = np.asarray(sources, dtype=np.float64).reshape(-1, 3)
+    gm = g * np.asarray(source_mass, dtype=np.float64)
+    if out is None:
+        out = np.zeros((len(targets), 3))
+    else:
+        out[:] = 0.0
+    if potential is not None:
+        potential[:] = 0.0
+    if len(sources) == 0:
+        return out
+
+    # Per-axis 2D blocks are much faster than one (N_t, N_s, 3) temporary
+    sx, sy, sz = np.ascontiguousarray(sources.T)
+    block = max(1, PAIR_BLOCK // len(sources))
+    for start in range(0, len(targets), block):
+        t = targets[start:start + block]
+        dx = sx - t[:, 0:1]
+        dy = sy - t[:, 1:2]
+        dz = sz - t[:, 2:3]
+        r2 = dx * dx
+        r2 += dy * dy
+        r2 += dz * dz
+        close = r2 < softening
+        r2[close] = 1.0
+        w = np.sqrt(r2)
+        if potential is not None:
+            phi = gm / w
+            phi[close] = 0.0
+            potential[start:start + block] = -phi.sum(axis=1)
+        w *= r2
+        np.divide(gm, w, out=w)
+        w[close] = 0.0
+        out[start:start + block, 0] = np.einsum("ij,ij->i", w, dx)
+        out[start:start + block, 1] = np.einsum("ij,ij->i", w, dy)
+        out[start:start + block, 2] = np.einsum("ij,ij->i", w, dz)
+    return out
+
+
+def accelerations_from_mixed(targets, sources, source_mass, g=G, softening=SOFTENING, out=None,
+                             sum_block=SUM_BLOCK):
+    """
+    accelerations_from with float32 pair terms: half the memory traffic and
+    twice the SIMD width in the bandwidth-bound pass. Positions are shifted to
+    the sources' bounding-box centre in float64 before rounding, so
+    separations lose only float32 precision relative to the scene's extent.
+    Each target's sum is split into float32 partials over sum_block sources,
+    which are accumulated in float64. Inputs and output stay float64.
+    """
+    targets = np.asarray(targets, dtype=np.float64).reshape(-1, 3)
+    sources = np.asarray(sources, dtype=np.float64).reshape(-1, 3)
+    if out is None:
+        out = np.zeros((len(targets), 3))
+    else:
+        out[:] = 0.0
+    if len(sources) == 0:
+        return out
+
+    # Per-axis float32 rows, padded to whole sum blocks with massless sources
+    centre = 0.5 * (sources.min(axis=0) + sources.max(axis=0))
+    n = len(sources) + (-len(sources)) % sum_block
+    sx, sy, sz = s = np.zeros((3, n), dtype=np.float32)
+    s[:, :len(sources)] = (sources - centre).T
+    gm = np.zeros(n, dtype=np.float32)
+    gm[:len(sources)] = g * np.asarray(source_mass, dtype=np.float64)
+    local = (targets - centre).astype(np.float32)
+    soft = np.float32(softening)
+    block = max(1, PAIR_BLOCK // n)
+    for start in range(0, len(targets), block):
+        t = local[start:start + block]
+        dx = sx - t[:, 0:1]
+        dy = sy - t[:, 1:2]
+        dz = sz - t[:, 2:3]
+        r2 = dx * dx
+        r2 += dy * dy
+        r2 += dz * dz
+        close = r2 < soft
+        r2[close] = 1.0
+        w = np.sqrt(r2)
+        w *= r2
+        np.divide(gm, w, out=w)
+        w[close] = 0.0
+        for k, d in enumerate((dx, dy, dz)):
+            d *= w
+            partial = d.reshape(len(t), n // sum_block, sum_block).sum(axis=2)
+            out[start:start + block, k] = partial.sum(axis=1, dtype=np.float64)
+    return out
+
+
+def accelerations(pos, mass, g=G, softening=SOFTENING, out=None, potential=None):
+    """Self-gravity of one set of bodies (self-pairs fall under the softening cut)"""
+    return accelerations_from(pos, pos, mass, g, softening, out, potential)
+
+
+def split_accelerations(pos, mass, light, acc_fn=accelerations, g=G, softening=SOFTENING):
+    """
+    Accelerations when `light` bodies are test particles: massive bodies
+    interact through acc_fn as usual, light ones only feel the massive ones
+    (direct sum, O(N_light * N_massive)) and pull on nothing.
+    """
+    massive = ~light
+    out = np.empty((len(mass), 3))
+    out[massive] = acc_fn(pos[massive], mass[massive])
+    out[light] = accelerations_from(pos[light], pos[massive], mass[massive], g, softening)
+    return out
+
+
+def step(state, dt, acc_fn=accelerations, g=G, softening=SOFTENING):
+    """
+    Advance a BodyState by one kick-drift (semi-implicit Euler) step.
+    g/softening only set the field on light bodies; acc_fn has its own.
+    """
+    light = getattr(state, "light", None)
+    if light is not None and light.any():
+        acc = split_accelerations(state.pos, state.mass, light, acc_fn, g, softening)
+    else:
+        acc = acc_fn(state.pos, state.mass)
+    state.vel += acc * dt
+    state.pos += state.vel * dt
+    return acc
+
+
+# === Solvers ===
+SOLVERS = ("direct", "pm", "p3m")
+PRECISIONS = ("float64", "mixed")
+
+
+def make_solver(name="direct", g=G, softening=SOFTENING, precision="float64", **kwargs):
+    """
+    acc_fn(pos, mass) for step(): "direct" sum, or the particle-mesh solver
+    ("pm", or "p3m" with the short-range correction; kwargs go to ParticleMesh).
+    precision="mixed" selects the float32 pair kernel for the direct sum.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}' (choose from {', '.join(PRECISIONS)})")
+    if name == "direct":
+        if precision == "mixed":
+            return lambda pos, mass: accelerations_from_mixed(pos, pos, mass, g, softening)
+        return lambda pos, mass: accelerations(pos, mass, g, softening)
+    if precision != "float64":
+        raise ValueError(f"precision '{precision}' is only available for the direct solver")
+    if name in ("pm", "p3m"):
+        from particle_mesh import ParticleMesh
+        return ParticleMesh(g=g, softening=softening, p3m=name == "p3m", **kwargs)
+    raise ValueError(f"Unknown solver '{name}' (choose from {', '.join(SOLVERS)})")
+
+
+# === Multipoles ===
+def multipole(pos, mass):
+    """Monopole and traceless quadrupole about the centre of mass: (M, com, Q)"""
+    pos = np.asarray(pos, dtype=np.float64).reshape(-1, 3)
+    total = float(np.sum(mass))
+    if total <= 0.0:
+        return 0.0, np.zeros(3), np.zeros((3, 3))
+    com = (mass @ pos) / total
+    x = pos - com
+    r2 = np.einsum("ij,ij->i", x, x)
+    q = 3.0 * np.einsum("i,ij,ik->jk", mass, x, x) - np.eye(3) * np.dot(mass, r2)
+    return total, com, q
+
+
+def multipole_accelerations(targets, total, com, q, g=G, softening=SOFTENING):
+    """Far-field acceleration on targets from a (M, com, Q) expansion"""
+    targets = np.asarray(targets, dtype=np.float64).reshape(-1, 3)
+    if total <= 0.0 or len(targets) == 0:
+        return np.zeros((len(targets), 3))
+    x = targets - com
+    r2 = np.maximum(np.einsum("ij,ij->i", x, x), softening)
+    inv_r = 1.0 / np.sqrt(r2)
+    inv_r3 = inv_r / r2
+    inv_r5 = inv_r3 / r2
+    qx = x @ q
+    xqx = np.einsum("ij,ij->i", qx, x)
+    return g * (-total * inv_r3[:, None] * x
+                + inv_r5[:, None] * qx
+                - 2.5 * (xqx * inv_r5 / r2)[:, None] * x)
+
+
+# === Cell Multipoles ===
+# Aligned grid of cubic cells; used by distributed.py for the far field.
+def cell_keys(pos, cell_size):
+    """Integer (N, 3) cell coordinates on a grid aligned to the world origin"""
+    return np.floor(np.asarray(pos) / cell_size).astype(np.int64)
+
+
+def cell_multipoles(pos, mass, cell_size):
+    """
+    Monopole + quadrupole of every occupied cell.
+    Returns keys (C, 3) int64 and a table (C, 13) of [M, com(3), Q(9)].
+    """
+    pos = np.asarray(pos, dtype=np.float64).reshape(-1, 3)
+    if len(pos) == 0:
+        return np.zeros((0, 3), dtype=np.int64), np.zeros((0, 13))
+    # Unique on linearised keys; np.unique(axis=0) is several times slower
+    keys3 = cell_keys(pos, cell_size)
+    low = keys3.min(axis=0)
+    dims = keys3.max(axis=0) - low + 1
+    k = keys3 - low
+    linear, inv = np.unique((k[:, 0] * dims[1] + k[:, 1]) * dims[2] + k[:, 2], return_inverse=True)
+    keys = np.stack(np.unravel_index(linear, tuple(dims)), axis=1) + low
+    inv = inv.ravel()
+    c = len(keys)
+    total = np.bincount(inv, mass, c)
+    safe = np.where(total > 0, total, 1.0)
+    com = np.stack([np.bincount(inv, mass * pos[:, k], c) for k in range(3)], axis=1) / safe[:, None]
+    x = pos - com[inv]
+    r2 = np.einsum("ij,ij->i", x, x)
+    q = np.empty((c, 3, 3))
+    for a in range(3):
+        for b in range(a, 3):
+            term = 3.0 * x[:, a] * x[:, b] - (r2 if a == b else 0.0)
+            q[:, a, b] = q[:, b, a] = np.bincount(inv, mass * term, c)
+    return keys, np.concatenate([total[:, None], com, q.reshape(c, 9)], axis=1)
+
+
+def cell_field_accelerations(targets, table, g=G, softening=SOFTENING,
+                             target_keys=None, keys=None, skip_adjacent=False):
+    """
+    Acceleration on targets from a table of cell multipoles. With
+    skip_adjacent, cells within one cell of the target's own cell are ignored
+    (the caller handles those exactly).
+    """
+    targets = np.asarray(targets, dtype=np.float64).reshape(-1, 3)
+    out = np.zeros((len(targets), 3))
+    if len(table) == 0 or len(targets) == 0:
+        return out
+    total = table[:, 0]
+    cx, cy, cz = table[:, 1], table[:, 2], table[:, 3]
+    q = table[:, 4:].T
+    block = max(1, PAIR_BLOCK // len(table))
+    for start in range(0, len(targets), block):
+        t = targets[start:start + block]
+        dx = t[:, 0:1] - cx
+        dy = t[:, 1:2] - cy
+        dz = t[:, 2:3] - cz
+        r2 = np.maximum(dx * dx + dy * dy + dz * dz, softening)
+        inv_r2 = 1.0 / r2
+        inv_r3 = np.sqrt(inv_r2) * inv_r2
+        inv_r5 = inv_r3 * inv_r2
+        qx = q[0] * dx + q[1] * dy + q[2] * dz
+        qy = q[3] * dx + q[4] * dy + q[5] * dz
+        qz = q[6] * dx + q[7] * dy + q[8] * dz
+        xqx = qx * dx + qy * dy + qz * dz
+        radial = -total * inv_r3 - 2.5 * xqx * inv_r5 * inv_r2
+        if skip_adjacent:
+            tk = target_keys[start:start + block]
+            near = np.ones(r2.shape, dtype=bool)
+            for k in range(3):
+                near &= np.abs(tk[:, k:k + 1] - keys[:, k]) <= 1
+            radial[near] = 0.0
+            inv_r5[near] = 0.0
+        out[start:start + block, 0] = np.einsum("ij,ij->i", radial, dx) + np.einsum("ij,ij->i", inv_r5, qx)
+        out[start:start + block, 1] = np.einsum("ij,ij->i", radial, dy) + np.einsum("ij,ij->i", inv_r5, qy)
+        out[start:start + block, 2] = np.einsum("ij,ij->i", radial, dz) + np.einsum("ij,ij->i", inv_r5, qz)
+    return out * g
+
+
+# === Checks and Benchmarks ===
+def _bench_light(bodies=200000, steps=10):
+    """Step cost with the belt as test particles vs full N^2; checks the split step"""
+    import time
+    from scenarios import planetary_system
+    state = planetary_system(bodies, seed=1)
+    n_massive = int(np.count_nonzero(~state.light))
+    start = time.perf_counter()
+    for _ in range(steps):
+        step(state, 0.01)
+    light_ms = (time.perf_counter() - start) / steps * 1000
+
+    # Full pairwise on a subsample, scaled by N^2
+    sample = min(len(state), 5000)
+    sub = planetary_system(sample - n_massive, seed=1)
+    sub.light[:] = False
+    start = time.perf_counter()
+    step(sub, 0.01)
+    full_ms = (time.perf_counter() - start) * 1000 * (len(state) / sample) ** 2
+
+    # Same step, split by hand, to confirm the flag changes nothing but the cost
+    check = planetary_system(2000, seed=2)
+    expected = check.copy()
+    massive = ~expected.light
+    acc = np.empty((len(expected), 3))
+    acc[massive] = accelerations(expected.pos[massive], expected.mass[massive])
+    acc[~massive] = accelerations_from(expected.pos[~massive], expected.pos[massive], expected.mass[massive])
+    expected.vel += acc * 0.01
+    step(check, 0.01)
+    assert np.allclose(check.vel, expected.vel, rtol=1e-12, atol=0.0)
+
+    print(f"{len(state)} bodies ({n_massive} massive, {len(state) - n_massive} light)")
+    print(f"  light flag:           {light_ms:10.1f} ms/step")
+    print(f"  full pairwise (est.): {full_ms:10.1f} ms/step ({full_ms / light_ms:.0f}x slower)")
+
+
+def _energy(state):
+    phi = np.empty(len(state))
+    accelerations(state.pos, state.mass, potential=phi)
+    return (0.5 * np.dot(state.mass, np.einsum("ij,ij->i", state.vel, state.vel))
+            + 0.5 * np.dot(state.mass, phi))
+
+
+def _relative_error(acc, ref):
+    return np.linalg.norm(acc - ref, axis=1) / np.maximum(np.linalg.norm(ref, axis=1), 1e-300)
+
+
+def _check_mixed(steps=100):
+    """
+    Mixed-precision kernel vs float64: speed and force error per scene (also
+    with a single float32 sum per target, to show what the float64 block
+    accumulation buys), then energy error over a run. Fails on a force
+    error beyond float32-level accuracy.
+    """
+    import time
+    from scenarios import create_scenario, planetary_system
+    for name, n in (("star_cluster", 2000), ("galaxy", 8000), ("star_cluster", 20000)):
+        s = create_scenario(name, n=n, seed=1)
+        start = time.perf_counter()
+        ref = accelerations(s.pos, s.mass)
+        ms64 = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        acc = accelerations_from_mixed(s.pos, s.pos, s.mass)
+        ms32 = (time.perf_counter() - start) * 1000
+        err = _relative_error(acc, ref)
+        flat = _relative_error(accelerations_from_mixed(s.pos, s.pos, s.mass, sum_block=len(s)), ref)
+        print(f"{name} ({len(s)} bodies): float64 {ms64:.0f} ms, mixed {ms32:.0f} ms "
+              f"({ms64 / ms32:.2f}x); relative error median {np.median(err):.1e}, "
+              f"max {err.max():.1e} (float32 sums: {np.median(flat):.1e}, {flat.max():.1e})")
+        assert np.median(err) < 1e-5 and err.max() < 1e-2, f"{name}: mixed-precision force error too large"
+
+    # Energy error of a run (trajectories themselves are chaotic, so not comparable)
+    base = planetary_system(2000, seed=2)
+    base.light[:] = False  # a self-gravitating belt, so every pair goes through the kernel
+    e0 = _energy(base)
+    drift = {}
+    for key, acc_fn in (("float64", accelerations), ("mixed", make_solver("direct", precision="mixed"))):
+        s = base.copy()
+        for _ in range(steps):
+            step(s, 0.01, acc_fn)
+        drift[key] = abs(_energy(s) - e0) / abs(e0)
+    print(f"planetary_system ({len(base)} bodies), {steps} steps: relative energy error "
+          f"float64 {drift['float64']:.2e}, mixed {drift['mixed']:.2e}")
+    assert drift["mixed"] < 2 * drift["float64"] + 1e-6, "mixed precision degrades energy conservation"
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Kernel checks and benchmarks")
+    parser.add_argument("check", nargs="?", choices=("light", "mixed"), default="light",
+                        help="light: test-particle flag vs full N^2; mixed: mixed precision vs float64")
+    parser.add_argument("--bodies", type=int, default=200000, help="belt asteroids (light)")
+    parser.add_argument("--steps", type=int, default=None, help="steps timed (light: 10) or run (mixed: 100)")
+    args = parser.parse_args()
+
+    if args.check == "light":
+        _bench_light(args.bodies, args.steps or 10)
+    else:
+        _check_mixed(args.steps or 100)
@@ -0,0 +1,117 @@
+# kepler.py
+# Vectorized two-body helpers. The simulation's orbital plane is X-Z with Y up,
+# so the orbital frame's (x, y, z) map to world (x, z, y).
+import numpy as np
+
+
+def _orbit_to_world(v):
+    """Swap orbital-frame (x, y, z) columns into world (x, y_up, z) order"""
+    return v[:, [0, 2, 1]]
+
+
+def elements_to_cartesian(mu, a, e, inc, node, peri, true_anom):
+    """
+    Convert arrays of orbital elements to world-frame position and velocity
+    relative to the central body. All angles in radians; mu = G * M_central.
+    Returns (pos, vel), both (N, 3) float64.
+    """
+    a, e, inc, node, peri, f = np.broadcast_arrays(
+        *(np.asarray(x, dtype=np.float64) for x in (a, e, inc, node, peri, true_anom)))
+    p = a * (1.0 - e * e)
+    r = p / (1.0 + e * np.cos(f))
+    h = np.sqrt(mu / p)
+
+    # Perifocal frame
+    cos_f, sin_f = np.cos(f), np.sin(f)
+    px, py = r * cos_f, r * sin_f
+    vx, vy = -h * sin_f, h * (e + cos_f)
+
+    # Rotate by argument of periapsis, inclination, ascending node
+    cO, sO = np.cos(node), np.sin(node)
+    cw, sw = np.cos(peri), np.sin(peri)
+    ci, si = np.cos(inc), np.sin(inc)
+    r11 = cO * cw - sO * sw * ci
+    r12 = -cO * sw - sO * cw * ci
+    r21 = sO * cw + cO * sw * ci
+    r22 = -sO * sw + cO * cw * ci
+    r31 = sw * si
+    r32 = cw * si
+
+    pos = np.stack([r11 * px + r12 * py, r21 * px + r22 * py, r31 * px + r32 * py], axis=1)
+    vel = np.stack([r11 * vx + r12 * vy, r21 * vx + r22 * vy, r31 * vx + r32 * vy], axis=1)
+    return _orbit_to_world(pos), _orbit_to_world(vel)
+
+
+def circular_speed(mu, r):
+    """Speed of a circular orbit of radius r"""
+    return np.sqrt(mu / np.asarray(r, dtype=np.float64))
+
+
+# === Universal-Variable Propagation ===
+KEPLER_TOL = 1e-13     # relative convergence of the universal anomaly
+KEPLER_ITERATIONS = 50
+
+
+def stumpff(z):
+    """Stumpff functions C(z), S(z) for arrays of z (elliptic z > 0, hyperbolic z < 0)"""
+    z = np.asarray(z, dtype=np.float64)
+    c = np.empty_like(z)
+    s = np.empty_like(z)
+    small = np.abs(z) < 1e-4
+    pos = (z > 0) & ~small
+    neg = (z < 0) & ~small
+    sq = np.sqrt(z[pos])
+    c[pos] = (1.0 - np.cos(sq)) / z[pos]
+    s[pos] = (sq - np.sin(sq)) / (sq * z[pos])
+    sq = np.sqrt(-z[neg])
+    c[neg] = (np.cosh(sq) - 1.0) / -z[neg]
+    s[neg] = (np.sinh(sq) - sq) / (sq * -z[neg])
+    zs = z[small]
+    c[small] = 0.5 - zs / 24.0 + zs * zs / 720.0
+    s[small] = 1.0 / 6.0 - zs / 120.0 + zs * zs / 5040.0
+    return c, s
+
+
+def kepler_drift(mu, pos, vel, dt):
+    """
+    Advance bodies along their two-body orbits about a fixed central mass for
+    time dt (any conic, any number of revolutions). pos/vel are (N, 3)
+    relative to the centre; returns new (pos, vel). Uses f and g functions of
+    the universal anomaly, solved with Laguerre-Conway iteration.
+    """
+    pos = np.asarray(pos, dtype=np.float64).reshape(-1, 3)
+    vel = np.asarray(vel, dtype=np.float64).reshape(-1, 3)
+    r0 = np.maximum(np.sqrt(np.einsum("ij,ij->i", pos, pos)), 1e-300)
+    v2 = np.einsum("ij,ij->i", vel, vel)
+    sqrt_mu = np.sqrt(mu)
+    alpha = 2.0 / r0 - v2 / mu                        # 1/a (negative when unbound)
+    sigma = np.einsum("ij,ij->i", pos, vel) / sqrt_mu  # r . v / sqrt(mu)
+    beta = 1.0 - alpha * r0
+
+    # Laguerre-Conway on F(chi) = r0 sigma chi^2 C + beta chi^3 S + r0 chi - sqrt(mu) dt
+    chi = sqrt_mu * dt / r0
+    n = 5.0
+    for _ in range(KEPLER_ITERATIONS):
+        chi2 = chi * chi
+        z = alpha * chi2
+        c, s = stumpff(z)
+        f = sigma * chi2 * c + beta * chi2 * chi * s + r0 * chi - sqrt_mu * dt
+        df = sigma * chi * (1.0 - z * s) + beta * chi2 * c + r0
+        ddf = sigma * (1.0 - z * c) + beta * chi * (1.0 - z * s)
+        root = np.sqrt(np.abs((n - 1.0) ** 2 * df * df - n * (n - 1.0) * f * ddf))
+        delta = n * f / (df + np.copysign(root, df))
+        chi = chi - delta
+        if np.all(np.abs(delta) <= KEPLER_TOL * np.maximum(np.abs(chi), 1e-300)):
+            break
+
+    chi2 = chi * chi
+    z = alpha * chi2
+    c, s = stumpff(z)
+    f = 1.0 - chi2 * c / r0
+    g = dt - chi2 * chi * s / sqrt_mu
+    new_pos = f[:, None] * pos + g[:, None] * vel
+    r = np.maximum(np.sqrt(np.einsum("ij,ij->i", new_pos, new_pos)), 1e-300)
+    fdot = sqrt_mu / (r * r0) * chi * (z * s - 1.0)
+    gdot = 1.0 - chi2 * c / r
+    new_vel = fdot[:, None] * pos + gdot[:, None] * vel
+    return new_pos, new_vel
@@ -0,0 +1,181 @@
+# lensing.py
+# Schwarzschild lensing of a background star field (geometric units G = c = 1).
+#
+# The photon deflection angle alpha(b) depends only on the impact parameter b,
+# so it is integrated once for a whole table of b values and cached on disk.
+# Each pixel's impact parameter is fixed by the screen layout, which gives a
+# per-pixel source offset; every frame only rotates/gathers a texture.
+import os
+import numpy as np
+
+CACHE_DIR = "cache"
+TABLE_SIZE = 4096
+B_MAX_FACTOR = 2000.0    # table spans b_crit .. B_MAX_FACTOR * M, then weak-field 4M/b
+QUADRATURE_NODES = 256
+
+LENS_SCALE = 30.0        # screen pixels per unit of M
+OBSERVER_DISTANCE = 20.0 # in units of M; sets how far deflected rays land on the sky
+
+
+def critical_impact(mass):
+    """Photons with b below 3*sqrt(3)*M are captured"""
+    return 3.0 * np.sqrt(3.0) * mass
+
+
+# === Deflection Table ===
+def _turning_points(b, mass, iterations=64):
+    """Inverse periapsis radius u0: smallest root of 2M u^3 - u^2 + 1/b^2 (bisection)"""
+    lo = np.zeros_like(b)
+    hi = np.full_like(b, 1.0 / (3.0 * mass))  # photon sphere
+    inv_b2 = 1.0 / (b * b)
+    for _ in range(iterations):
+        mid = 0.5 * (lo + hi)
+        positive = 2.0 * mass * mid ** 3 - mid * mid + inv_b2 > 0
+        lo = np.where(positive, mid, lo)
+        hi = np.where(positive, hi, mid)
+    return 0.5 * (lo + hi)
+
+
+def deflection_angles(b, mass, nodes=QUADRATURE_NODES):
+    """
+    Deflection alpha(b) for b > b_crit, all b at once:
+    alpha = 2 * integral_0^u0 du / sqrt(1/b^2 - u^2 + 2M u^3) - pi.
+    Substituting u = u0 (1 - t^2) removes the endpoint singularity so plain
+    Gauss-Legendre quadrature converges quickly.
+    """
+    b = np.asarray(b, dtype=np.float64)
+    u0 = _turning_points(b, mass)
+    x, w = np.polynomial.legendre.leggauss(nodes)
+    t = 0.5 * (x + 1.0)
+    w = 0.5 * w
+    u = u0[:, None] * (1.0 - t * t)
+    f = 1.0 / (b * b)[:, None] - u * u + 2.0 * mass * u ** 3
+    integrand = 2.0 * u0[:, None] * t / np.sqrt(np.maximum(f, 1e-300))
+    return 2.0 * integrand @ w - np.pi
+
+
+def build_table(mass, size=TABLE_SIZE):
+    """Impact parameters (log-spaced above b_crit) and their deflection angles"""
+    b_crit = critical_impact(mass)
+    span = B_MAX_FACTOR * mass - b_crit
+    b = b_crit + np.geomspace(1e-6 * mass, span, size)
+    return b, deflection_angles(b, mass)
+
+
+def load_table(mass, cache_dir=CACHE_DIR):
+    """Deflection table for this mass, computed once and cached as .npz"""
+    path = os.path.join(cache_dir, f"deflection_M{mass:g}_n{TABLE_SIZE}_q{QUADRATURE_NODES}.npz")
+    if os.path.exists(path):
+        try:
+            data = np.load(path)
+            return data["b"], data["alpha"]
+        except (OSError, KeyError, ValueError):
+            pass
+    b, alpha = build_table(mass)
+    os.makedirs(cache_dir, exist_ok=True)
+    np.savez_compressed(path, b=b, alpha=alpha)
+    return b, alpha
+
+
+def deflection_lookup(b, table_b, table_alpha, mass):
+    """Interpolate alpha(b); NaN inside the shadow, 4M/b beyond the table"""
+    b = np.asarray(b, dtype=np.float64)
+    alpha = np.interp(b, table_b, table_alpha)
+    alpha = np.where(b > table_b[-1], 4.0 * mass / np.maximum(b, 1e-12), alpha)
+    return np.where(b < table_b[0], np.nan, alpha)
+
+
+# === Background ===
+def star_field(width, height, stars=4000, seed=7):
+    """Procedural RGB star texture, (H, W, 3) uint8"""
+    rng = np.random.default_rng(seed)
+    tex = np.zeros((height, width, 3), dtype=np.uint8)
+    tex[:] = (4, 4, 14)
+    ys = rng.integers(0, height, stars)
+    xs = rng.integers(0, width, stars)
+    brightness = rng.uniform(90, 255, stars)
+    tint = rng.uniform(0.75, 1.0, (stars, 3))
+    tex[ys, xs] = (brightness[:, None] * tint).astype(np.uint8)
+    return tex
+
+
+def load_background(path, width, height):
+    """Load an image file as the sky texture (falls back to a star field)"""
+    try:
+        import pygame
+        img = pygame.transform.smoothscale(pygame.image.load(path), (width, height))
+        return np.ascontiguousarray(pygame.surfarray.array3d(img).swapaxes(0, 1))
+    except Exception as e:
+        print(f"⚠️ Background '{path}' not loaded ({e}), using star field")
+        return star_field(width, height)
+
+
+class LensingRenderer:
+    """
+    Precomputes each pixel's lensed source offset; render() then only rotates
+    the sky and gathers texels, which keeps 800x800 interactive on CPU.
+    Frames are packed RGBA (uint32 per pixel), rows bottom-up, ready for
+    glDrawPixels(..., GL_RGBA, GL_UNSIGNED_BYTE, frame).
+    """
+
+    def __init__(self, mass, width=800, height=800, scale=LENS_SCALE,
+                 observer_distance=OBSERVER_DISTANCE, texture=None):
+        self.width, self.height = width, height
+        texture = star_field(width * 2, height * 2) if texture is None else texture
+        th, tw = texture.shape[:2]
+        rgba = np.full((th, tw, 4), 255, dtype=np.uint8)
+        rgba[..., :3] = texture
+        # Last texel is black; shadow pixels always sample it
+        self.texels = np.append(rgba.view(np.uint32).ravel(), np.uint32(0))
+        self.tex_size = (tw, th)
+
+        table_b, table_alpha = load_table(mass)
+        ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+        dx = xs - width / 2.0
+        dy = ys - height / 2.0
+        rho = np.hypot(dx, dy)
+        alpha = deflection_lookup(rho / scale, table_b, table_alpha, mass)
+
+        # Outgoing direction is the pixel direction bent by alpha toward the hole;
+        # negative radius means the ray wrapped round to the opposite side
+        rho_src = rho - alpha * observer_distance * scale
+        ratio = np.where(rho > 0, rho_src / np.maximum(rho, 1e-6), 1.0)
+        self.shadow = np.isnan(alpha)
+        ratio[self.shadow] = 0.0
+        self.src_x = (dx * ratio).astype(np.float32)
+        self.src_y = (dy * ratio).astype(np.float32)
+        self.frame = np.empty((height, width), dtype=np.uint32)
+
+    def render(self, sky_angle=0.0, sky_offset=(0.0, 0.0)):
+        """Lensed background for a sky rotated by sky_angle and panned by sky_offset"""
+        tw, th = self.tex_size
+        c, s = np.float32(np.cos(sky_angle)), np.float32(np.sin(sky_angle))
+        u = c * self.src_x
+        u -= s * self.src_y
+        u += np.float32(tw / 2.0 + sky_offset[0])
+        v = s * self.src_x
+        v += c * self.src_y
+        v += np.float32(th / 2.0 + sky_offset[1])
+        iu = u.astype(np.int32)
+        iu %= tw
+        index = v.astype(np.int32)
+        index %= th
+        index *= tw
+        index += iu
+        index[self.shadow] = len(self.texels) - 1
+        np.take(self.texels, index, out=self.frame)
+        return self.frame
+
+
+if __name__ == "__main__":
+    import time
+    mass = 1.0
+    b = np.array([10.0, 100.0, 1000.0])
+    print("alpha(b):", deflection_angles(b, mass), "weak field 4M/b:", 4 * mass / b)
+    start = time.perf_counter()
+    lens = LensingRenderer(mass)
+    print(f"setup {time.perf_counter() - start:.2f}s")
+    start = time.perf_counter()
+    for i in range(20):
+        lens.render(sky_angle=0.01 * i)
+    print(f"render {800}x{800}: {(time.perf_counter() - start) / 20 * 1000:.1f} ms/frame")
@@ -5,6 +5,7 @@ from menu import run_menu
 from simulation import run_simulation
 from splash import show_splash
 from settings import Settings
+from display import get_display
 from config import STATE_MENU, STATE_SETTINGS, STATE_SIM
 
 def main():
@@ -17,30 +18,31 @@ def main():
     except pygame.error as e:
         print(f"⚠️ Icon not found: {e}")
 
-    # Set initial window
-    screen = pygame.display.set_mode((1000, 800), RESIZABLE)
-    pygame.display.set_caption("PyVerse")
+    # One OpenGL window for every screen, so GPU resources survive transitions
+    display = get_display((1000, 800), "PyVerse")
     clock = pygame.time.Clock()
 
     # Show splash screen
-    show_splash(screen, clock)
+    show_splash(display.canvas, clock, display.present)
 
     settings = Settings()
     state = STATE_MENU
 
     while True:
         if state == STATE_MENU:
-            result = run_menu(screen, clock, settings)
+            result = run_menu(display, clock, settings)
         elif state == STATE_SIM:
-            result = run_simulation(settings)
+            result = run_simulation(settings, display)
         else:
             result = "exit"
+        display.cache.trim()  # idle resources stay resident up to the budget
 
         if result == "exit":
             break
         else:
             state = result
 
+    display.close()
     pygame.quit()
 
 if __name__ == "__main__":
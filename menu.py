@@ -18,11 +18,10 @@ class Button:
     def update(self, mouse_pos):
         self.hovered = self.rect.collidepoint(mouse_pos)
 
-    def draw(self, surface):
+    def draw(self, surface, font):
         color = HOVER_BLUE if self.hovered else BLUE
         pygame.draw.rect(surface, color, self.rect, border_radius=12)
         pygame.draw.rect(surface, WHITE, self.rect, 3, border_radius=12)
-        font = pygame.font.SysFont("Arial", 40)
         txt_surf = font.render(self.text, True, WHITE)
         txt_rect = txt_surf.get_rect(center=self.rect.center)
         surface.blit(txt_surf, txt_rect)
@@ -50,7 +49,8 @@ class FloatingPlanet:
         pygame.draw.circle(surface, self.color, (int(self.x), int(self.y)), self.radius)
 
 
-def run_menu(screen, clock, settings):
+def run_menu(display, clock, settings):
+    """Menu drawn into the shared display's canvas (the GL context stays alive)"""
     global menu_icon
 
     # Load icon
@@ -69,7 +69,9 @@ def run_menu(screen, clock, settings):
         FloatingPlanet(900, 200, -0.3, -0.4, 3, (150, 100, 200)),
     ]
 
-    title_font = pygame.font.SysFont("Arial", 80, bold=True)
+    resources = display.lease()
+    title_font = resources.font("Arial", 80, bold=True)
+    button_font = resources.font("Arial", 40)
     button_w, button_h = 240, 60
 
     def update_layout():
@@ -88,7 +90,10 @@ def run_menu(screen, clock, settings):
     ]
     update_layout()
 
-    current_screen = screen
+    pygame.display.set_caption("PyVerse")
+    screen_state.update(width=display.size[0], height=display.size[1])
+    update_layout()
+    current_screen = display.canvas
     clock = pygame.time.Clock()
 
     while True:
@@ -96,15 +101,17 @@ def run_menu(screen, clock, settings):
 
         for event in pygame.event.get():
             if event.type == QUIT:
+                resources.release()
                 return "exit"
-            elif event.type == VIDEORESIZE:
-                current_screen = pygame.display.set_mode((event.w, event.h), RESIZABLE)
-                screen_state.update(width=event.w, height=event.h)
+            elif display.handle_event(event):
+                current_screen = display.canvas
+                screen_state.update(width=display.size[0], height=display.size[1])
                 update_layout()
 
             for btn in buttons:
                 btn.update(mouse_pos)
                 if btn.is_clicked(event):
+                    resources.release()
                     return btn.action()
 
         # Update bg
@@ -129,7 +136,7 @@ def run_menu(screen, clock, settings):
         current_screen.blit(title, (title_x, 130))
 
         for btn in buttons:
-            btn.draw(current_screen)
+            btn.draw(current_screen, button_font)
 
-        pygame.display.flip()
+        display.present()
         clock.tick(60)
\ No newline at end of file
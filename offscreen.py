@@ -0,0 +1,211 @@
+# offscreen.py
+# Offscreen rendering for exports: a framebuffer object at any resolution,
+# double-buffered pixel-buffer-object readback, and headless contexts.
+#
+# For EGL/OSMesa, PYOPENGL_PLATFORM must be set before OpenGL is first
+# imported (recorder.py's --headless does this). With Mesa, EGL also runs
+# without a display server when EGL_PLATFORM=surfaceless.
+import ctypes
+import numpy as np
+from OpenGL.GL import *
+from OpenGL.GLU import *
+from config import DT
+import gravity
+from floating_origin import FloatingOrigin
+from simulation import draw_bodies, draw_points
+
+SPHERE_LIMIT = 2000    # above this many bodies, draw points instead of spheres
+FIT_PERCENTILE = 98    # framing keeps this share of bodies in view
+CAMERA_DISTANCE = 100.0
+FOV = 45.0
+
+
+# === Contexts ===
+def create_context(platform, width, height):
+    """
+    Make a GL context current: "egl" (pbuffer), "osmesa" (software) or
+    "window" (hidden pygame window). Returns an object to keep alive.
+    """
+    if platform == "egl":
+        return _egl_context(width, height)
+    if platform == "osmesa":
+        from OpenGL import osmesa
+        context = osmesa.OSMesaCreateContextExt(osmesa.OSMESA_RGBA, 24, 0, 0, None)
+        buffer = (ctypes.c_ubyte * (width * height * 4))()
+        if not context or not osmesa.OSMesaMakeCurrent(context, buffer, GL_UNSIGNED_BYTE, width, height):
+            raise RuntimeError("Could not create an OSMesa context")
+        return context, buffer
+    import pygame
+    from pygame.locals import DOUBLEBUF, OPENGL, HIDDEN
+    pygame.display.init()
+    pygame.display.set_mode((64, 64), DOUBLEBUF | OPENGL | HIDDEN)
+    return pygame
+
+
+def _egl_context(width, height):
+    from OpenGL import EGL
+    display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+    major, minor = EGL.EGLint(), EGL.EGLint()
+    if not EGL.eglInitialize(display, ctypes.pointer(major), ctypes.pointer(minor)):
+        raise RuntimeError("Could not initialise EGL")
+    attribs = [EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+               EGL.EGL_RED_SIZE, 8, EGL.EGL_GREEN_SIZE, 8, EGL.EGL_BLUE_SIZE, 8,
+               EGL.EGL_ALPHA_SIZE, 8, EGL.EGL_DEPTH_SIZE, 24,
+               EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT, EGL.EGL_NONE]
+    config, count = EGL.EGLConfig(), EGL.EGLint()
+    EGL.eglChooseConfig(display, (EGL.EGLint * len(attribs))(*attribs),
+                        ctypes.pointer(config), 1, ctypes.pointer(count))
+    if count.value == 0:
+        raise RuntimeError("No EGL config with an OpenGL pbuffer")
+    # Rendering goes to an FBO, so the pbuffer itself can stay tiny
+    size = (EGL.EGLint * 5)(EGL.EGL_WIDTH, 16, EGL.EGL_HEIGHT, 16, EGL.EGL_NONE)
+    surface = EGL.eglCreatePbufferSurface(display, config, size)
+    EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+    context = EGL.eglCreateContext(display, config, EGL.EGL_NO_CONTEXT, None)
+    if not EGL.eglMakeCurrent(display, surface, surface, context):
+        raise RuntimeError("Could not make the EGL context current")
+    return display, surface, context
+
+
+# === Framebuffer ===
+class OffscreenTarget:
+    """Framebuffer object with RGBA8 color and 24-bit depth renderbuffers"""
+
+    def __init__(self, width, height):
+        self.width, self.height = width, height
+        self.fbo = glGenFramebuffers(1)
+        self.color, self.depth = glGenRenderbuffers(2)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.color)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, width, height)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.depth)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT24, width, height)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, self.color)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, self.depth)
+        status = glCheckFramebufferStatus(GL_FRAMEBUFFER)
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        if status != GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError(f"Framebuffer incomplete (status 0x{int(status):x})")
+
+    def bind(self):
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glViewport(0, 0, self.width, self.height)
+
+    def release(self):
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+
+    def delete(self):
+        glDeleteRenderbuffers(2, [self.color, self.depth])
+        glDeleteFramebuffers(1, [self.fbo])
+
+
+# === Readback ===
+class PixelReader:
+    """
+    Asynchronous readback through a ring of pixel buffer objects. read()
+    starts the transfer of the current frame into one PBO and maps the PBO
+    filled `buffers - 1` frames earlier, whose transfer has had a whole frame
+    to finish, so the CPU does not wait on the GPU. Frames come out with that
+    latency; flush() drains the rest at the end.
+    """
+
+    def __init__(self, width, height, buffers=2):
+        self.width, self.height = width, height
+        self.size = width * height * 4
+        self.pbos = [int(b) for b in np.atleast_1d(glGenBuffers(buffers))]
+        for pbo in self.pbos:
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+            glBufferData(GL_PIXEL_PACK_BUFFER, self.size, None, GL_STREAM_READ)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.pending = []  # PBOs with a transfer in flight, oldest first
+        self.next = 0
+
+    def read(self):
+        """Start reading the bound framebuffer; returns an older frame (H, W, 4) or None"""
+        pbo = self.pbos[self.next]
+        self.next = (self.next + 1) % len(self.pbos)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        glReadPixels(0, 0, self.width, self.height, GL_RGBA, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.pending.append(pbo)
+        if len(self.pending) < len(self.pbos):
+            return None
+        return self._map(self.pending.pop(0))
+
+    def flush(self):
+        """Frames still in flight, oldest first"""
+        frames = [self._map(pbo) for pbo in self.pending]
+        self.pending = []
+        return frames
+
+    def _map(self, pbo):
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+        address = glMapBuffer(GL_PIXEL_PACK_BUFFER, GL_READ_ONLY)
+        frame = np.empty((self.height, self.width, 4), dtype=np.uint8)
+        ctypes.memmove(frame.ctypes.data, address, self.size)
+        glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        return frame
+
+    def delete(self):
+        glDeleteBuffers(len(self.pbos), self.pbos)
+
+
+# === Export Loop ===
+def fit_zoom(pos, aspect):
+    """Zoom that frames FIT_PERCENTILE of the bodies around their median"""
+    center = np.median(pos, axis=0)
+    extent = np.percentile(np.abs(pos - center)[:, :2], FIT_PERCENTILE, axis=0)
+    half_h = CAMERA_DISTANCE * np.tan(np.radians(FOV / 2))
+    return 0.9 * min(half_h / max(extent[1], 1e-9), half_h * aspect / max(extent[0], 1e-9)), center
+
+
+def record_run(state, writer, width, height, frames, platform="window", steps_per_frame=1,
+               acc_fn=gravity.accelerations, dt=DT):
+    """
+    Step `state` and render every frame into an offscreen target, passing
+    the pixels to `writer` (a recorder.FrameWriter). The camera follows the
+    simulation view (looking down -Z) and is framed on the initial state.
+    """
+    context = create_context(platform, width, height)  # must outlive the loop
+    target = OffscreenTarget(width, height)
+    reader = PixelReader(width, height)
+    target.bind()
+    glEnable(GL_DEPTH_TEST)
+    glEnable(GL_BLEND)
+    glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+    glClearColor(0.0, 0.0, 0.0, 1.0)
+    glMatrixMode(GL_PROJECTION)
+    glLoadIdentity()
+    gluPerspective(FOV, width / height, 1.0, 1000.0)
+    glMatrixMode(GL_MODELVIEW)
+
+    zoom, center = fit_zoom(state.pos, width / height)
+    cam_pos = (center[0] * zoom, center[1] * zoom, CAMERA_DISTANCE)
+    origin = FloatingOrigin()
+    origin.update(center)
+    local = None
+    try:
+        for _ in range(frames):
+            for _ in range(steps_per_frame):
+                gravity.step(state, dt, acc_fn)
+            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+            glLoadIdentity()
+            glTranslatef(*origin.view_offset(cam_pos, zoom))
+            glScalef(zoom, zoom, zoom)
+            local = origin.to_local(state.pos, out=local)
+            if len(state) > SPHERE_LIMIT:
+                draw_points(local, state.color)
+            else:
+                draw_bodies(local, state.radius, state.color)
+            frame = reader.read()
+            if frame is not None:
+                writer.submit(frame)
+        for frame in reader.flush():
+            writer.submit(frame)
+    finally:
+        reader.delete()
+        target.release()
+        target.delete()
+    del context
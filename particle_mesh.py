@@ -0,0 +1,295 @@
+# particle_mesh.py
+# Particle-mesh gravity for large, fairly uniform scenes. Mass is deposited on
+# a grid of cubic cells with cloud-in-cell (CIC) weights, the potential comes
+# from one FFT convolution with the free-space Green's function (zero-padded
+# to twice the mesh per axis, so boundaries are isolated rather than
+# periodic), and accelerations are interpolated back with the same weights.
+#
+# With p3m=True the Green's function is Gaussian-smoothed (erf(r/2rs)/r) and
+# pairs closer than the cutoff get the complementary short-range force
+# directly, so close encounters keep the direct-sum accuracy.
+#
+# Bodies heavier than point_fraction of the total mass (a galaxy's central
+# mass, say) are left off the mesh, where CIC would smear them over a cell,
+# and act as direct point sources on everything instead.
+#
+# Scenes pick a solver through scenarios.SCENE_SOLVERS / gravity.make_solver.
+#
+#   python particle_mesh.py --scenario cosmic_box --bodies 100000 --grid 64
+import argparse
+import time
+import numpy as np
+from config import G, SOFTENING
+import gravity
+
+GRID_SIZE = 64         # cells along the longest axis of the mesh
+SPLIT_CELLS = 1.25     # P3M force split scale r_s, in mesh cells
+CUTOFF_SPLITS = 4.5    # short-range pairs are summed out to CUTOFF_SPLITS * r_s
+MARGIN_CELLS = 3       # empty cells around the bodies so gradient stencils stay inside
+PAIR_CHUNK = 1 << 21   # short-range pairs evaluated at once
+MESH_ROUND = 8         # mesh dimensions are multiples of this (FFT sizes, kernel reuse)
+FIT_QUANTILE = 0.002   # bodies beyond this quantile (per axis side) are handled off-mesh
+FIT_PADDING = 0.25     # ...grown by this fraction of its span on every side
+GROUP_CELLS = 8        # coarse cell / lattice spacing (in mesh cells) for off-mesh bodies
+POINT_FRACTION = 0.01  # bodies above this fraction of the total mass are direct point sources
+
+
+def _erfc(x, gauss=None):
+    """
+    Complementary error function for x >= 0 (Abramowitz & Stegun 7.1.26,
+    |err| < 1.5e-7). Pass exp(-x^2) as `gauss` if it is already at hand.
+    """
+    t = 1.0 / (1.0 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741
+                + t * (-1.453152027 + t * 1.061405429))))
+    return poly * (np.exp(-x * x) if gauss is None else gauss)
+
+
+def _cic_corners(u, shape):
+    """
+    CIC weights for points u (N, 3) in grid units on a grid of `shape`: eight
+    (flat node index, weight) pairs, one per corner of each point's cell.
+    """
+    base = np.minimum(np.floor(u).astype(np.int64), np.array(shape) - 2)
+    f = u - base
+    corners = []
+    for ox in (0, 1):
+        wx = f[:, 0] if ox else 1.0 - f[:, 0]
+        for oy in (0, 1):
+            wy = f[:, 1] if oy else 1.0 - f[:, 1]
+            for oz in (0, 1):
+                wz = f[:, 2] if oz else 1.0 - f[:, 2]
+                index = ((base[:, 0] + ox) * shape[1] + base[:, 1] + oy) * shape[2] + base[:, 2] + oz
+                corners.append((index, wx * wy * wz))
+    return corners
+
+
+class ParticleMesh:
+    """
+    Callable force solver: solver(pos, mass) -> (N, 3) accelerations, a drop-in
+    acc_fn for gravity.step(). The mesh is refitted around the bodies each
+    call; the transformed Green's function is in cell units, so it is built
+    once per mesh shape and only rescaled by the cell size.
+    """
+
+    def __init__(self, grid=GRID_SIZE, g=G, softening=SOFTENING, p3m=False,
+                 split_cells=SPLIT_CELLS, cutoff_splits=CUTOFF_SPLITS, fit_quantile=FIT_QUANTILE,
+                 point_fraction=POINT_FRACTION):
+        self.n = grid
+        self.g = g
+        self.softening = softening
+        self.p3m = p3m
+        self.split = split_cells
+        self.cutoff = cutoff_splits * split_cells
+        self.fit_quantile = fit_quantile
+        self.point_fraction = point_fraction
+        self.greens = {}  # transformed kernel per mesh shape
+        self.shape = None
+        self.cell = None
+        self.corner = None
+
+    # === Mesh ===
+    def _green_function(self, shape):
+        """FFT of the isolated potential kernel -1/r on the mesh padded to 2x per axis, cell units"""
+        if shape in self.greens:
+            return self.greens[shape]
+        d = [np.arange(2 * n, dtype=np.float64) for n in shape]
+        dx, dy, dz = (np.minimum(a, len(a) - a) for a in d)  # wrapped, so the kernel is symmetric
+        r = np.sqrt(dx[:, None, None] ** 2 + dy[None, :, None] ** 2 + dz[None, None, :] ** 2)
+        r[0, 0, 0] = 1.0
+        if self.p3m:
+            # Long-range part only; erf(x)/r -> 1/(r_s sqrt(pi)) at r = 0
+            kernel = -(1.0 - _erfc(r / (2.0 * self.split))) / r
+            kernel[0, 0, 0] = -1.0 / (self.split * np.sqrt(np.pi))
+        else:
+            kernel = -1.0 / r
+            kernel[0, 0, 0] = -1.0
+        self.greens[shape] = np.fft.rfftn(kernel)
+        return self.greens[shape]
+
+    def _fit(self, pos):
+        """
+        Box of cubic cells around the bodies, `grid` cells along its longest
+        axis and MESH_ROUND-rounded counts on the others (flat scenes get flat
+        meshes), with MARGIN_CELLS of empty cells on every side.
+        Far stragglers (beyond the fit_quantile box grown by FIT_PADDING) are
+        left off the mesh so they cannot coarsen it. Returns the inside mask.
+        """
+        lo, hi = pos.min(axis=0), pos.max(axis=0)
+        if self.fit_quantile > 0 and len(pos) > 1:
+            q_lo, q_hi = np.quantile(pos, [self.fit_quantile, 1.0 - self.fit_quantile], axis=0)
+            pad = FIT_PADDING * float((q_hi - q_lo).max())
+            lo, hi = np.maximum(lo, q_lo - pad), np.minimum(hi, q_hi + pad)
+        span = np.maximum(hi - lo, 1e-9)
+        # One cell of slack keeps the extreme bodies inside despite rounding
+        self.cell = float(span.max()) / (self.n - 2 - 2 * MARGIN_CELLS)
+        cells = np.ceil(span / self.cell).astype(int) + 1 + 2 * MARGIN_CELLS
+        cells = -(-cells // MESH_ROUND) * MESH_ROUND
+        self.shape = tuple(int(c) for c in np.minimum(cells, self.n))
+        self.corner = 0.5 * (lo + hi) - 0.5 * (np.array(self.shape) - 1) * self.cell
+        u = (pos - self.corner) / self.cell
+        return np.all((u >= MARGIN_CELLS) & (u <= np.array(self.shape) - 1 - MARGIN_CELLS), axis=1)
+
+    def _cic(self, pos):
+        return _cic_corners((pos - self.corner) / self.cell, self.shape)
+
+    def potential_mesh(self, corners, mass):
+        """Potential on the mesh from CIC-deposited masses"""
+        nx, ny, nz = self.shape
+        index = np.concatenate([index for index, _ in corners])
+        weights = np.concatenate([w * mass for _, w in corners])
+        rho = np.zeros((2 * nx, 2 * ny, 2 * nz))
+        rho[:nx, :ny, :nz] = np.bincount(index, weights=weights, minlength=nx * ny * nz).reshape(self.shape)
+        green = self._green_function(self.shape)
+        phi = np.fft.irfftn(np.fft.rfftn(rho) * green, s=rho.shape, axes=(0, 1, 2))
+        return phi[:nx, :ny, :nz] * (self.g / self.cell)
+
+    def _mesh_accelerations(self, phi):
+        """-grad(phi) with 4-point central differences, as an (n^3, 3) table"""
+        acc = np.empty(phi.shape + (3,))
+        for axis in range(3):
+            forward = np.roll(phi, -1, axis) - np.roll(phi, 1, axis)
+            forward2 = np.roll(phi, -2, axis) - np.roll(phi, 2, axis)
+            acc[..., axis] = (forward2 - 8.0 * forward) / (12.0 * self.cell)
+        return acc.reshape(-1, 3)
+
+    # === Short Range (P3M) ===
+    def _short_range(self, pos, mass, acc):
+        """
+        Add the erfc part of the pair force for pairs within the cutoff. Bodies
+        are sorted into cells one cutoff wide; each cell meets itself and 13 of
+        its 26 neighbours, and every pair updates both bodies.
+        """
+        cutoff = self.cutoff * self.cell
+        r_s = self.split * self.cell
+        keys3 = np.floor((pos - pos.min(axis=0)) / cutoff).astype(np.int64) + 1
+        dims = keys3.max(axis=0) + 2  # one empty layer each side, so offsets never wrap
+        keys = (keys3[:, 0] * dims[1] + keys3[:, 1]) * dims[2] + keys3[:, 2]
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        spos = pos[order]
+        gm = self.g * mass[order]
+        out = np.zeros_like(spos)
+        n = len(spos)
+        offsets = [(dx * dims[1] + dy) * dims[2] + dz
+                   for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)]
+        for off in offsets[13:]:  # the self cell and 13 "forward" neighbours
+            start = np.searchsorted(keys, keys + off, side="left")
+            if off == 0:
+                start = np.arange(1, n + 1)  # only j > i within the same cell
+            count = np.searchsorted(keys, keys + off, side="right") - start
+            np.maximum(count, 0, out=count)
+            total = np.cumsum(count)
+            first = 0
+            # Chunk over targets so the expanded pair list stays bounded
+            while first < n:
+                done = total[first - 1] if first else 0
+                last = max(int(np.searchsorted(total, done + PAIR_CHUNK, side="right")), first + 1)
+                c = count[first:last]
+                i = np.repeat(np.arange(first, last), c)
+                first = last
+                if len(i) == 0:
+                    continue
+                j = start[i] + np.arange(len(i)) - np.repeat(np.cumsum(c) - c, c)
+                d = spos[j] - spos[i]
+                r2 = np.einsum("ij,ij->i", d, d)
+                keep = (r2 >= self.softening) & (r2 < cutoff * cutoff)
+                i, j, d, r2 = i[keep], j[keep], d[keep], r2[keep]
+                r = np.sqrt(r2)
+                x = r / (2.0 * r_s)
+                gauss = np.exp(-x * x)
+                w = (_erfc(x, gauss) + (2.0 / np.sqrt(np.pi)) * x * gauss) / (r2 * r)
+                wi, wj = w * gm[j], w * gm[i]
+                for axis in range(3):
+                    out[:, axis] += np.bincount(i, weights=wi * d[:, axis], minlength=n)
+                    out[:, axis] -= np.bincount(j, weights=wj * d[:, axis], minlength=n)
+        acc[order] += out
+
+    # === Solve ===
+    def __call__(self, pos, mass):
+        pos = np.asarray(pos, dtype=np.float64).reshape(-1, 3)
+        mass = np.asarray(mass, dtype=np.float64)
+        heavy = mass > self.point_fraction * mass.sum() if self.point_fraction and len(mass) else None
+        if heavy is None or not heavy.any() or heavy.all():
+            return self._solve(pos, mass)
+        # Point sources: exact pairs with everything, O(N * heavy)
+        rest = ~heavy
+        acc = np.empty_like(pos)
+        acc[rest] = self._solve(pos[rest], mass[rest])
+        acc[rest] += gravity.accelerations_from(pos[rest], pos[heavy], mass[heavy], self.g, self.softening)
+        acc[heavy] = gravity.accelerations_from(pos[heavy], pos, mass, self.g, self.softening)
+        return acc
+
+    def _solve(self, pos, mass):
+        """Mesh solve for bodies that all go on (or around) the mesh"""
+        acc = np.zeros_like(pos)
+        if len(pos) == 0:
+            return acc
+        inside = self._fit(pos)
+        if inside.all():
+            return self._mesh_solve(pos, mass, acc)
+        # Stragglers outside the mesh see the mesh bodies as coarse cell
+        # multipoles and each other directly; the mesh bodies see the
+        # stragglers' (smooth) field sampled on a coarse lattice
+        outside = ~inside
+        acc[inside] = self._mesh_solve(pos[inside], mass[inside], acc[inside])
+        acc[inside] += self._straggler_field(pos[inside], pos[outside], mass[outside])
+        _, inner = gravity.cell_multipoles(pos[inside], mass[inside], GROUP_CELLS * self.cell)
+        acc[outside] = gravity.cell_field_accelerations(pos[outside], inner, self.g, self.softening)
+        acc[outside] += gravity.accelerations(pos[outside], mass[outside], self.g, self.softening)
+        return acc
+
+    def _straggler_field(self, targets, pos, mass):
+        """Exact field of off-mesh bodies at lattice nodes GROUP_CELLS apart, CIC-interpolated"""
+        spacing = GROUP_CELLS * self.cell
+        counts = tuple(int(c) for c in np.ceil((np.array(self.shape) - 1) / GROUP_CELLS) + 1)
+        axes = [self.corner[k] + spacing * np.arange(counts[k]) for k in range(3)]
+        nodes = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, 3)
+        table = gravity.accelerations_from(nodes, pos, mass, self.g, self.softening)
+        out = np.zeros_like(targets)
+        for index, w in _cic_corners((targets - self.corner) / spacing, counts):
+            out += w[:, None] * table[index]
+        return out
+
+    def _mesh_solve(self, pos, mass, acc):
+        """Mesh (+ short-range) accelerations for bodies inside the current fit"""
+        corners = self._cic(pos)
+        table = self._mesh_accelerations(self.potential_mesh(corners, mass))
+        for index, w in corners:
+            acc += w[:, None] * table[index]
+        if self.p3m:
+            self._short_range(pos, mass, acc)
+        return acc
+
+
+if __name__ == "__main__":
+    from scenarios import create_scenario
+    parser = argparse.ArgumentParser(description="Particle-mesh vs direct-sum benchmark")
+    parser.add_argument("--scenario", default="cosmic_box")
+    parser.add_argument("--bodies", type=int, default=100000)
+    parser.add_argument("--grid", type=int, default=GRID_SIZE)
+    parser.add_argument("--solvers", nargs="+", choices=("pm", "p3m"), default=["pm", "p3m"])
+    parser.add_argument("--sample", type=int, default=2000, help="bodies checked against the direct sum")
+    args = parser.parse_args()
+
+    state = create_scenario(args.scenario, n=args.bodies, seed=1)
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(state), min(args.sample, len(state)), replace=False)
+
+    start = time.perf_counter()
+    exact = gravity.accelerations_from(state.pos[sample], state.pos, state.mass)
+    direct = (time.perf_counter() - start) * len(state) / len(sample)
+    norm = np.linalg.norm(exact, axis=1)
+    print(f"{args.scenario}, {len(state)} bodies")
+    print(f"  direct sum (extrapolated from {len(sample)} rows): {direct:8.2f} s")
+    for name in args.solvers:
+        solver = ParticleMesh(args.grid, p3m=name == "p3m")
+        solver._fit(state.pos)
+        solver._green_function(solver.shape)  # one-off per mesh shape, not per step
+        start = time.perf_counter()
+        acc = solver(state.pos, state.mass)
+        elapsed = time.perf_counter() - start
+        err = np.linalg.norm(acc[sample] - exact, axis=1) / np.maximum(norm, 1e-30)
+        print(f"  {name:>3} on {'x'.join(map(str, solver.shape))}: {elapsed:8.2f} s "
+              f"({direct / elapsed:6.1f}x faster), force error median {np.median(err):.2e}, "
+              f"99th pct {np.percentile(err, 99):.2e}")
@@ -0,0 +1,139 @@
+# prediction.py
+# Background orbit preview for bodies about to be spawned. The render loop
+# only ever calls request()/lookup(); integration runs on a worker thread,
+# publishes partial trajectories as it goes and abandons jobs that a newer
+# request has made stale.
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from config import G, DT, SOFTENING
+import gravity
+
+PREDICT_STEPS = 3000
+CHUNK_STEPS = 150          # steps between stale-job checks / partial publishes
+CELL_SIZE = 2.0            # cursor positions in one cell share a cached result
+CACHE_SIZE = 64
+FIELD_REFRESH = 0.5        # seconds before the body field is re-snapshotted
+FIELD_TOLERANCE = 0.5      # max body displacement (world units) that keeps cached previews
+EVOLVE_LIMIT = 400         # above this many bodies the field is kept frozen
+
+
+class OrbitPredictor:
+    """
+    Integrates a test body through a snapshot of the existing bodies. The
+    field is evolved alongside it (coarsely, same kernel) for small scenes and
+    frozen for large ones. Results are cached per (cursor cell, velocity,
+    field version); the version only changes when the field really does
+    (bodies added/removed, or moved by more than FIELD_TOLERANCE), so a
+    paused scene keeps every cached preview.
+    """
+
+    def __init__(self, steps=PREDICT_STEPS, dt=DT):
+        self.steps = steps
+        self.dt = dt
+        self.cache = OrderedDict()
+        self.field = None
+        self.field_version = 0
+        self.field_time = 0.0
+        self.generation = 0
+        self.job = None
+        self.lock = threading.Lock()
+        self.wake = threading.Condition(self.lock)
+        self.running = True
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+
+    # === Main-thread API ===
+    def update_field(self, pos, vel, mass, force=False):
+        """Offer the current bodies; only checked every FIELD_REFRESH seconds or on force"""
+        now = time.perf_counter()
+        if not force and self.field is not None and now - self.field_time < FIELD_REFRESH:
+            return
+        field = (np.array(pos, dtype=np.float64).reshape(-1, 3),
+                 np.array(vel, dtype=np.float64).reshape(-1, 3),
+                 np.array(mass, dtype=np.float64))
+        with self.lock:
+            self.field_time = now
+            old = self.field
+            if (old is not None and len(old[2]) == len(field[2]) and np.array_equal(old[2], field[2])
+                    and (len(field[2]) == 0 or np.abs(old[0] - field[0]).max() <= FIELD_TOLERANCE)):
+                return  # close enough: cached previews stay valid
+            self.field = field
+            self.field_version += 1
+
+    def key(self, world_pos, vel):
+        cell = tuple(np.floor(np.asarray(world_pos[:2]) / CELL_SIZE).astype(int))
+        return cell + tuple(np.round(vel, 3)) + (self.field_version,)
+
+    def request(self, world_pos, vel):
+        """Ask for a preview; cheap if cached, otherwise replaces any pending job"""
+        key = self.key(world_pos, vel)
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return key
+            if self.job is not None and self.job[0] == key:
+                return key
+            self.generation += 1
+            self.job = (key, np.array(world_pos, dtype=np.float64), np.array(vel, dtype=np.float64),
+                        self.field, self.generation)
+            self.wake.notify()
+        return key
+
+    def lookup(self, key):
+        """Trajectory (M, 3) computed so far for key, or None"""
+        with self.lock:
+            entry = self.cache.get(key)
+        return None if entry is None else entry[0]
+
+    def stop(self):
+        with self.lock:
+            self.running = False
+            self.wake.notify()
+
+    # === Worker ===
+    def _stale(self, generation):
+        return generation != self.generation or not self.running
+
+    def _publish(self, key, points, count, complete):
+        with self.lock:
+            self.cache[key] = (points[:count], complete)
+            self.cache.move_to_end(key)
+            while len(self.cache) > CACHE_SIZE:
+                self.cache.popitem(last=False)
+
+    def _worker(self):
+        while True:
+            with self.lock:
+                while self.running and self.job is None:
+                    self.wake.wait()
+                if not self.running:
+                    return
+                key, pos, vel, field, generation = self.job
+                self.job = None
+            self._predict(key, pos, vel, field, generation)
+
+    def _predict(self, key, pos, vel, field, generation):
+        points = np.empty((self.steps + 1, 3))
+        points[0] = pos
+        if field is None:
+            field_pos, field_vel, field_mass = np.zeros((0, 3)), np.zeros((0, 3)), np.zeros(0)
+        else:
+            field_pos, field_vel, field_mass = (a.copy() for a in field)
+        evolve = 0 < len(field_mass) <= EVOLVE_LIMIT
+        p, v = pos.copy(), vel.copy()
+        for step in range(1, self.steps + 1):
+            acc = gravity.accelerations_from(p, field_pos, field_mass, G, SOFTENING)[0]
+            v += acc * self.dt
+            p += v * self.dt
+            points[step] = p
+            if evolve:
+                field_acc = gravity.accelerations(field_pos, field_mass, G, SOFTENING)
+                field_vel += field_acc * self.dt
+                field_pos += field_vel * self.dt
+            if step % CHUNK_STEPS == 0:
+                if self._stale(generation):
+                    return  # a newer cursor position superseded this job
+                self._publish(key, points, step + 1, False)
+        self._publish(key, points, self.steps + 1, True)
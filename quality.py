@@ -0,0 +1,172 @@
+# quality.py
+# Adaptive quality for the interactive loop. The loop marks the end of each
+# stage (physics, scene, overlay, present); the controller keeps a smoothed
+# cost per stage and, when the frame runs over budget, lowers one quality knob
+# that belongs to the most expensive stage. Once the frame is comfortably
+# under budget again, knobs come back in reverse order. Changes are spaced by
+# a cooldown so each one can be measured before the next, and a restore
+# that immediately pushes the frame back over budget makes the next restore
+# wait twice as long, so the controller does not oscillate between levels.
+import time
+from collections import deque
+
+TARGET_FRAME_MS = 1000.0 / 60
+OVER_BUDGET = 1.05     # degrade when the smoothed frame exceeds target * this
+UNDER_BUDGET = 0.8     # restore when it drops below target * this
+SMOOTHING = 0.1        # exponential moving average weight of the newest frame
+DEGRADE_FRAMES = 10    # consecutive frames over budget before degrading
+RESTORE_FRAMES = 90    # consecutive frames under budget before restoring
+MAX_RESTORE_BACKOFF = 16  # a restore that is undone at once doubles the wait, up to this
+COOLDOWN_FRAMES = 30   # frames to settle after any change
+MESSAGE_SECONDS = 4.0  # how long the last change stays on the HUD
+
+# Knob -> (stage it costs in, levels from best to cheapest, HUD format).
+# Order is the degrade priority within a stage: least visible loss first.
+# Physics always steps by DT; under load it steps every 2nd or 4th frame
+# (slow motion) rather than taking longer steps, so results never depend on load.
+KNOBS = {
+    "physics_stride": ("physics", (1, 2, 4), "1/{}"),
+    "trail_length": ("scene", (120, 60, 20, 0), "{}"),
+    "grid_step": ("scene", (20, 40, 100, 0), "{}"),
+    "sphere_detail": ("scene", ((16, 12), (10, 8), (8, 6), (6, 4)), "{0[0]}x{0[1]}"),
+    "render_scale": ("present", (1.0, 0.75, 0.5), "{:.0%}"),
+}
+
+
+class QualityController:
+    """
+    Per frame: begin_frame(), mark(stage) after each stage, end_frame()
+    before waiting on the clock. Knob values are read as attributes, e.g.
+    controller.sphere_detail. Every change is printed and kept in `history`.
+    """
+
+    def __init__(self, target_ms=TARGET_FRAME_MS, knobs=KNOBS, enabled=True):
+        self.target_ms = target_ms
+        self.knobs = knobs
+        self.enabled = enabled
+        self.level = {name: 0 for name in knobs}
+        self.stage_ms = {}
+        self.frame_ms = 0.0
+        self.over = 0
+        self.under = 0
+        self.cooldown = 0
+        self.frame = 0
+        self.restored_at = None      # frame of the last restore
+        self.backoff = 1
+        self.degraded = []          # stack of degraded knobs, newest last
+        self.history = deque(maxlen=100)  # (time, knob, old, new, reason)
+        self.message = None
+        self.message_time = 0.0
+        self._start = self._last = time.perf_counter()
+
+    def __getattr__(self, name):
+        knobs = self.__dict__.get("knobs", {})
+        if name in knobs:
+            return knobs[name][1][self.level[name]]
+        raise AttributeError(name)
+
+    # === Measurement ===
+    def begin_frame(self):
+        self._start = self._last = time.perf_counter()
+
+    def mark(self, stage, ms=None):
+        """
+        Charge the time since the previous mark (or begin_frame) to `stage`,
+        or `ms` if given (for replaying recorded timings)
+        """
+        now = time.perf_counter()
+        if ms is None:
+            ms = (now - self._last) * 1000.0
+        self._last = now
+        old = self.stage_ms.get(stage)
+        self.stage_ms[stage] = ms if old is None else old + SMOOTHING * (ms - old)
+
+    def end_frame(self, ms=None):
+        """Update the frame estimate and adjust at most one knob"""
+        if ms is None:
+            ms = (time.perf_counter() - self._start) * 1000.0
+        self.frame_ms = ms if not self.frame_ms else self.frame_ms + SMOOTHING * (ms - self.frame_ms)
+        self.frame += 1
+        if not self.enabled:
+            return
+        if self.cooldown:
+            self.cooldown -= 1
+            return
+        self.over = self.over + 1 if self.frame_ms > self.target_ms * OVER_BUDGET else 0
+        self.under = self.under + 1 if self.frame_ms < self.target_ms * UNDER_BUDGET else 0
+        if self.over >= DEGRADE_FRAMES:
+            self._degrade()
+        elif self.under >= RESTORE_FRAMES * self.backoff and self.degraded:
+            self.restored_at = self.frame
+            self._change(self.degraded.pop(), -1,
+                         f"frame {self.frame_ms:.1f} ms < {self.target_ms * UNDER_BUDGET:.1f} ms")
+
+    # === Adjustment ===
+    def _degrade(self):
+        if self.restored_at is not None:
+            recent = self.frame - self.restored_at <= 2 * COOLDOWN_FRAMES + DEGRADE_FRAMES
+            self.backoff = min(self.backoff * 2, MAX_RESTORE_BACKOFF) if recent else 1
+            self.restored_at = None
+        # Most expensive stage first; fall back to any stage with a knob left
+        stages = sorted(self.stage_ms, key=self.stage_ms.get, reverse=True)
+        for stage in stages:
+            for name, (knob_stage, levels, _) in self.knobs.items():
+                if knob_stage == stage and self.level[name] < len(levels) - 1:
+                    self.degraded.append(name)
+                    self._change(name, +1, f"frame {self.frame_ms:.1f} ms, "
+                                           f"{stage} {self.stage_ms[stage]:.1f} ms")
+                    return
+        self.over = 0  # everything is already at its cheapest
+
+    def _change(self, name, delta, reason):
+        old = self.format(name)
+        self.level[name] += delta
+        new = self.format(name)
+        self.over = self.under = 0
+        self.cooldown = COOLDOWN_FRAMES
+        arrow = "▼" if delta > 0 else "▲"
+        self.message = f"{arrow} {name} {old} -> {new} ({reason})"
+        self.message_time = time.time()
+        self.history.append((self.message_time, name, old, new, reason))
+        print(f"[quality] {time.strftime('%H:%M:%S')} {self.message}")
+
+    def reset(self):
+        """Back to full quality (e.g. after the scene is replaced)"""
+        while self.degraded:
+            self._change(self.degraded.pop(), -1, "reset")
+
+    # === HUD ===
+    def format(self, name):
+        return self.knobs[name][2].format(getattr(self, name))
+
+    def hud_lines(self):
+        stages = ", ".join(f"{s} {ms:.1f}" for s, ms in self.stage_ms.items())
+        lines = [f"Frame {self.frame_ms:.1f}/{self.target_ms:.1f} ms ({stages})"
+                 + ("" if self.enabled else " [auto quality off]"),
+                 "Quality: " + " | ".join(f"{name.replace('_', ' ')} {self.format(name)}"
+                                          for name in self.knobs)]
+        if self.message and time.time() - self.message_time < MESSAGE_SECONDS:
+            lines.append(self.message)
+        return lines
+
+
+if __name__ == "__main__":
+    # Replay a synthetic load: scene cost ramps up 4x as bodies are added,
+    # holds, then drops back. Per-knob costs are made-up milliseconds by level.
+    costs = {"physics_stride": (0.8, 0.4, 0.2), "trail_length": (3.0, 1.5, 0.5, 0.0),
+             "grid_step": (1.0, 0.5, 0.3, 0.0), "sphere_detail": (8.0, 5.0, 3.0, 2.0),
+             "render_scale": (4.0, 2.5, 1.2)}
+    controller = QualityController()
+    for frame in range(2400):
+        load = 1.0 + 3.0 * min(frame, 400) / 400 if frame < 1200 else 1.0
+        cost = {name: costs[name][controller.level[name]] for name in costs}
+        stages = {"physics": cost["physics_stride"],
+                  "scene": load * (cost["trail_length"] + cost["grid_step"] + cost["sphere_detail"]),
+                  "present": cost["render_scale"]}
+        for stage, ms in stages.items():
+            controller.mark(stage, ms)
+        controller.end_frame(sum(stages.values()))
+        if frame in (1199, 2399):
+            print(f"frame {frame + 1}: {controller.hud_lines()[0]}")
+            print(f"  {controller.hud_lines()[1]}")
+    print(f"{len(controller.history)} adjustments")
@@ -0,0 +1,194 @@
+# recorder.py
+# Frame export for long runs. The render loop hands finished RGBA frames to a
+# FrameWriter thread through a small bounded queue, so PNG compression or a
+# slow encoder pipe never stalls rendering (submit() only blocks once the
+# queue is full, which caps memory use).
+#
+#   python recorder.py --scenario galaxy --bodies 20000 --frames 600 --out frames
+#   python recorder.py --scenario galaxy --frames 600 --video run.mp4 --headless egl
+import argparse
+import os
+import queue
+import struct
+import subprocess
+import threading
+import time
+import zlib
+import numpy as np
+
+QUEUE_FRAMES = 8     # frames buffered between renderer and writer
+PNG_LEVEL = 3        # zlib level; higher is much slower for little gain on renders
+VIDEO_FPS = 30
+RECORD_DIR = "recordings"
+
+
+# === PNG ===
+def encode_png(rgba):
+    """PNG bytes for an (H, W, 4) uint8 image, rows top-down (no imaging library needed)"""
+    h, w = rgba.shape[:2]
+    rows = np.empty((h, w * 4 + 1), dtype=np.uint8)
+    rows[:, 0] = 0  # filter type "none" on every row
+    rows[:, 1:] = rgba.reshape(h, w * 4)
+
+    def chunk(kind, data):
+        return (struct.pack("!I", len(data)) + kind + data
+                + struct.pack("!I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+    header = struct.pack("!IIBBBBB", w, h, 8, 6, 0, 0, 0)  # 8-bit RGBA
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(rows.tobytes(), PNG_LEVEL)) + chunk(b"IEND", b""))
+
+
+def write_png(path, rgba):
+    with open(path, "wb") as f:
+        f.write(encode_png(rgba))
+
+
+# === Sinks ===
+class PNGSequence:
+    """Numbered PNG files in a directory"""
+
+    def __init__(self, directory, prefix="frame"):
+        self.directory = directory
+        self.prefix = prefix
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, index, rgba):
+        write_png(os.path.join(self.directory, f"{self.prefix}_{index:06d}.png"), rgba)
+
+    def close(self):
+        pass
+
+
+class EncoderPipe:
+    """
+    Raw RGBA frames piped to an encoder process (ffmpeg by default). Pass
+    `command` to use another encoder; it must read raw frames from stdin.
+    """
+
+    def __init__(self, path, width, height, fps=VIDEO_FPS, command=None):
+        if command is None:
+            command = ["ffmpeg", "-y", "-loglevel", "error",
+                       "-f", "rawvideo", "-pix_fmt", "rgba", "-s", f"{width}x{height}",
+                       "-r", str(fps), "-i", "-",
+                       "-c:v", "libx264", "-pix_fmt", "yuv420p", path]
+        self.size = (width, height)
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+    def write(self, index, rgba):
+        if rgba.shape[1::-1] != self.size:
+            raise ValueError(f"Frame is {rgba.shape[1]}x{rgba.shape[0]}, encoder expects "
+                             f"{self.size[0]}x{self.size[1]}")
+        self.process.stdin.write(np.ascontiguousarray(rgba).data)
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise RuntimeError(f"Encoder exited with status {self.process.returncode}")
+
+
+# === Writer Thread ===
+class FrameWriter:
+    """
+    Drains submitted frames into a sink on a background thread. Frames come
+    straight from glReadPixels (rows bottom-up) and are flipped on the worker.
+    """
+
+    def __init__(self, sink, max_queued=QUEUE_FRAMES):
+        self.sink = sink
+        self.queue = queue.Queue(max_queued)
+        self.submitted = 0
+        self.written = 0
+        self.stall_time = 0.0   # seconds submit() spent waiting on a full queue
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, frame, bottom_up=True):
+        """Queue an (H, W, 4) uint8 frame; the writer takes ownership of the array"""
+        if self.error is not None:
+            raise RuntimeError("Frame writer failed") from self.error
+        start = time.perf_counter()
+        self.queue.put((self.submitted, frame, bottom_up))
+        self.stall_time += time.perf_counter() - start
+        self.submitted += 1
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            if self.error is not None:
+                continue  # keep draining so submit() never blocks forever
+            index, frame, bottom_up = item
+            try:
+                self.sink.write(index, frame[::-1] if bottom_up else frame)
+                self.written += 1
+            except Exception as e:
+                self.error = e
+
+    def close(self):
+        """Flush queued frames, stop the thread and close the sink"""
+        self.queue.put(None)
+        self.thread.join()
+        self.sink.close()
+        if self.error is not None:
+            raise RuntimeError("Frame writer failed") from self.error
+
+    def stats(self):
+        return {"submitted": self.submitted, "written": self.written,
+                "stall_seconds": self.stall_time}
+
+
+def open_writer(out=None, video=None, width=None, height=None, fps=VIDEO_FPS):
+    """FrameWriter for a PNG directory (out) or a video file through ffmpeg (video)"""
+    if video:
+        return FrameWriter(EncoderPipe(video, width, height, fps))
+    return FrameWriter(PNGSequence(out or os.path.join(RECORD_DIR, time.strftime("%Y%m%d-%H%M%S"))))
+
+
+# === CLI ===
+def main():
+    parser = argparse.ArgumentParser(description="Render a headless run to PNGs or video")
+    parser.add_argument("--scenario", default="galaxy")
+    parser.add_argument("--bodies", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--solver", default=None, help="force solver (default: the scene's)")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--steps-per-frame", type=int, default=1)
+    parser.add_argument("--size", default="1280x720")
+    parser.add_argument("--out", default=None, help="PNG directory (default recordings/<time>)")
+    parser.add_argument("--video", default=None, help="encode to this file with ffmpeg instead")
+    parser.add_argument("--fps", type=int, default=VIDEO_FPS)
+    parser.add_argument("--headless", choices=("egl", "osmesa"), default=None,
+                        help="software/offscreen OpenGL instead of a hidden window")
+    args = parser.parse_args()
+    width, height = (int(v) for v in args.size.lower().split("x"))
+
+    # PyOpenGL binds its platform on first import, so choose before importing it
+    if args.headless:
+        os.environ["PYOPENGL_PLATFORM"] = args.headless
+        if args.headless == "egl":
+            os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+    from offscreen import record_run
+    from scenarios import create_scenario, scene_solver
+
+    kwargs = {"seed": args.seed}
+    if args.bodies:
+        kwargs["n_asteroids" if args.scenario == "solar_system" else "n"] = args.bodies
+    state = create_scenario(args.scenario, **kwargs)
+    writer = open_writer(args.out, args.video, width, height, args.fps)
+    start = time.perf_counter()
+    try:
+        record_run(state, writer, width, height, args.frames, platform=args.headless or "window",
+                   steps_per_frame=args.steps_per_frame,
+                   acc_fn=scene_solver(args.scenario, args.solver))
+    finally:
+        writer.close()
+    s = writer.stats()
+    print(f"{s['written']} frames at {width}x{height} in {time.perf_counter() - start:.1f}s, "
+          f"render loop waited {s['stall_seconds']:.2f}s on the writer")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,13 +10,15 @@ SAVE_FILE = os.path.join(SAVE_DIR, "auto_save.pyv")
 
 def save_universe(planets):
     data = []
-    for p in planets:
+    # Spawn order, so files do not depend on the in-memory list order
+    for p in sorted(planets, key=lambda p: p.id):
         data.append({
             "pos": p.pos.tolist(),
             "vel": p.vel.tolist(),
             "radius": p.radius,
             "color": p.color,
-            "mass": p.mass
+            "mass": p.mass,
+            "light": p.light
         })
     try:
         with open(SAVE_FILE, 'w') as f:
@@ -36,7 +38,8 @@ def load_universe():
         return [Planet(
             x=p["pos"][0], y=p["pos"][1], z=p["pos"][2],
             vx=p["vel"][0], vy=p["vel"][1], vz=p["vel"][2],
-            radius=p["radius"], color=p["color"], mass=p["mass"]
+            radius=p["radius"], color=p["color"], mass=p["mass"],
+            light=p.get("light", False)
         ) for p in data]
     except:
         return None
\ No newline at end of file
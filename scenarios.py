@@ -0,0 +1,199 @@
+# scenarios.py
+# Bulk, seeded initial-condition generators. Every generator fills BodyState
+# arrays directly; no per-body Python objects are created.
+import time
+import numpy as np
+from config import G
+from gravity import make_solver
+from bodies import BodyState, concatenate
+from kepler import elements_to_cartesian
+
+ASTEROID_COLOR = (0.5, 0.5, 0.5)
+STAR_COLOR = (1.0, 0.9, 0.6)
+
+
+def _rng(seed):
+    return seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+
+
+def _random_directions(rng, n):
+    """Uniform unit vectors on the sphere, (n, 3)"""
+    cos_t = rng.uniform(-1.0, 1.0, n)
+    sin_t = np.sqrt(1.0 - cos_t * cos_t)
+    phi = rng.uniform(0.0, 2 * np.pi, n)
+    return np.stack([sin_t * np.cos(phi), sin_t * np.sin(phi), cos_t], axis=1)
+
+
+# === Generators ===
+def keplerian_belt(n, central_mass, r_min=380.0, r_max=470.0, ecc_max=0.05,
+                   inc_max=0.03, radius_range=(1.5, 3.0), mass=None,
+                   center=(0, 0, 0), center_vel=(0, 0, 0), color=ASTEROID_COLOR, light=False, seed=None):
+    """
+    Asteroid belt on Keplerian orbits around `central_mass` in the X-Z plane.
+    ecc_max = 0 gives exactly circular orbits. Masses default to radius * 100
+    like Planet does; light=True makes the asteroids test particles.
+    """
+    rng = _rng(seed)
+    a = rng.uniform(r_min, r_max, n)
+    e = rng.uniform(0.0, ecc_max, n)
+    inc = rng.uniform(-inc_max, inc_max, n)
+    node = rng.uniform(0.0, 2 * np.pi, n)
+    peri = rng.uniform(0.0, 2 * np.pi, n)
+    f = rng.uniform(0.0, 2 * np.pi, n)
+    pos, vel = elements_to_cartesian(G * central_mass, a, e, inc, node, peri, f)
+    pos += center
+    vel += center_vel
+
+    radius = rng.uniform(*radius_range, n)
+    masses = radius * 100 if mass is None else np.full(n, float(mass))
+    return BodyState(pos, vel, masses, radius, color, light)
+
+
+def plummer_sphere(n, total_mass, scale_radius=100.0, radius=1.0,
+                   center=(0, 0, 0), bulk_vel=(0, 0, 0), color=STAR_COLOR, seed=None):
+    """Plummer model in virial equilibrium (Aarseth, Henon & Wielen 1974 sampling)"""
+    rng = _rng(seed)
+
+    # Radii from the inverted cumulative mass profile (clip the far tail)
+    x = rng.uniform(1e-6, 0.999, n)
+    r = scale_radius / np.sqrt(x ** (-2.0 / 3.0) - 1.0)
+    pos = r[:, None] * _random_directions(rng, n)
+
+    # Speeds as a fraction q of escape speed, q^2 (1 - q^2)^3.5 by rejection
+    q = np.empty(n)
+    todo = np.arange(n)
+    while todo.size:
+        trial = rng.uniform(0.0, 1.0, todo.size)
+        accept = rng.uniform(0.0, 0.1, todo.size) < trial ** 2 * (1.0 - trial ** 2) ** 3.5
+        q[todo[accept]] = trial[accept]
+        todo = todo[~accept]
+    v_esc = np.sqrt(2.0 * G * total_mass / np.sqrt(r * r + scale_radius ** 2))
+    vel = (q * v_esc)[:, None] * _random_directions(rng, n)
+
+    pos += center
+    vel += bulk_vel
+    return BodyState(pos, vel, np.full(n, total_mass / n), np.full(n, float(radius)), color)
+
+
+def disk_galaxy(n, disk_mass, scale_length=150.0, thickness=5.0, central_mass=0.0,
+                dispersion=0.05, softening=10.0, radius=1.0, center=(0, 0, 0),
+                bulk_vel=(0, 0, 0), color=(0.7, 0.8, 1.0), seed=None):
+    """
+    Rotating exponential disk in the X-Z plane, optionally around a central mass.
+    Circular speeds come from the enclosed disk mass plus the central mass;
+    `dispersion` adds random motion as a fraction of the circular speed.
+    The central body itself is not included - add it separately.
+    """
+    rng = _rng(seed)
+
+    # Surface density ~ exp(-R/h): R follows a Gamma(2, h) distribution
+    R = rng.gamma(2.0, scale_length, n)
+    theta = rng.uniform(0.0, 2 * np.pi, n)
+    y = rng.normal(0.0, thickness, n)
+    cos_t, sin_t = np.cos(theta), np.sin(theta)
+    pos = np.stack([R * cos_t, y, R * sin_t], axis=1)
+
+    s = R / scale_length
+    m_enc = central_mass + disk_mass * (1.0 - (1.0 + s) * np.exp(-s))
+    v_c = np.sqrt(G * m_enc * R * R / (R * R + softening ** 2) ** 1.5)
+    vel = np.stack([-v_c * sin_t, np.zeros(n), v_c * cos_t], axis=1)
+    vel += rng.normal(0.0, 1.0, (n, 3)) * (dispersion * v_c)[:, None]
+
+    pos += center
+    vel += bulk_vel
+    return BodyState(pos, vel, np.full(n, disk_mass / n), np.full(n, float(radius)), color)
+
+
+def uniform_box(n, total_mass, size=2000.0, radius=1.0, center=(0, 0, 0),
+                color=STAR_COLOR, seed=None):
+    """Cold, uniform cube of equal masses (cosmology-style collapse test)"""
+    rng = _rng(seed)
+    pos = rng.uniform(-0.5 * size, 0.5 * size, (n, 3)) + center
+    return BodyState(pos, np.zeros((n, 3)), np.full(n, total_mass / n), np.full(n, float(radius)), color)
+
+
+# === Scenes ===
+def solar_system(n_asteroids=30, seed=None):
+    """Sun, Earth, Mars, Jupiter and an orbital asteroid belt"""
+    major = BodyState(
+        pos=[[0, 0, 0], [200, 0, 0], [350, 0, 0], [500, 0, 0]],
+        vel=[[0, 0, 0], [0, 0, 30], [0, 0, 25], [0, 0, 18]],
+        mass=[50000, 800, 600, 1200],
+        radius=[15, 8, 6, 12],
+        color=[(1.0, 0.8, 0.2), (0.0, 0.5, 1.0), (0.6, 0.4, 0.2), (0.9, 0.7, 0.3)],
+    )
+    belt = keplerian_belt(n_asteroids, central_mass=50000, light=True, seed=seed)
+    return concatenate([major, belt])
+
+
+def planetary_system(n=200, seed=None):
+    """
+    Sun with five light planets on near-circular orbits, well separated in
+    Hill radii, and a belt of test-particle asteroids: the Sun-dominated
+    case wisdom_holman.py is built for. Costs O(n) per step, so n can be
+    in the hundreds of thousands.
+    """
+    rng = _rng(seed)
+    sun = BodyState([[0, 0, 0]], [[0, 0, 0]], [50000.0], [15.0], [(1.0, 0.8, 0.2)])
+    a = 150.0 * 1.7 ** np.arange(5)
+    mu = G * 50000
+    pos, vel = elements_to_cartesian(mu, a, rng.uniform(0.0, 0.03, 5), rng.uniform(-0.02, 0.02, 5),
+                                     rng.uniform(0.0, 2 * np.pi, 5), rng.uniform(0.0, 2 * np.pi, 5),
+                                     rng.uniform(0.0, 2 * np.pi, 5))
+    planets = BodyState(pos, vel, [10.0, 15.0, 20.0, 30.0, 25.0], [5.0, 6.0, 10.0, 9.0, 8.0],
+                        [(0.0, 0.5, 1.0), (0.6, 0.4, 0.2), (0.9, 0.7, 0.3), (0.8, 0.8, 0.6), (0.5, 0.7, 0.9)])
+    belt = keplerian_belt(n, central_mass=50000, r_min=310.0, r_max=350.0, mass=0.01,
+                          light=True, seed=rng)
+    return concatenate([sun, planets, belt])
+
+
+def galaxy(n=100000, seed=None):
+    """Disk galaxy around a heavy core"""
+    core = BodyState([[0, 0, 0]], [[0, 0, 0]], [50000.0], [10.0], [STAR_COLOR])
+    disk = disk_galaxy(n, disk_mass=50000.0, central_mass=50000.0, seed=seed)
+    return concatenate([core, disk])
+
+
+def star_cluster(n=100000, seed=None):
+    return plummer_sphere(n, total_mass=100000.0, seed=seed)
+
+
+def cosmic_box(n=100000, seed=None):
+    return uniform_box(n, total_mass=100000.0, seed=seed)
+
+
+SCENARIOS = {
+    "solar_system": solar_system,
+    "planetary_system": planetary_system,
+    "galaxy": galaxy,
+    "star_cluster": star_cluster,
+    "cosmic_box": cosmic_box,
+}
+
+# Default force solver per scene (see gravity.make_solver)
+SCENE_SOLVERS = {
+    "solar_system": "direct",
+    "planetary_system": "direct",
+    "galaxy": "pm",
+    "star_cluster": "pm",
+    "cosmic_box": "p3m",
+}
+
+
+def create_scenario(name, **kwargs):
+    """Build a named scene from SCENARIOS"""
+    if name not in SCENARIOS:
+        raise ValueError(f"Unknown scenario '{name}' (choose from {', '.join(SCENARIOS)})")
+    return SCENARIOS[name](**kwargs)
+
+
+def scene_solver(name, solver=None, **kwargs):
+    """Force function for a scene: its SCENE_SOLVERS default unless `solver` overrides it"""
+    return make_solver(solver or SCENE_SOLVERS.get(name, "direct"), **kwargs)
+
+
+if __name__ == "__main__":
+    for name in SCENARIOS:
+        start = time.perf_counter()
+        state = create_scenario(name, **({} if name == "solar_system" else {"n": 1_000_000}), seed=1)
+        print(f"{name:>13}: {len(state):>8} bodies in {time.perf_counter() - start:.3f}s")
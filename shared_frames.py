@@ -0,0 +1,399 @@
+# shared_frames.py
+# Local viewer attach for a long headless run, without sockets or copies.
+# The physics process publishes each frame into a named shared-memory ring of
+# snapshot slots; any number of viewers attach by name, read the newest slot
+# in place and detach whenever they like. The writer never waits on readers.
+#
+# Each slot carries a sequence number (a seqlock): the writer makes it odd
+# before touching the slot and even again after, so a reader that sees the
+# same even number before and after its read knows the data was not torn.
+# With SLOTS slots the writer has to lap the ring during one read for that
+# to fail, so readers almost never retry. The protocol relies on stores
+# becoming visible in program order (true on x86-64); Python has no fences.
+#
+#   python shared_frames.py run --scenario galaxy --bodies 20000
+#   python shared_frames.py view
+#   python shared_frames.py check
+import argparse
+import multiprocessing as mp
+import time
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+import gravity
+from config import DT
+
+DEFAULT_NAME = "pyverse_frames"
+SLOTS = 4
+MIN_CAPACITY = 1024   # bodies per slot; the writer re-creates the ring to grow
+READ_RETRIES = 8
+POINTS_ABOVE = 2000   # viewer draws points instead of spheres past this many bodies
+
+MAGIC = 0x53_4D_48_53_59_56_59_50  # b"PYVYSHMS" as a little-endian u64
+VERSION = 1
+# Header words (uint64)
+H_MAGIC, H_VERSION, H_CAPACITY, H_SLOTS, H_LATEST, H_CLOSED = range(6)
+HEADER_WORDS = 8
+# Slot meta words: sequence, frame number, body count, sim time (float64 bits)
+M_SEQ, M_FRAME, M_COUNT, M_TIME = range(4)
+META_WORDS = 8
+ALIGN = 64
+
+
+# === Layout ===
+def _align(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _layout(capacity, slots):
+    """Byte offsets of each block: header, slot meta, then per-slot arrays"""
+    offsets = {"header": 0, "meta": _align(8 * HEADER_WORDS)}
+    end = offsets["meta"] + _align(8 * META_WORDS * slots)
+    for name, itemsize in (("pos", 24), ("radius", 4), ("color", 12)):
+        offsets[name] = end
+        end += _align(itemsize * capacity) * slots
+    return offsets, end
+
+
+class _Views:
+    """numpy views of a mapped ring"""
+
+    def __init__(self, buf, capacity, slots):
+        offsets, _ = _layout(capacity, slots)
+        self.capacity, self.slots = capacity, slots
+        self.header = np.ndarray(HEADER_WORDS, np.uint64, buf, offsets["header"])
+        self.meta = np.ndarray((slots, META_WORDS), np.uint64, buf, offsets["meta"])
+        self.pos = [np.ndarray((capacity, 3), np.float64, buf, offsets["pos"] + i * _align(24 * capacity))
+                    for i in range(slots)]
+        self.radius = [np.ndarray(capacity, np.float32, buf, offsets["radius"] + i * _align(4 * capacity))
+                       for i in range(slots)]
+        self.color = [np.ndarray((capacity, 3), np.float32, buf, offsets["color"] + i * _align(12 * capacity))
+                      for i in range(slots)]
+
+    def release(self):
+        # Views must go before the mapping can be closed
+        self.header = self.meta = self.pos = self.radius = self.color = None
+
+
+def _attach(name):
+    """Open an existing segment without letting this process's resource tracker unlink it"""
+    try:
+        return shared_memory.SharedMemory(name, track=False)  # Python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+# === Writer ===
+class SnapshotRing:
+    """Writer side: publish(pos, radius, color, t) once per frame, close() at the end"""
+
+    def __init__(self, name=DEFAULT_NAME, capacity=MIN_CAPACITY, slots=SLOTS):
+        self.name = name
+        self.slots = slots
+        self.frames = 0
+        self.shm = None
+        self.views = None
+        self._create(max(capacity, MIN_CAPACITY))
+
+    def _create(self, capacity):
+        _, size = _layout(capacity, self.slots)
+        try:
+            self.shm = shared_memory.SharedMemory(self.name, create=True, size=size)
+        except FileExistsError:
+            # Left over from a run that did not exit cleanly: mark it closed so
+            # viewers still attached to it move on, then replace it. Opened
+            # tracked (not _attach): unlink() below unregisters it again
+            print(f"Replacing stale shared memory '{self.name}'")
+            stale = shared_memory.SharedMemory(self.name)
+            if stale.size >= 8 * HEADER_WORDS:
+                np.ndarray(HEADER_WORDS, np.uint64, stale.buf)[H_CLOSED] = 1
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(self.name, create=True, size=size)
+        self.views = _Views(self.shm.buf, capacity, self.slots)
+        h = self.views.header
+        h[:] = 0
+        self.views.meta[:] = 0
+        h[H_CAPACITY], h[H_SLOTS], h[H_VERSION] = capacity, self.slots, VERSION
+        h[H_MAGIC] = MAGIC  # last, so a reader never sees a half-written header
+
+    def _destroy(self):
+        self.views.header[H_CLOSED] = 1
+        self.views.release()
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = self.views = None
+
+    def publish(self, pos, radius, color, t=0.0):
+        """Copy one frame into the next slot and make it the latest"""
+        n = len(pos)
+        if n > self.views.capacity:
+            # Readers see the closed flag and re-attach to the bigger ring
+            self._destroy()
+            self._create(max(2 * n, MIN_CAPACITY))
+        v = self.views
+        self.frames += 1
+        slot = self.frames % self.slots
+        meta = v.meta[slot]
+        meta[M_SEQ] += 1  # odd: slot is being written
+        meta[M_FRAME], meta[M_COUNT] = self.frames, n
+        meta[M_TIME:M_TIME + 1].view(np.float64)[0] = t
+        v.pos[slot][:n] = pos
+        v.radius[slot][:n] = radius
+        v.color[slot][:n] = color
+        meta[M_SEQ] += 1  # even: consistent again
+        v.header[H_LATEST] = self.frames
+
+    def close(self):
+        if self.shm is not None:
+            self._destroy()
+
+
+# === Reader ===
+class SnapshotReader:
+    """
+    Viewer side. latest() returns (frame, t, pos, radius, color) for the newest
+    consistent slot, or None while nothing is published (or the writer is
+    gone). Attaching and detaching never disturb the writer.
+    """
+
+    def __init__(self, name=DEFAULT_NAME):
+        self.name = name
+        self.shm = None
+        self.views = None
+        self.retries = 0
+
+    def attach(self):
+        """Map the ring if it exists; returns whether we are attached"""
+        if self.views is not None:
+            return True
+        try:
+            shm = _attach(self.name)
+        except FileNotFoundError:
+            return False
+        header = np.ndarray(HEADER_WORDS, np.uint64, shm.buf)
+        ok = header[H_MAGIC] == MAGIC and header[H_VERSION] == VERSION and not header[H_CLOSED]
+        capacity, slots = int(header[H_CAPACITY]), int(header[H_SLOTS])
+        del header
+        if not ok or shm.size < _layout(capacity, slots)[1]:
+            shm.close()
+            return False
+        self.shm, self.views = shm, _Views(shm.buf, capacity, slots)
+        return True
+
+    def detach(self):
+        if self.views is not None:
+            self.views.release()
+            self.shm.close()
+            self.shm = self.views = None
+
+    def latest(self, convert=np.array):
+        """
+        Read the newest frame. `convert(pos)` receives a read-only view into
+        shared memory and must return its own copy in whatever form the
+        caller needs (the viewer converts straight to float32 camera-relative
+        positions, so the float64 array is never copied as such). The result
+        is discarded and re-read if the writer overwrote the slot meanwhile.
+        """
+        if not self.attach():
+            return None
+        v = self.views
+        for _ in range(READ_RETRIES):
+            if v.header[H_CLOSED]:
+                self.detach()  # writer exited or grew the ring
+                return None
+            latest = int(v.header[H_LATEST])
+            if latest == 0:
+                return None
+            slot = latest % v.slots
+            meta = v.meta[slot]
+            seq = int(meta[M_SEQ])
+            if seq % 2 == 0:
+                frame, n = int(meta[M_FRAME]), int(meta[M_COUNT])
+                t = float(meta[M_TIME:M_TIME + 1].view(np.float64)[0])
+                pos = v.pos[slot][:n]
+                pos.flags.writeable = False
+                result = (frame, t, convert(pos), v.radius[slot][:n].copy(), v.color[slot][:n].copy())
+                if int(meta[M_SEQ]) == seq:
+                    return result
+            self.retries += 1
+        return None
+
+
+# === Headless run ===
+def run(args):
+    """Step a scene headlessly (as streaming.py serve does) and publish every frame"""
+    from streaming import _make_state, _make_solver, _make_integrator
+    state = _make_state(args)
+    acc_fn = _make_solver(args)
+    integrator = _make_integrator(args, acc_fn)
+    ring = SnapshotRing(args.name, capacity=2 * len(state))
+    print(f"Publishing {len(state)} bodies to shared memory '{args.name}' "
+          f"(python shared_frames.py view --name {args.name})")
+    t = 0.0
+    start = last_report = time.perf_counter()
+    publish_time = 0.0
+    try:
+        while args.steps is None or ring.frames < args.steps:
+            if integrator is not None:
+                integrator.step(state, args.dt)
+            else:
+                gravity.step(state, args.dt, acc_fn)
+            t += args.dt
+            begin = time.perf_counter()
+            ring.publish(state.pos, state.radius, state.color, t)
+            publish_time += time.perf_counter() - begin
+            if begin - last_report > 5.0:
+                last_report = begin
+                print(f"frame {ring.frames}, t={t:.2f}: {ring.frames / (begin - start):.1f} steps/s, "
+                      f"publish {1000 * publish_time / ring.frames:.3f} ms/frame")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ring.close()
+
+
+def run_viewer(name=DEFAULT_NAME):
+    """Attach to a running ring and draw it; closing the window just detaches"""
+    import pygame
+    from pygame.locals import QUIT, KEYDOWN, K_ESCAPE, K_g, MOUSEBUTTONDOWN, VIDEORESIZE
+    from OpenGL.GL import (glClear, glLoadIdentity, glTranslatef, glScalef, glEnable,
+                           glMatrixMode, GL_COLOR_BUFFER_BIT, GL_DEPTH_BUFFER_BIT,
+                           GL_DEPTH_TEST, GL_PROJECTION, GL_MODELVIEW)
+    from OpenGL.GLU import gluPerspective
+    from display import get_display
+    from floating_origin import FloatingOrigin, camera_focus
+    from simulation import draw_bodies, draw_points, draw_grid
+
+    pygame.init()
+    display = get_display((1000, 800), "PyVerse - shared memory viewer")
+
+    def resize():
+        w, h = display.size
+        glMatrixMode(GL_PROJECTION)
+        glLoadIdentity()
+        gluPerspective(45, w / h, 1.0, 1000.0)
+        glMatrixMode(GL_MODELVIEW)
+
+    glEnable(GL_DEPTH_TEST)
+    resize()
+    clock = pygame.time.Clock()
+    reader = SnapshotReader(name)
+    cam_pos, zoom = [0.0, 0.0, 100.0], 1.0
+    origin = FloatingOrigin()
+    render_pos = spare = None  # two float32 buffers: a torn read never lands in the one on screen
+    snap = None
+    show_grid = True
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == QUIT or (event.type == KEYDOWN and event.key == K_ESCAPE):
+                running = False
+            elif event.type == VIDEORESIZE:
+                display.handle_event(event)
+                resize()
+            elif event.type == KEYDOWN and event.key == K_g:
+                show_grid = not show_grid
+            elif event.type == MOUSEBUTTONDOWN and event.button in (4, 5):
+                zoom = min(zoom * 1.1, 10.0) if event.button == 4 else max(zoom / 1.1, 0.1)
+
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        glLoadIdentity()
+        origin.update(camera_focus(cam_pos, zoom))
+        glTranslatef(*origin.view_offset(cam_pos, zoom))
+        glScalef(zoom, zoom, zoom)
+        if show_grid:
+            draw_grid(cam_pos, zoom, origin)
+        latest = reader.latest(lambda pos: origin.to_local(pos, out=spare))
+        if latest is not None:
+            snap, spare, render_pos = latest, render_pos, latest[2]
+        if snap is not None:
+            frame, t, _, radius, color = snap
+            if len(render_pos) > POINTS_ABOVE:
+                draw_points(render_pos, color)
+            else:
+                draw_bodies(render_pos, radius, color)
+            caption = f"frame {frame}, t={t:.2f}, {len(render_pos)} bodies"
+        else:
+            caption = "waiting for a run"
+        pygame.display.set_caption(f"PyVerse - shared memory '{name}': {caption}")
+        pygame.display.flip()
+        clock.tick(60)
+    reader.detach()
+    display.close()
+    pygame.quit()
+
+
+# === Self-check ===
+def _hammer(name, n, seconds):
+    """Writer for check(): every element of frame k's pos equals k"""
+    ring = SnapshotRing(name, capacity=n)
+    pos = np.empty((n, 3))
+    radius = np.ones(n, dtype=np.float32)
+    color = np.ones((n, 3), dtype=np.float32)
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pos.fill(ring.frames + 1)
+        ring.publish(pos, radius, color, float(ring.frames + 1))
+    print(f"  writer: {ring.frames} frames ({ring.frames / seconds:.0f}/s)")
+    ring.close()
+
+
+def check(n=200000, seconds=3.0, name=DEFAULT_NAME + "_check"):
+    """Read while another process publishes flat out; no accepted frame may be torn"""
+    writer = mp.Process(target=_hammer, args=(name, n, seconds))
+    writer.start()
+    reader = SnapshotReader(name)
+    reads = torn = 0
+    read_time = 0.0
+    while writer.is_alive():
+        begin = time.perf_counter()
+        snap = reader.latest(lambda pos: pos.astype(np.float32))
+        if snap is None:
+            continue
+        read_time += time.perf_counter() - begin
+        frame, t, pos, _, _ = snap
+        reads += 1
+        if not (pos.min() == pos.max() == frame == t):
+            torn += 1
+    writer.join()
+    reader.detach()
+    print(f"  reader: {reads} frames of {n} bodies, {read_time / max(reads, 1) * 1000:.2f} ms/read, "
+          f"{reader.retries} retries, {torn} torn frames accepted")
+    return torn == 0 and reads > 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish a headless run to shared memory / view it")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("run")
+    p.add_argument("--name", default=DEFAULT_NAME)
+    p.add_argument("--scenario", default="solar_system")
+    p.add_argument("--bodies", type=int, default=0)
+    p.add_argument("--seed", type=int, default=None)
+    p.add_argument("--solver", choices=gravity.SOLVERS, default=None,
+                   help="force solver (default: the scene's)")
+    p.add_argument("--precision", choices=gravity.PRECISIONS, default="float64",
+                   help="mixed: float32 pair terms (direct solver only)")
+    p.add_argument("--integrator", choices=("kick-drift", "wh"), default="kick-drift")
+    p.add_argument("--dt", type=float, default=DT)
+    p.add_argument("--steps", type=int, default=None, help="stop after this many (default: run until Ctrl-C)")
+    view = sub.add_parser("view")
+    view.add_argument("--name", default=DEFAULT_NAME)
+    chk = sub.add_parser("check", help="seqlock consistency under a flat-out writer")
+    chk.add_argument("--bodies", type=int, default=200000)
+    chk.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    if args.cmd == "run":
+        run(args)
+    elif args.cmd == "view":
+        run_viewer(args.name)
+    else:
+        ok = check(args.bodies, args.seconds)
+        print("OK" if ok else "FAILED")
+
+
+if __name__ == "__main__":
+    main()
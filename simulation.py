@@ -1,32 +1,61 @@
 # simulation.py
+import itertools
+import os
+import time
+from collections import deque
 import pygame
 from pygame.locals import *
 from OpenGL.GL import *
 from OpenGL.GLU import *
 import numpy as np
 from config import *
+from floating_origin import FloatingOrigin, camera_focus
+from scenarios import keplerian_belt
+from prediction import OrbitPredictor
+from bodies import BodyState
+from diagnostics import Diagnostics, DiagnosticsLog
+from quality import QualityController, KNOBS
+from display import get_display
+from ephemeris import cached_ephemeris
 
 # === Global Settings ===
 settings = None
 
+# === Prediction Overlay ===
+PREDICTION_COLOR = (0.5, 0.9, 0.5, 0.6)
+STAR_MASS = 30000
+
 # === Grid Settings ===
 GRID_SIZE = 1000
 GRID_STEP = 20
 GRID_COLOR = (0.1, 0.3, 0.5)
 GRID_ALPHA = 0.3
 
+# === Diagnostics ===
+LOG_DIR = "logs"
+
+# === Trails ===
+TRAIL_ALPHA = 0.5
+MAX_TRAIL = max(KNOBS["trail_length"][1])
+
+# === Body Ids ===
+_planet_ids = itertools.count()
+
 # === Planet Class ===
 class Planet:
-    def __init__(self, x, y, z, vx, vy, vz, radius, color, mass=None):
+    def __init__(self, x, y, z, vx, vy, vz, radius, color, mass=None, light=False):
+        self.id = next(_planet_ids)  # spawn order; stable, unlike a list index
         self.pos = np.array([x, y, z], dtype=float)
         self.vel = np.array([vx, vy, vz], dtype=float)
         self.radius = radius
         self.color = color
         self.mass = mass if mass else radius * 100
+        self.light = light  # test particle: feels gravity, pulls on nothing
 
-    def update(self, planets, dt):
+    def update(self, sources, dt):
+        """Step dt under the pull of `sources`, the bodies that are not light"""
         acc = np.zeros(3)
-        for other in planets:
+        for other in sources:
             if other is self:
                 continue
             r_vec = other.pos - self.pos
@@ -39,33 +68,64 @@ class Planet:
         self.vel += acc * dt
         self.pos += self.vel * dt
 
-    def draw(self):
+    def draw(self, local_pos=None, slices=16, stacks=12, mesh=None):
+        """
+        Draw at a camera-relative float32 position (defaults to world pos),
+        from a cached display.SphereMesh when given
+        """
         glPushMatrix()
-        glTranslatef(*self.pos)
+        glTranslatef(*(self.pos if local_pos is None else local_pos))
         glColor3f(*self.color)
-        quad = gluNewQuadric()
-        gluSphere(quad, self.radius, 16, 12)
+        if mesh is not None:
+            mesh.draw(self.radius)
+        else:
+            gluSphere(get_quadric(), self.radius, slices, stacks)
+        glPopMatrix()
+
+
+# === Shared Quadric ===
+_quadric = None
+
+def get_quadric():
+    """One GLU quadric reused by every sphere (allocating per draw leaks)"""
+    global _quadric
+    if _quadric is None:
+        _quadric = gluNewQuadric()
+    return _quadric
+
+
+def draw_bodies(local_pos, radii, colors, slices=16, stacks=12):
+    """Draw spheres from float32 camera-relative positions"""
+    quad = get_quadric()
+    for pos, radius, color in zip(local_pos, radii, colors):
+        glPushMatrix()
+        glTranslatef(*pos)
+        glColor3f(*color)
+        gluSphere(quad, radius, slices, stacks)
         glPopMatrix()
 
 
-def create_solar_system():
-    """Create initial solar system with Sun and planets"""
+def draw_points(local_pos, colors, size=2.0):
+    """Bodies as points from one vertex array (for scenes too large for spheres)"""
+    glPointSize(size)
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glEnableClientState(GL_COLOR_ARRAY)
+    glVertexPointer(3, GL_FLOAT, 0, np.ascontiguousarray(local_pos, dtype=np.float32))
+    glColorPointer(3, GL_FLOAT, 0, np.ascontiguousarray(colors, dtype=np.float32))
+    glDrawArrays(GL_POINTS, 0, len(local_pos))
+    glDisableClientState(GL_COLOR_ARRAY)
+    glDisableClientState(GL_VERTEX_ARRAY)
+
+
+def create_solar_system(seed=None, n_asteroids=30):
+    """Create initial solar system with Sun, planets and an orbital asteroid belt"""
     return [
         Planet(0, 0, 0, 0, 0, 0, 15, (1.0, 0.8, 0.2), mass=50000),  # Sun
         Planet(200, 0, 0, 0, 0, 30, 8, (0.0, 0.5, 1.0)),           # Earth
         Planet(350, 0, 0, 0, 0, 25, 6, (0.6, 0.4, 0.2)),           # Mars
         Planet(500, 0, 0, 0, 0, 18, 12, (0.9, 0.7, 0.3)),          # Jupiter
-        # Add random asteroids
-        *[Planet(
-            np.random.uniform(100, 800),
-            np.random.uniform(-20, 20),
-            np.random.uniform(100, 800),
-            np.random.uniform(-5, 5),
-            np.random.uniform(-1, 1),
-            np.random.uniform(-5, 5),
-            np.random.uniform(1.5, 3.0),
-            (0.5, 0.5, 0.5)
-        ) for _ in range(30)]
+        # Asteroids on Keplerian orbits around the Sun (generated in bulk, test particles)
+        *keplerian_belt(n_asteroids, central_mass=50000, light=True, seed=seed).to_planets()
     ]
 
 
@@ -77,13 +137,16 @@ def screen_to_world(x, y, width, height, cam_pos, zoom):
     return world_x, world_y, world_z
 
 
-def draw_grid(cam_pos, zoom):
-    """Draw X-Z plane grid at Y=0"""
+def draw_grid(cam_pos, zoom, origin=None, step=GRID_STEP):
+    """Draw X-Z plane grid at Y=0 (shifted into the floating-origin frame)"""
+    glPushMatrix()
+    if origin is not None:
+        glTranslatef(*(-origin.origin))
     glLineWidth(1.0 + zoom * 0.05)
     glColor4f(*GRID_COLOR, GRID_ALPHA)
     glBegin(GL_LINES)
     half = GRID_SIZE // 2
-    for i in range(-half, half + 1, GRID_STEP):
+    for i in range(-half, half + 1, step):
         # X lines (Z fixed)
         glVertex3f(-half, 0, i)
         glVertex3f(half, 0, i)
@@ -91,9 +154,161 @@ def draw_grid(cam_pos, zoom):
         glVertex3f(i, 0, -half)
         glVertex3f(i, 0, half)
     glEnd()
+    glPopMatrix()
+
+
+def draw_trails(history, colors, origin, length):
+    """Fading line strip behind each body from the last `length` world positions"""
+    if length < 2 or len(history) < 2:
+        return
+    recent = list(history)[-length:]
+    t = len(recent)
+    # (N, T, 3): one contiguous strip per body
+    points = np.stack([origin.to_local(p) for p in recent], axis=1).astype(np.float32)
+    n = len(points)
+    rgba = np.empty((n, t, 4), dtype=np.float32)
+    rgba[..., :3] = np.asarray(colors, dtype=np.float32)[:, None, :]
+    rgba[..., 3] = np.linspace(0.0, TRAIL_ALPHA, t, dtype=np.float32)
+    glLineWidth(1.0)
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glEnableClientState(GL_COLOR_ARRAY)
+    glVertexPointer(3, GL_FLOAT, 0, points)
+    glColorPointer(4, GL_FLOAT, 0, rgba)
+    for i in range(n):
+        glDrawArrays(GL_LINE_STRIP, i * t, t)
+    glDisableClientState(GL_COLOR_ARRAY)
+    glDisableClientState(GL_VERTEX_ARRAY)
+
+
+def scene_target(target, scale):
+    """
+    Offscreen target for drawing the scene at `scale` x the window size, or
+    None at full size. Recreated when the window or scale changes.
+    """
+    width, height = get_display().size
+    size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    if target is not None and (scale >= 1.0 or (target.width, target.height) != size):
+        target.delete()
+        target = None
+    if target is None and scale < 1.0:
+        from offscreen import OffscreenTarget
+        target = OffscreenTarget(*size)
+    return target
+
+
+def present_scene(target):
+    """Upscale the reduced-resolution scene into the window"""
+    width, height = get_display().size
+    glBindFramebuffer(GL_READ_FRAMEBUFFER, target.fbo)
+    glBindFramebuffer(GL_DRAW_FRAMEBUFFER, 0)
+    glBlitFramebuffer(0, 0, target.width, target.height, 0, 0, width, height,
+                      GL_COLOR_BUFFER_BIT, GL_LINEAR)
+    glBindFramebuffer(GL_FRAMEBUFFER, 0)
+    glViewport(0, 0, width, height)
+
+
+def random_planet_velocity():
+    """Velocity for the next click-spawned planet (drawn ahead so it can be previewed)"""
+    return np.array([np.random.uniform(-5, 5), np.random.uniform(-5, 5), 0.0])
+
+
+def draw_prediction(local_points):
+    """Predicted trajectory as a faint line strip (camera-relative float32 points)"""
+    glColor4f(*PREDICTION_COLOR)
+    glLineWidth(1.0)
+    glBegin(GL_LINE_STRIP)
+    for point in local_points:
+        glVertex3f(*point)
+    glEnd()
+
+
+def start_recording():
+    """Start recording the window to recordings/<time>/ as PNGs; returns (reader, writer)"""
+    from offscreen import PixelReader
+    from recorder import open_writer
+    width, height = get_display().size
+    return PixelReader(width, height), open_writer(width=width, height=height)
+
+
+def stop_recording(recording):
+    """Drain and close a recording from start_recording(); returns None"""
+    if recording:
+        reader, writer = recording
+        for frame in reader.flush():
+            writer.submit(frame)
+        reader.delete()
+        writer.close()
+        print(f"Recorded {writer.stats()['written']} frames to {writer.sink.directory}")
+    return None
+
+
+def toggle_diagnostics_log(diagnostics):
+    """Start a CSV log in logs/ (keeping the energy baseline) or stop the current one"""
+    if diagnostics.log is not None:
+        diagnostics.log.close()
+        print(f"Diagnostics written to {diagnostics.log.path}")
+        diagnostics.log = None
+        return
+    os.makedirs(LOG_DIR, exist_ok=True)
+    diagnostics.log = DiagnosticsLog(os.path.join(LOG_DIR, time.strftime("%Y%m%d-%H%M%S") + ".csv"))
+
+
+def planet_propagator(bodies, dt):
+    """
+    Ephemeris propagator that steps copies of `bodies` with Planet.update,
+    one at a time in list order, exactly as the main loop does. (The
+    array kernels kick all bodies from one snapshot; the plunging orbits of
+    the stock scene amplify that difference to whole orbits within seconds.)
+    """
+    clones = [Planet(*p.pos, *p.vel, p.radius, p.color, p.mass) for p in bodies]
+
+    def advance(pos, vel, span):
+        for c, x, v in zip(clones, pos, vel):
+            c.pos[:] = x
+            c.vel[:] = v
+        for _ in range(max(1, int(round(span / dt)))):
+            for c in clones:
+                c.update(clones, dt)
+        return np.array([c.pos for c in clones]), np.array([c.vel for c in clones])
+    return advance
+
+
+def start_rails(planets, dt=DT):
+    """
+    Put the massive planets on rails: from now on they follow an ephemeris
+    of their current state instead of being updated each frame (they stop
+    feeling anything spawned later). The table holds one sample per physics
+    step of dt, filled by Planet.update itself, so with no other massive
+    bodies around rails reproduce the normal loop exactly.
+    Returns [ephemeris, rails planets, sample index]
+    """
+    bodies = [p for p in planets if not p.light] or [max(planets, key=lambda p: p.mass)]
+    state = BodyState.from_planets(bodies)
+    ephemeris = cached_ephemeris(state.pos, state.vel, planet_propagator(bodies, dt), "planets",
+                                 (state.mass, [G, dt]), sample_dt=dt)
+    print(f"On rails: {len(bodies)} bodies ({ephemeris.count} cached samples)")
+    return [ephemeris, bodies, 0]
+
+
+def advance_rails(rails):
+    """Move the rails planets one physics step along their ephemeris"""
+    ephemeris, bodies, i = rails
+    rails[2] = i = i + 1
+    # The step is always the table's sample step, so use the sample as stored
+    pos, vel = ephemeris.sample(i)
+    for p, x, v in zip(bodies, pos, vel):
+        p.pos[:] = x
+        p.vel[:] = v
+
+
+def stop_rails(rails):
+    """Hand the rails planets back to the integrator and cache the table; returns None"""
+    if rails:
+        rails[0].save()
+    return None
 
 
-def run_simulation(settings_obj):
+def run_simulation(settings_obj, display=None):
     """
     Main simulation loop
     Returns: next state ('menu', 'exit')
@@ -101,9 +316,10 @@ def run_simulation(settings_obj):
     global settings
     settings = settings_obj
 
-    # Initialize window
+    # Shared window and GL context (kept across menu <-> simulation)
+    display = display or get_display()
+    resources = display.lease()  # sphere meshes and fonts, released on exit
     pygame.display.set_caption("PyVerse - Simulation")
-    screen = pygame.display.set_mode((1000, 800), DOUBLEBUF | OPENGL | RESIZABLE)
     clock = pygame.time.Clock()
 
     # OpenGL setup
@@ -113,7 +329,7 @@ def run_simulation(settings_obj):
     glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
 
     def resize():
-        w, h = pygame.display.get_surface().get_size()
+        w, h = display.size
         glViewport(0, 0, w, h)
         glMatrixMode(GL_PROJECTION)
         glLoadIdentity()
@@ -128,8 +344,33 @@ def run_simulation(settings_obj):
     ZOOM = 1.0
     ZOOM_SPEED = 1.1
     is_paused = False
+    origin = FloatingOrigin()
+    render_pos = None  # float32 camera-relative positions, reused per frame
     show_grid = settings.get("show_grid", True)
 
+    # === Orbit Preview (background thread) ===
+    predictor = OrbitPredictor()
+    show_prediction = True
+    next_planet_vel = random_planet_velocity()
+    prediction = None
+    prediction_pos = None
+    field_count = -1
+
+    # === Recording (R): PBO readback, frames written on a worker thread ===
+    recording = None
+
+    # === Conservation Diagnostics (D: log to CSV) ===
+    diagnostics = Diagnostics()
+    sim_step = 0
+
+    # === On Rails (O: toggle) ===
+    rails = None
+
+    # === Adaptive Quality (Q: toggle) ===
+    quality = QualityController()
+    scene_fbo = None  # reduced-resolution scene target while render_scale < 1
+    trails = deque(maxlen=MAX_TRAIL)
+
     # === Input State ===
     dragging = False
     last_mouse_pos = (0, 0)
@@ -138,23 +379,51 @@ def run_simulation(settings_obj):
 
     # === Main Loop ===
     while True:
+        quality.begin_frame()
         mouse_pos = pygame.mouse.get_pos()
 
         for event in pygame.event.get():
             if event.type == QUIT:
+                predictor.stop()
+                recording = stop_recording(recording)
+                rails = stop_rails(rails)
+                diagnostics.close()
+                if scene_fbo is not None:
+                    scene_fbo.delete()  # the GL context outlives this screen
+                resources.release()
                 return "exit"
 
             elif event.type == VIDEORESIZE:
-                screen = pygame.display.set_mode((event.w, event.h), DOUBLEBUF | OPENGL | RESIZABLE)
+                recording = stop_recording(recording)  # frame size is fixed per recording
+                display.handle_event(event)
                 resize()
 
             elif event.type == KEYDOWN:
                 if event.key == K_SPACE:
                     is_paused = not is_paused
                 elif event.key == K_ESCAPE:
+                    predictor.stop()
+                    recording = stop_recording(recording)
+                    rails = stop_rails(rails)
+                    diagnostics.close()
+                    if scene_fbo is not None:
+                        scene_fbo.delete()
+                    resources.release()
                     return "menu"  # Back to menu
                 elif event.key == K_g:
                     show_grid = not show_grid
+                elif event.key == K_p:
+                    show_prediction = not show_prediction
+                elif event.key == K_r:
+                    recording = stop_recording(recording) if recording else start_recording()
+                elif event.key == K_d:
+                    toggle_diagnostics_log(diagnostics)
+                elif event.key == K_o:
+                    rails = stop_rails(rails) if rails else start_rails(planets)
+                elif event.key == K_q:
+                    quality.enabled = not quality.enabled
+                    if not quality.enabled:
+                        quality.reset()
 
             elif event.type == MOUSEBUTTONDOWN:
                 if event.button == 1:  # Left mouse down
@@ -164,7 +433,7 @@ def run_simulation(settings_obj):
 
                 elif event.button == 3:  # Right-click → spawn star
                     wx, wy, wz = screen_to_world(event.pos[0], event.pos[1], 1000, 800, CAM_POS, ZOOM)
-                    star = Planet(wx, wy, wz, 0, 0, 0, 12, (1.0, 0.9, 0.4), mass=30000)
+                    star = Planet(wx, wy, wz, 0, 0, 0, 12, (1.0, 0.9, 0.4), mass=STAR_MASS)
                     planets.append(star)
 
                 elif event.button == 4:  # Scroll up
@@ -185,13 +454,15 @@ def run_simulation(settings_obj):
                             wx, wy, wz = screen_to_world(click_start_pos[0], click_start_pos[1], 1000, 800, CAM_POS, ZOOM)
                             p = Planet(
                                 x=wx, y=wy, z=wz,
-                                vx=np.random.uniform(-5, 5),
-                                vy=np.random.uniform(-5, 5),
+                                vx=next_planet_vel[0],
+                                vy=next_planet_vel[1],
                                 vz=0,
                                 radius=3,
-                                color=(0.4, 0.6, 1.0)  # Blue-green
+                                color=(0.4, 0.6, 1.0),  # Blue-green
+                                light=True
                             )
                             planets.append(p)
+                            next_planet_vel = random_planet_velocity()
 
                     # Always reset drag state
                     dragging = False
@@ -207,64 +478,126 @@ def run_simulation(settings_obj):
                     last_mouse_pos = event.pos
 
         # === Update Physics ===
-        if not is_paused:
+        # Light bodies pull on nothing, so only the rest are gravity sources;
+        # with an asteroid belt most of the list would otherwise be skipped
+        # inside every update
+        sources = [p for p in planets if not p.light]
+        # One step of DT; under load only every physics_stride-th frame steps
+        if not is_paused and quality.frame % quality.physics_stride == 0:
+            on_rails = {p.id for p in rails[1]} if rails else ()
+            # Rails first: the massive planets lead the list, so the
+            # bodies after them already see their updated positions
+            if rails:
+                advance_rails(rails)
             for p in planets:
-                p.update(planets, DT)
+                if p.id not in on_rails:
+                    p.update(sources, DT)
+            sim_step += 1
+            # O(N) per frame; potential energy is re-sampled every few steps
+            diagnostics.record(sim_step, BodyState.from_planets(planets))
+        quality.mark("physics")
+
+        # === Orbit Preview ===
+        # Only snapshots/lookups happen here; integration runs on the predictor thread
+        if show_prediction and not dragging:
+            # The preview field is the same massive sources
+            predictor.update_field([p.pos for p in sources], [p.vel for p in sources],
+                                   [p.mass for p in sources], force=len(sources) != field_count)
+            field_count = len(sources)
+            wx, wy, wz = screen_to_world(mouse_pos[0], mouse_pos[1], 1000, 800, CAM_POS, ZOOM)
+            star_preview = pygame.key.get_mods() & KMOD_SHIFT
+            preview_vel = np.zeros(3) if star_preview else next_planet_vel
+            latest = predictor.lookup(predictor.request((wx, wy, wz), preview_vel))
+            if latest is not None:
+                prediction = latest  # otherwise keep showing the previous path
 
         # === Render ===
+        scene_fbo = scene_target(scene_fbo, quality.render_scale)
+        if scene_fbo is not None:
+            scene_fbo.bind()
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
         glLoadIdentity()
 
-        # Apply camera transform
-        glTranslatef(-CAM_POS[0], -CAM_POS[1], -CAM_POS[2])
+        # Floating origin: physics stays float64, GPU only sees float32 offsets
+        origin.update(camera_focus(CAM_POS, ZOOM))
+        world_pos = np.array([p.pos for p in planets]).reshape(-1, 3)
+        render_pos = origin.to_local(world_pos, out=render_pos)
+        if trails and len(trails[-1]) != len(world_pos):
+            trails.clear()  # bodies were added; old strips no longer line up
+        if not is_paused:
+            trails.append(world_pos)
+
+        # Apply camera transform (relative to the floating origin)
+        glTranslatef(*origin.view_offset(CAM_POS, ZOOM))
         glScalef(ZOOM, ZOOM, ZOOM)
 
         # Draw grid (X-Z plane)
-        if show_grid:
-            draw_grid(CAM_POS, ZOOM)
-
-        # Draw planets
-        for p in planets:
-            p.draw()
+        if show_grid and quality.grid_step:
+            draw_grid(CAM_POS, ZOOM, origin, quality.grid_step)
+
+        # Draw trails and planets
+        draw_trails(trails, [p.color for p in planets], origin, quality.trail_length)
+        sphere = resources.sphere(*quality.sphere_detail)
+        for p, local_pos in zip(planets, render_pos):
+            p.draw(local_pos, mesh=sphere)
+
+        # Draw orbit preview
+        if show_prediction and prediction is not None:
+            prediction_pos = origin.to_local(prediction, out=prediction_pos)
+            draw_prediction(prediction_pos)
+        if scene_fbo is not None:
+            present_scene(scene_fbo)
+        quality.mark("scene")
 
         # === 2D Overlay (UI) ===
-        glDisable(GL_DEPTH_TEST)
-        glMatrixMode(GL_PROJECTION)
-        glPushMatrix()
-        glLoadIdentity()
-        glOrtho(0, 1000, 800, 0, -1, 1)
-        glMatrixMode(GL_MODELVIEW)
-        glPushMatrix()
-        glLoadIdentity()
+        # Drawn with pygame into the display canvas, composited as one texture
+        height = display.size[1]
+        hud = display.canvas
+        hud.fill((0, 0, 0, 0))
 
         # UI Font
-        font = pygame.font.SysFont("Arial", 18)
-        get_surface = pygame.display.get_surface
+        font = resources.font("Arial", 18)
 
         # Status: Paused/Running
         status = "⏸ PAUSED" if is_paused else "▶ RUNNING"
         color = (255, 255, 100) if is_paused else (100, 255, 100)
         txt = font.render(status, True, color)
-        get_surface().blit(txt, (850, 20))
+        hud.blit(txt, (850, 20))
 
         # Instructions
-        instr = "L-click: Add | Drag: Pan | R-click: Star | G: Grid | Esc: Menu"
-        get_surface().blit(font.render(instr, True, (200, 200, 200)), (10, 10))
+        instr = "L-click: Add | Drag: Pan | R-click: Star | G: Grid | P: Preview (Shift: star) | R: Record | D: Log | O: Rails | Q: Auto quality | Esc: Menu"
+        hud.blit(font.render(instr, True, (200, 200, 200)), (10, 10))
 
         # Mode indicator
         mode = "Mode: Pan" if dragging else "Mode: Click"
         mode_surf = font.render(mode, True, (180, 180, 100))
-        get_surface().blit(mode_surf, (10, 40))
+        hud.blit(mode_surf, (10, 40))
 
-        # Pop matrices
-        glPopMatrix()
-        glMatrixMode(GL_PROJECTION)
-        glPopMatrix()
-        glMatrixMode(GL_MODELVIEW)
-        glEnable(GL_DEPTH_TEST)
+        # Conservation diagnostics
+        for i, line in enumerate(diagnostics.hud_lines()):
+            hud.blit(font.render(line, True, (150, 200, 255)), (10, 70 + 22 * i))
+        if diagnostics.log is not None:
+            hud.blit(font.render("● LOG", True, (255, 120, 120)), (850, 45))
+        if rails:
+            hud.blit(font.render("● RAILS", True, (255, 200, 120)), (850, 70))
+
+        # Frame budget and quality levels (bottom-left)
+        quality_lines = quality.hud_lines()
+        for i, line in enumerate(quality_lines):
+            y = height - 10 - 22 * (len(quality_lines) - i)
+            hud.blit(font.render(line, True, (200, 180, 255)), (10, y))
+
+        display.draw_canvas()
+        quality.mark("overlay")
 
         # === Finalize Frame ===
+        if recording:
+            frame = recording[0].read()  # back buffer, from an earlier frame's transfer
+            if frame is not None:
+                recording[1].submit(frame)
         pygame.display.flip()
+        quality.mark("present")
+        quality.end_frame()  # before the clock's idle wait, which is not load
         clock.tick(60)
 
     # End of loop
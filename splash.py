@@ -3,10 +3,12 @@ import pygame
 from pygame.locals import *
 import time
 
-def show_splash(screen, clock):
+def show_splash(screen, clock, present=pygame.display.flip):
     """
     Show a splash screen with a smooth white loading bar.
     No percentages — just clean animation.
+    `present` shows the finished frame (for an offscreen canvas, the
+    display's present).
     """
     w, h = screen.get_size()
 
@@ -87,7 +89,7 @@ def show_splash(screen, clock):
             fill_rect = pygame.Rect(bar_x, bar_y, progress_width, bar_height)
             pygame.draw.rect(screen, (255, 255, 255), fill_rect, border_radius=2)
 
-        pygame.display.flip()
+        present()
         clock.tick(60)
 
     return True  # Success
\ No newline at end of file
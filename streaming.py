@@ -0,0 +1,482 @@
+# streaming.py
+# Headless physics server that streams frames to remote viewers.
+#
+# Frame format (little-endian arrays after a network-order header):
+#   keyframe: float32 positions (N, 3), float32 radii (N), uint8 colors (N, 3)
+#   delta:    float32 quantum per block of QUANT_BLOCK bodies, int16 positions
+#             (N, 3) quantized offsets from the last keyframe, then float32
+#             positions of escaped blocks (quantum 0: moved too far to quantize)
+# Deltas only ever reference a keyframe, so a slow client can drop any number of
+# them; the server keeps one pending keyframe + newest delta per client.
+# Clients connect over raw TCP (u32 length-prefixed frames) or WebSocket
+# (one binary message per frame), detected from the first bytes sent.
+#
+#   python streaming.py serve --scenario solar_system --port 47200
+#   python streaming.py view --connect HOST:47200
+#   python streaming.py bench --scenario galaxy --bodies 20000
+import argparse
+import asyncio
+import base64
+import hashlib
+import queue
+import struct
+import threading
+import time
+import numpy as np
+from config import DT
+import gravity
+from bodies import BodyStore
+
+DEFAULT_PORT = 47200
+KEYFRAME_INTERVAL = 60    # frames between forced keyframes
+QUANT_BLOCK = 64          # bodies sharing one delta quantum
+MAX_QUANTUM = 0.05        # world units; coarser blocks are sent as float32 escapes
+MAX_ESCAPED = 0.25        # fraction of escaped blocks that forces a keyframe instead
+FRAME_RATE = 30
+
+MAGIC = b"PYVS"
+KIND_KEY = 0
+KIND_DELTA = 1
+# magic, kind, frame, keyframe it refers to, body count, server time, quantum block size
+HEADER = struct.Struct("!4sBIIIdI")
+_LEN = struct.Struct("!I")
+_WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+# === Encoding ===
+class FrameEncoder:
+    """
+    Turns successive position arrays into key/delta frames. Each block of
+    bodies gets its own quantum, so one fast body only coarsens (or, past
+    max_quantum, escapes) its own block instead of forcing a keyframe.
+    """
+
+    def __init__(self, keyframe_interval=KEYFRAME_INTERVAL, max_quantum=MAX_QUANTUM,
+                 block=QUANT_BLOCK, max_escaped=MAX_ESCAPED):
+        self.keyframe_interval = keyframe_interval
+        self.max_quantum = max_quantum
+        self.block = block
+        self.max_escaped = max_escaped
+        self.frame = 0
+        self.key_frame = 0
+        self.key_pos = None
+        self.key_bytes = None
+
+    def encode(self, pos, radius, color, force_key=False):
+        """Returns (frame bytes, is_keyframe)"""
+        self.frame += 1
+        pos32 = np.asarray(pos, dtype="<f4")
+        now = time.time()
+
+        if not (force_key or self.key_pos is None or len(pos32) != len(self.key_pos)
+                or len(pos32) == 0 or self.frame - self.key_frame >= self.keyframe_interval):
+            n, block = len(pos32), self.block
+            delta = pos32 - self.key_pos
+            span = np.maximum.reduceat(np.abs(delta).max(axis=1), np.arange(0, n, block))
+            quantum = np.maximum(span / 32767.0, 1e-9).astype("<f4")
+            escaped = quantum > self.max_quantum
+            if escaped.mean() <= self.max_escaped:
+                quantum[escaped] = 0.0
+                per_body = np.repeat(quantum, block)[:n, None]
+                q = np.zeros((n, 3), dtype="<i2")
+                moved = per_body[:, 0] > 0
+                q[moved] = np.clip(np.rint(delta[moved] / per_body[moved]), -32767, 32767)
+                header = HEADER.pack(MAGIC, KIND_DELTA, self.frame, self.key_frame, n, now, block)
+                return b"".join([header, quantum.tobytes(), q.tobytes(),
+                                 pos32[~moved].tobytes()]), False
+
+        self.key_frame = self.frame
+        self.key_pos = pos32.copy()
+        color8 = np.clip(np.asarray(color) * 255.0 + 0.5, 0, 255).astype(np.uint8)
+        header = HEADER.pack(MAGIC, KIND_KEY, self.frame, self.frame, len(pos32), now, 0)
+        self.key_bytes = b"".join([header, pos32.tobytes(),
+                                   np.asarray(radius, dtype="<f4").tobytes(), color8.tobytes()])
+        return self.key_bytes, True
+
+
+class FrameDecoder:
+    """Rebuilds positions from key/delta frames"""
+
+    def __init__(self):
+        self.key_frame = None
+        self.key_pos = None
+        self.radius = None
+        self.color = None
+        self.pos = None
+        self.frame = 0
+        self.server_time = 0.0
+
+    def decode(self, data):
+        """Returns True if the frame produced a new position array"""
+        magic, kind, frame, key_frame, n, stamp, block = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("not a PyVerse stream frame")
+        body = memoryview(data)[HEADER.size:]
+        if kind == KIND_KEY:
+            self.key_pos = np.frombuffer(body, "<f4", n * 3).reshape(n, 3)
+            self.radius = np.frombuffer(body, "<f4", n, offset=n * 12)
+            self.color = np.frombuffer(body, np.uint8, n * 3, offset=n * 16).reshape(n, 3) / 255.0
+            self.key_frame = key_frame
+            self.pos = self.key_pos
+        elif key_frame == self.key_frame:
+            blocks = -(-n // block)
+            quantum = np.repeat(np.frombuffer(body, "<f4", blocks), block)[:n]
+            q = np.frombuffer(body, "<i2", n * 3, offset=blocks * 4).reshape(n, 3)
+            self.pos = self.key_pos + q * quantum[:, None]
+            escaped = quantum == 0
+            if escaped.any():
+                self.pos[escaped] = np.frombuffer(body, "<f4", int(escaped.sum()) * 3,
+                                                  offset=blocks * 4 + n * 6).reshape(-1, 3)
+        else:
+            return False  # delta against a keyframe we never saw
+        self.frame = frame
+        self.server_time = stamp
+        return True
+
+
+# === Server ===
+class _Subscriber:
+    def __init__(self, writer, websocket):
+        self.writer = writer
+        self.websocket = websocket
+        self.key = None
+        self.delta = None
+        self.ready = asyncio.Event()
+        self.sent = 0
+        self.dropped = 0
+
+    def offer(self, frame, is_key):
+        if self.key is not None or self.delta is not None:
+            self.dropped += 1
+        if is_key:
+            self.key, self.delta = frame, None
+        else:
+            self.delta = frame
+        self.ready.set()
+
+    def _wrap(self, frame):
+        if not self.websocket:
+            return _LEN.pack(len(frame)) + frame
+        n = len(frame)
+        if n < 126:
+            head = struct.pack("!BB", 0x82, n)
+        elif n < 65536:
+            head = struct.pack("!BBH", 0x82, 126, n)
+        else:
+            head = struct.pack("!BBQ", 0x82, 127, n)
+        return head + frame
+
+    async def pump(self):
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            for frame in (self.key, self.delta):
+                if frame is not None:
+                    self.writer.write(self._wrap(frame))
+            self.key = self.delta = None
+            self.sent += 1
+            await self.writer.drain()
+
+
+class StreamServer:
+    """
+    Steps a BodyState headlessly and publishes frames to every subscriber.
+    Physics runs in a worker thread so slow steps never stall the sockets.
+    """
+
+    def __init__(self, state, host="0.0.0.0", port=DEFAULT_PORT, steps_per_frame=1,
+                 frame_rate=FRAME_RATE, dt=DT, acc_fn=gravity.accelerations, integrator=None):
+        self.state = state
+        self.acc_fn = acc_fn
+        self.integrator = integrator  # e.g. wisdom_holman.WisdomHolman; default kick-drift
+        self.edits = queue.SimpleQueue()
+        self.revision = getattr(state, "revision", 0)
+        self.host, self.port = host, port
+        self.steps_per_frame = steps_per_frame
+        self.frame_rate = frame_rate
+        self.dt = dt
+        self.encoder = FrameEncoder()
+        self.subscribers = set()
+        self.bytes_sent = 0
+        self.frames = 0
+
+    async def _handshake(self, reader, writer):
+        """Detect WebSocket upgrade requests; plain TCP clients send b'PYVS'"""
+        first = await reader.readexactly(4)
+        if first != b"GET ":
+            return False
+        request = first + await reader.readuntil(b"\r\n\r\n")
+        key = None
+        for line in request.decode("latin-1").split("\r\n"):
+            if line.lower().startswith("sec-websocket-key:"):
+                key = line.split(":", 1)[1].strip().encode()
+        if key is None:
+            raise ConnectionError("WebSocket request without a key")
+        accept = base64.b64encode(hashlib.sha1(key + _WS_GUID).digest()).decode()
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+                      f"Connection: Upgrade\r\nSec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+        return True
+
+    async def _serve_client(self, reader, writer):
+        try:
+            websocket = await self._handshake(reader, writer)
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.LimitOverrunError):
+            writer.close()
+            return
+        sub = _Subscriber(writer, websocket)
+        if self.encoder.key_bytes is not None:
+            sub.offer(self.encoder.key_bytes, True)
+        self.subscribers.add(sub)
+        pump = asyncio.ensure_future(sub.pump())
+        try:
+            # Nothing is expected from clients; EOF means they left
+            while await reader.read(4096):
+                pass
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            pump.cancel()
+            self.subscribers.discard(sub)
+            writer.close()
+
+    def edit(self, fn):
+        """
+        Run fn(state) on the physics thread before the next step; safe to call
+        from any thread (e.g. to add or remove bodies on a BodyStore state)
+        """
+        self.edits.put(fn)
+
+    def _advance(self):
+        while not self.edits.empty():
+            self.edits.get()(self.state)
+        for _ in range(self.steps_per_frame):
+            if self.integrator is not None:
+                self.integrator.step(self.state, self.dt)
+            else:
+                gravity.step(self.state, self.dt, self.acc_fn)
+        s = self.state
+        # Added/removed bodies reorder the arrays, so deltas would be meaningless
+        revision = getattr(s, "revision", 0)
+        force_key = revision != self.revision
+        self.revision = revision
+        return self.encoder.encode(s.pos, s.radius, s.color, force_key=force_key)
+
+    async def run(self, max_frames=None):
+        server = await asyncio.start_server(self._serve_client, self.host, self.port)
+        self.port = server.sockets[0].getsockname()[1]
+        print(f"Streaming on {self.host}:{self.port}")
+        loop = asyncio.get_running_loop()
+        period = 1.0 / self.frame_rate
+        async with server:
+            while max_frames is None or self.frames < max_frames:
+                start = loop.time()
+                frame, is_key = await loop.run_in_executor(None, self._advance)
+                for sub in list(self.subscribers):
+                    sub.offer(frame, is_key)
+                self.frames += 1
+                self.bytes_sent += len(frame)
+                await asyncio.sleep(max(0.0, period - (loop.time() - start)))
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "bytes_per_frame": self.bytes_sent / max(self.frames, 1),
+            "clients": len(self.subscribers),
+            "dropped": sum(s.dropped for s in self.subscribers),
+        }
+
+
+# === Client ===
+class StreamClient:
+    """
+    Receives frames on a background thread; the render loop polls `latest()`.
+    Latency assumes server and viewer clocks are in sync (e.g. NTP).
+    """
+
+    def __init__(self, host, port=DEFAULT_PORT):
+        self.host, self.port = host, port
+        self.decoder = FrameDecoder()
+        self.lock = threading.Lock()
+        self.snapshot = None
+        self.frames = 0
+        self.bytes = 0
+        self.latency = 0.0
+        self.running = True
+        self.thread = threading.Thread(target=lambda: asyncio.run(self._receive()), daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    async def _receive(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        writer.write(MAGIC)
+        try:
+            while self.running:
+                size = _LEN.unpack(await reader.readexactly(_LEN.size))[0]
+                data = await reader.readexactly(size)
+                if not self.decoder.decode(data):
+                    continue
+                d = self.decoder
+                with self.lock:
+                    self.snapshot = (d.frame, d.pos, d.radius, d.color)
+                    self.frames += 1
+                    self.bytes += size + _LEN.size
+                    self.latency = 0.9 * self.latency + 0.1 * (time.time() - d.server_time)
+        except asyncio.IncompleteReadError:
+            pass
+        finally:
+            self.running = False
+            writer.close()
+
+    def latest(self):
+        with self.lock:
+            return self.snapshot
+
+    def stats(self):
+        with self.lock:
+            return {"frames": self.frames,
+                    "bytes_per_frame": self.bytes / max(self.frames, 1),
+                    "latency_ms": self.latency * 1000.0}
+
+    def stop(self):
+        self.running = False
+
+
+def run_viewer(host, port=DEFAULT_PORT):
+    """Drive the OpenGL renderer from a remote stream"""
+    import pygame
+    from pygame.locals import DOUBLEBUF, OPENGL, RESIZABLE, QUIT, KEYDOWN, K_ESCAPE, K_g, MOUSEBUTTONDOWN
+    from OpenGL.GL import (glClear, glLoadIdentity, glTranslatef, glScalef, glEnable,
+                           glViewport, glMatrixMode, GL_COLOR_BUFFER_BIT, GL_DEPTH_BUFFER_BIT,
+                           GL_DEPTH_TEST, GL_PROJECTION, GL_MODELVIEW)
+    from OpenGL.GLU import gluPerspective
+    from floating_origin import FloatingOrigin, camera_focus
+    from simulation import draw_bodies, draw_grid
+
+    client = StreamClient(host, port).start()
+    pygame.init()
+    pygame.display.set_mode((1000, 800), DOUBLEBUF | OPENGL | RESIZABLE)
+    glEnable(GL_DEPTH_TEST)
+    glViewport(0, 0, 1000, 800)
+    glMatrixMode(GL_PROJECTION)
+    glLoadIdentity()
+    gluPerspective(45, 1000 / 800, 1.0, 1000.0)
+    glMatrixMode(GL_MODELVIEW)
+    clock = pygame.time.Clock()
+
+    cam_pos, zoom = [0.0, 0.0, 100.0], 1.0
+    origin = FloatingOrigin()
+    render_pos = None
+    show_grid = True
+    while client.running:
+        for event in pygame.event.get():
+            if event.type == QUIT or (event.type == KEYDOWN and event.key == K_ESCAPE):
+                client.stop()
+            elif event.type == KEYDOWN and event.key == K_g:
+                show_grid = not show_grid
+            elif event.type == MOUSEBUTTONDOWN and event.button in (4, 5):
+                zoom = min(zoom * 1.1, 10.0) if event.button == 4 else max(zoom / 1.1, 0.1)
+
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        glLoadIdentity()
+        origin.update(camera_focus(cam_pos, zoom))
+        glTranslatef(*origin.view_offset(cam_pos, zoom))
+        glScalef(zoom, zoom, zoom)
+        if show_grid:
+            draw_grid(cam_pos, zoom, origin)
+        snap = client.latest()
+        if snap is not None:
+            _, pos, radius, color = snap
+            render_pos = origin.to_local(pos, out=render_pos)
+            draw_bodies(render_pos, radius, color)
+
+        stats = client.stats()
+        pygame.display.set_caption(
+            f"PyVerse viewer - {stats['bytes_per_frame'] / 1024:.1f} KiB/frame, "
+            f"latency {stats['latency_ms']:.1f} ms")
+        pygame.display.flip()
+        clock.tick(60)
+    pygame.quit()
+
+
+# === CLI ===
+def _make_state(args):
+    """The scene as a BodyStore, so bodies can be added/removed while serving"""
+    from scenarios import create_scenario
+    kwargs = {"seed": args.seed}
+    if args.bodies:
+        kwargs["n_asteroids" if args.scenario == "solar_system" else "n"] = args.bodies
+    return BodyStore.from_state(create_scenario(args.scenario, **kwargs))
+
+
+def _make_solver(args):
+    from scenarios import scene_solver
+    return scene_solver(args.scenario, args.solver, precision=args.precision)
+
+
+def _make_integrator(args, acc_fn):
+    if args.integrator == "wh":
+        from wisdom_holman import WisdomHolman
+        return WisdomHolman(acc_fn=acc_fn)
+    return None
+
+
+def _make_server(args, host, port):
+    acc_fn = _make_solver(args)
+    return StreamServer(_make_state(args), host, port, frame_rate=args.fps,
+                        dt=args.dt, acc_fn=acc_fn, integrator=_make_integrator(args, acc_fn))
+
+
+async def _bench(args):
+    server = _make_server(args, "127.0.0.1", 0)
+    task = asyncio.ensure_future(server.run(max_frames=args.frames))
+    while server.port == 0:
+        await asyncio.sleep(0.01)
+    client = StreamClient("127.0.0.1", server.port).start()
+    await task
+    await asyncio.sleep(0.2)
+    client.stop()
+    s, c = server.stats(), client.stats()
+    raw = len(server.state) * 3 * 8
+    print(f"{len(server.state)} bodies, {s['frames']} frames: "
+          f"{s['bytes_per_frame'] / 1024:.1f} KiB/frame "
+          f"({s['bytes_per_frame'] / raw:.0%} of raw float64 positions), "
+          f"client got {c['frames']} frames, latency {c['latency_ms']:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a headless PyVerse simulation")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    for name in ("serve", "bench"):
+        p = sub.add_parser(name)
+        p.add_argument("--scenario", default="solar_system")
+        p.add_argument("--bodies", type=int, default=0)
+        p.add_argument("--seed", type=int, default=None)
+        p.add_argument("--fps", type=float, default=FRAME_RATE)
+        p.add_argument("--solver", choices=gravity.SOLVERS, default=None,
+                       help="force solver (default: the scene's)")
+        p.add_argument("--precision", choices=gravity.PRECISIONS, default="float64",
+                       help="mixed: float32 pair terms (direct solver only)")
+        p.add_argument("--integrator", choices=("kick-drift", "wh"), default="kick-drift",
+                       help="wh: Wisdom-Holman, for Sun-dominated scenes with larger --dt")
+        p.add_argument("--dt", type=float, default=DT)
+    sub.choices["serve"].add_argument("--host", default="0.0.0.0")
+    sub.choices["serve"].add_argument("--port", type=int, default=DEFAULT_PORT)
+    sub.choices["bench"].add_argument("--frames", type=int, default=120)
+    view = sub.add_parser("view")
+    view.add_argument("--connect", default=f"127.0.0.1:{DEFAULT_PORT}")
+    args = parser.parse_args()
+
+    if args.cmd == "serve":
+        server = _make_server(args, args.host, args.port)
+        asyncio.run(server.run())
+    elif args.cmd == "bench":
+        asyncio.run(_bench(args))
+    else:
+        host, port = args.connect.rsplit(":", 1)
+        run_viewer(host, int(port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# test_gravity.py
+# Fast checks of the mixed-precision direct kernel against the float64 one.
+# Timing comparisons stay in `python gravity.py mixed`.
+#
+#   python -m pytest -q test_gravity.py    (or: python test_gravity.py)
+import numpy as np
+import pytest
+import gravity
+from config import G, SOFTENING
+
+TOLERANCE = 1e-4  # relative error of float32 pair terms on a small scene
+
+
+def _scene(n, seed=0, offset=0.0):
+    rng = np.random.default_rng(seed)
+    pos = rng.normal(scale=50.0, size=(n, 3)) + offset
+    mass = rng.uniform(1.0, 100.0, n)
+    return pos, mass
+
+
+def _relative_error(acc, ref):
+    return float(np.linalg.norm(acc - ref) / np.linalg.norm(ref))
+
+
+# === Mixed vs float64 ===
+def test_mixed_matches_float64():
+    pos, mass = _scene(200)
+    ref = gravity.accelerations(pos, mass)
+    assert _relative_error(gravity.accelerations_from_mixed(pos, pos, mass), ref) < TOLERANCE
+
+
+def test_mixed_far_from_origin():
+    # The kernel shifts to the sources' centre before rounding to float32
+    pos, mass = _scene(100, offset=1e6)
+    ref = gravity.accelerations(pos, mass)
+    assert _relative_error(gravity.accelerations_from_mixed(pos, pos, mass), ref) < TOLERANCE
+
+
+@pytest.mark.parametrize("n, sum_block", [(1, 4), (5, 4), (7, 8), (33, 16), (64, 16)])
+def test_padding_to_sum_block(n, sum_block):
+    # Padding sources are massless, so the block size never changes the sum
+    pos, mass = _scene(n, seed=n)
+    targets = _scene(9, seed=100)[0]
+    ref = gravity.accelerations_from(targets, pos, mass)
+    acc = gravity.accelerations_from_mixed(targets, pos, mass, sum_block=sum_block)
+    assert _relative_error(acc, ref) < TOLERANCE
+
+
+# === Softening and self-pairs ===
+def test_self_pair_contributes_nothing():
+    pos = np.array([[0.0, 0.0, 0.0]])
+    acc = gravity.accelerations_from_mixed(pos, pos, np.array([10.0]))
+    assert np.array_equal(acc, np.zeros((1, 3)))
+
+
+def test_softening_cut_matches_float64():
+    # The second pair sits inside the cut (r² < softening) and is skipped by both kernels
+    close = np.sqrt(SOFTENING) * 0.5
+    pos = np.array([[0.0, 0.0, 0.0], [close, 0.0, 0.0], [10.0, 0.0, 0.0]])
+    mass = np.array([5.0, 7.0, 3.0])
+    ref = gravity.accelerations(pos, mass)
+    acc = gravity.accelerations_from_mixed(pos, pos, mass)
+    np.testing.assert_allclose(acc, ref, rtol=TOLERANCE, atol=1e-12)
+    np.testing.assert_allclose(acc[0, 0], G * 3.0 / 100.0, rtol=TOLERANCE)
+
+
+def test_no_sources():
+    acc = gravity.accelerations_from_mixed(np.ones((3, 3)), np.empty((0, 3)), np.empty(0))
+    assert np.array_equal(acc, np.zeros((3, 3)))
+
+
+# === out= reuse ===
+def test_out_is_overwritten():
+    pos, mass = _scene(50)
+    out = np.full((50, 3), 123.0)
+    result = gravity.accelerations_from_mixed(pos, pos, mass, out=out)
+    assert result is out
+    np.testing.assert_array_equal(out, gravity.accelerations_from_mixed(pos, pos, mass))
+
+
+# === make_solver ===
+def test_make_solver_mixed_direct():
+    pos, mass = _scene(64)
+    solver = gravity.make_solver("direct", precision="mixed")
+    assert _relative_error(solver(pos, mass), gravity.accelerations(pos, mass)) < TOLERANCE
+
+
+@pytest.mark.parametrize("name", ["pm", "p3m"])
+def test_make_solver_mixed_rejects_mesh(name):
+    with pytest.raises(ValueError):
+        gravity.make_solver(name, precision="mixed")
+
+
+def test_make_solver_unknown_precision():
+    with pytest.raises(ValueError):
+        gravity.make_solver("direct", precision="float16")
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,194 @@
+# wisdom_holman.py
+# Mixed-variable symplectic integrator for scenes dominated by one central
+# mass (solar_system). Each body's Keplerian orbit about the central body is
+# advanced exactly (kepler.kepler_drift); only the small mutual pulls between
+# the other bodies are applied as kicks. The split uses democratic
+# heliocentric coordinates (heliocentric positions, barycentric velocities):
+#
+#   kick(dt/2) jump(dt/2) kepler(dt) jump(dt/2) kick(dt/2)
+#
+# so steps can be a sizeable fraction of an orbit instead of the ~1/400 the
+# kick-drift integrator needs. When two bodies come within a few Hill radii
+# of each other their mutual force stops being a small perturbation; the step
+# is then split into substeps short enough to resolve the encounter.
+#
+#   python wisdom_holman.py --scenario planetary_system --orbits 20
+import argparse
+import time
+import numpy as np
+from config import G, DT, SOFTENING
+import gravity
+from kepler import kepler_drift
+
+ENCOUNTER_HILL = 3.0   # encounter when a pair gets this many mutual Hill radii apart
+ENCOUNTER_ETA = 0.1    # substep as a fraction of the pair's mutual dynamical time
+MAX_SUBSTEPS = 1000
+
+
+def encounter_substeps(q, v, mass, central_mass, dt, g=G, softening=SOFTENING,
+                       hill=ENCOUNTER_HILL, eta=ENCOUNTER_ETA, max_substeps=MAX_SUBSTEPS, light=None):
+    """
+    Number of substeps dt needs so every close pair is resolved. q/v are
+    heliocentric positions and velocities of the orbiting bodies. Each pair's
+    closest approach during the step is found from straight-line motion; pairs
+    passing within `hill` mutual Hill radii limit the substep to eta times
+    their mutual dynamical time sqrt(r^3 / G(m_i + m_j)). At the Hill
+    threshold that time is ~0.5 orbits, so the fallback switches on smoothly.
+    Pairs of two `light` bodies do not interact and are skipped.
+    """
+    n = len(mass)
+    if n < 2:
+        return 1
+    rows = np.arange(n) if light is None else np.nonzero(~light)[0]
+    r = np.sqrt(np.einsum("ij,ij->i", q, q))
+    shortest = np.inf
+    qt, vt = np.ascontiguousarray(q.T), np.ascontiguousarray(v.T)
+    block = max(1, gravity.PAIR_BLOCK // n)
+    for start in range(0, len(rows), block):
+        i = rows[start:start + block]
+        # Per-axis 2D blocks, as in gravity.accelerations_from
+        dq2 = np.zeros((len(i), n))
+        qv = np.zeros((len(i), n))
+        dv2 = np.zeros((len(i), n))
+        for axis in range(3):
+            dq = qt[axis] - q[i, axis:axis + 1]
+            dv = vt[axis] - v[i, axis:axis + 1]
+            dq2 += dq * dq
+            qv += dq * dv
+            dv2 += dv * dv
+        # |dq + dv t|^2 at the closest approach time t in [0, dt]
+        t = np.clip(-qv / np.maximum(dv2, 1e-300), 0.0, dt)
+        r_min = np.sqrt(np.maximum(dq2 + t * (2.0 * qv + t * dv2), softening))
+        m_pair = mass[i, None] + mass[None, :]
+        r_hill = (m_pair / (3.0 * central_mass)) ** (1.0 / 3.0) * 0.5 * (r[i, None] + r[None, :])
+        close = r_min < hill * r_hill
+        close[np.arange(len(i)), i] = False  # self-pairs
+        if close.any():
+            t_dyn = np.sqrt(r_min[close] ** 3 / (g * m_pair[close]))
+            shortest = min(shortest, float(t_dyn.min()))
+    if not np.isfinite(shortest):
+        return 1
+    return int(min(max_substeps, max(1, np.ceil(dt / (eta * shortest)))))
+
+
+class WisdomHolman:
+    """
+    step(state, dt) advances a BodyState around its most massive body (or
+    body `central`). Mutual forces come from `acc_fn` (any gravity solver);
+    light bodies (BodyState.light) feel them but exert none. Nothing is
+    cached between steps, so bodies may be added or removed freely.
+    """
+
+    def __init__(self, g=G, softening=SOFTENING, central=None, acc_fn=None,
+                 hill=ENCOUNTER_HILL, eta=ENCOUNTER_ETA, max_substeps=MAX_SUBSTEPS):
+        self.g = g
+        self.softening = softening
+        self.central = central
+        self.acc_fn = acc_fn or (lambda pos, mass: gravity.accelerations(pos, mass, g, softening))
+        self.hill = hill
+        self.eta = eta
+        self.max_substeps = max_substeps
+        self.steps = 0
+        self.substeps = 0   # total, including encounter substeps
+
+    def step(self, state, dt):
+        """Advance `state` in place by dt; returns the number of substeps taken"""
+        n = len(state)
+        if n < 2:
+            state.pos += state.vel * dt
+            return 1
+        sun = int(np.argmax(state.mass)) if self.central is None else self.central
+        others = np.arange(n) != sun
+        mass = state.mass[others]
+        light = getattr(state, "light", None)
+        light = light[others] if light is not None and light.any() else None
+        # Light bodies carry no weight in the barycentre or the Sun's motion
+        weight = mass if light is None else np.where(light, 0.0, mass)
+        m_sun = float(state.mass[sun])
+        total = m_sun + float(weight.sum())
+        com = (m_sun * state.pos[sun] + weight @ state.pos[others]) / total
+        com_vel = (m_sun * state.vel[sun] + weight @ state.vel[others]) / total
+
+        # Heliocentric positions, barycentric velocities
+        q = state.pos[others] - state.pos[sun]
+        v = state.vel[others] - com_vel
+        count = encounter_substeps(q, state.vel[others] - state.vel[sun], mass, m_sun, dt,
+                                   self.g, self.softening, self.hill, self.eta, self.max_substeps, light)
+        h = dt / count
+        mu = self.g * m_sun
+        acc = self._mutual(q, mass, light)
+        for _ in range(count):
+            v += 0.5 * h * acc
+            q += (0.5 * h / m_sun) * (weight @ v)
+            q, v = kepler_drift(mu, q, v, h)
+            q += (0.5 * h / m_sun) * (weight @ v)
+            acc = self._mutual(q, mass, light)  # closing kick, reused to open the next substep
+            v += 0.5 * h * acc
+
+        # Back to world coordinates; the barycentre drifts uniformly
+        com = com + com_vel * dt
+        sun_pos = com - weight @ q / total
+        state.pos[sun] = sun_pos
+        state.pos[others] = q + sun_pos
+        state.vel[sun] = com_vel - weight @ v / m_sun
+        state.vel[others] = v + com_vel
+        self.steps += 1
+        self.substeps += count
+        return count
+
+    def _mutual(self, q, mass, light):
+        if light is None:
+            return self.acc_fn(q, mass)
+        return gravity.split_accelerations(q, mass, light, self.acc_fn, self.g, self.softening)
+
+
+if __name__ == "__main__":
+    from scenarios import create_scenario
+    from diagnostics import sampled_potential_energy, kinetic_energy
+    parser = argparse.ArgumentParser(description="Wisdom-Holman vs kick-drift on a Sun-dominated scene")
+    parser.add_argument("--scenario", default="planetary_system")
+    parser.add_argument("--bodies", type=int, default=0)
+    parser.add_argument("--orbits", type=float, default=20.0, help="orbits of the innermost body")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    def scene():
+        kwargs = {"seed": args.seed}
+        if args.bodies:
+            kwargs["n_asteroids" if args.scenario == "solar_system" else "n"] = args.bodies
+        return create_scenario(args.scenario, **kwargs)
+
+    def energy(state):
+        pe, _ = sampled_potential_energy(state.pos, state.mass, sample_size=len(state))
+        return kinetic_energy(state.vel, state.mass) + pe
+
+    def run(dt, integrator=None):
+        state = scene()
+        steps = int(round(duration / dt))
+        start = time.perf_counter()
+        for _ in range(steps):
+            if integrator is None:
+                gravity.step(state, dt)
+            else:
+                integrator.step(state, dt)
+        return state, steps, time.perf_counter() - start
+
+    initial = scene()
+    sun = int(np.argmax(initial.mass))
+    r = np.linalg.norm(np.delete(initial.pos - initial.pos[sun], sun, axis=0), axis=1)
+    period = 2 * np.pi * np.sqrt(r.min() ** 3 / (G * initial.mass[sun]))
+    duration = args.orbits * period
+    e0 = energy(initial)
+    planets = int(np.count_nonzero(initial.mass >= 1.0))  # the scenes put massive bodies first
+    reference, _, _ = run(period / 1000, WisdomHolman())
+    print(f"{args.scenario}: {len(initial)} bodies, {duration:.1f} time units "
+          f"({args.orbits:g} inner orbits of {period:.3f}); error vs a WH run at period/1000")
+    runs = [("kick-drift", DT, None), ("kick-drift", DT / 10, None)]
+    runs += [("wisdom-holman", period / k, WisdomHolman()) for k in (100, 30, 10)]
+    for name, dt, integrator in runs:
+        state, steps, elapsed = run(dt, integrator)
+        # Planets only: belt asteroids scattered by encounters diverge chaotically
+        error = np.abs(state.pos[:planets] - reference.pos[:planets]).max()
+        extra = f", {integrator.substeps - integrator.steps} encounter substeps" if integrator else ""
+        print(f"  {name:14s} dt={dt:.4f} ({dt / DT:5.1f}x DT): {steps:6d} steps in {elapsed:6.2f}s, "
+              f"|dE/E| {abs(energy(state) - e0) / abs(e0):.1e}, planet position error {error:.2e}{extra}")